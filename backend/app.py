@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify, session
+from flask import Flask, request, jsonify, session, Response, stream_with_context
 from flask_cors import CORS
 import sys
 import os
@@ -6,11 +6,18 @@ import os
 # Add mlmodel to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../mlmodel')))
 
-from emotion_analyzer import get_analyzer
+from emotion_analyzer import get_analyzer, configure_inference_threads
 from chatbot import get_chatbot
+from external_sentiment import get_external_analyzer
+from hedged_analysis import get_hedged_analyzer
+from adaptive_timeout import get_timeout_metrics
+from metrics import RollingStats
 from database import get_database
+import json
 import random
 import os
+import threading
+import time
 from dotenv import load_dotenv
 from datetime import datetime
 
@@ -29,50 +36,193 @@ else:
     # In development, allow localhost (Vite)
     CORS(app, origins=["http://localhost:5173", "http://127.0.0.1:5173", "http://localhost:3000"], supports_credentials=True)
 
-# Initialize components (lazy-loaded)
+# Initialize components (loaded in the background at boot)
 emotion_analyzer = None
 chatbot = None
 database = None
-_components_initializing = False
-_components_initialized = False
+_init_lock = threading.Lock()
+_init_thread_lock = threading.Lock()
+_init_thread = None
+_components_ready = threading.Event()
+_component_timings = {}
+_init_error = None
+
+# How long a request waits for initialization before getting a 503
+INIT_WAIT_SECONDS = float(os.getenv('INIT_WAIT_SECONDS', 30))
+
+# Hard cap on text size at the API edge. The analyzer additionally keeps at
+# most EMOTION_MAX_INPUT_TOKENS tokens and windows anything longer than
+# EMOTION_WINDOW_TOKENS, so worst-case inference cost stays bounded.
+MAX_MESSAGE_CHARS = int(os.getenv('MAX_MESSAGE_CHARS', 20000))
+
+# /chat/stream timings: request start to the first reply text, and to the end
+_stream_ttfb = RollingStats()
+_stream_total = RollingStats()
+_stream_counts = {}
+_stream_counts_lock = threading.Lock()
 
 def initialize_components():
-    """Initialize the analyzer, chatbot, and database."""
-    global emotion_analyzer, chatbot, database, _components_initialized, _components_initializing
-    if _components_initialized or _components_initializing:
+    """Initialize the database, analyzer, and chatbot exactly once per process."""
+    global emotion_analyzer, chatbot, database, _init_error
+    with _init_lock:
+        if _components_ready.is_set():
+            return
+        print("Initializing components...")
+        _init_error = None
+        try:
+            if database is None:
+                started = time.perf_counter()
+                database = get_database()
+                _component_timings['database_ms'] = round((time.perf_counter() - started) * 1000, 1)
+                print("Database initialized.")
+            if emotion_analyzer is None:
+                started = time.perf_counter()
+                analyzer = get_analyzer()
+                _component_timings['emotion_analyzer_ms'] = round((time.perf_counter() - started) * 1000, 1)
+                # Warm-up inference so the first user doesn't pay for lazy allocations
+                started = time.perf_counter()
+                analyzer.warm_up()
+                _component_timings['warm_up_ms'] = round((time.perf_counter() - started) * 1000, 1)
+                emotion_analyzer = analyzer
+                print("Emotion Analyzer initialized.")
+            if chatbot is None:
+                started = time.perf_counter()
+                chatbot = get_chatbot()
+                # Rebuild a user's chat context from the conversations table on a
+                # cache miss, or when another worker saved turns for that user
+                chatbot.history_loader = database.get_recent_messages
+                chatbot.history_version = database.get_conversation_version
+                _component_timings['chatbot_ms'] = round((time.perf_counter() - started) * 1000, 1)
+                print("Chatbot initialized.")
+        except Exception as e:
+            _init_error = str(e)
+            print(f"Component initialization failed: {e}")
+            import traceback
+            traceback.print_exc()
+            return
+        _components_ready.set()
+        print("All components ready!")
+
+def start_background_init():
+    """Start component initialization in a background thread (once per process)."""
+    global _init_thread
+    with _init_thread_lock:
+        if _components_ready.is_set():
+            return
+        if _init_thread is not None and _init_thread.is_alive():
+            return
+        _init_thread = threading.Thread(target=initialize_components, name="component-init", daemon=True)
+        _init_thread.start()
+
+def preload_models():
+    """
+    Load and warm up the emotion model in the gunicorn master before workers
+    fork, so every worker shares the weights copy-on-write instead of
+    loading its own copy. The database and chatbot are still created per
+    worker by start_background_init() in the post_fork hook.
+    """
+    if os.getenv('EMOTION_BACKEND', 'torch') != 'torch':
+        # onnxruntime sessions own thread pools that don't survive fork
+        print("Skipping model preload for non-torch backend; workers load their own copy.")
         return
-    _components_initializing = True
-    print("Initializing components...")
-    if database is None:
-        database = get_database()
-        print("Database initialized.")
-    if emotion_analyzer is None:
-        emotion_analyzer = get_analyzer()
-        print("Emotion Analyzer initialized.")
-    if chatbot is None:
-        chatbot = get_chatbot()
-        print("Chatbot initialized.")
-    _components_initialized = True
-    _components_initializing = False
-    print("All components ready!")
+    if os.getenv('EMOTION_INFERENCE_MODE', 'local') == 'pool':
+        # The model lives in the inference processes, not the web workers
+        print("Skipping model preload in pool inference mode.")
+        return
+    started = time.perf_counter()
+    # Keep OpenMP thread pools out of the master; workers size their own after fork
+    configure_inference_threads(1)
+    get_analyzer().warm_up()
+    _component_timings['preload_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    print("Emotion model preloaded in master process.")
 
 @app.before_request
 def ensure_initialized():
-    """Lazy initialize on first request that needs components."""
-    # Don't block health check
-    if request.endpoint == 'health':
+    """Wait (bounded) for background initialization before serving requests."""
+    # Health and metrics endpoints never block
+    if request.endpoint in ('health', 'liveness', 'readiness', 'metrics'):
         return
-    # Initialize if needed
-    if not _components_initialized and not _components_initializing:
-        initialize_components()
+    if not _components_ready.is_set():
+        # Restarts initialization if a previous attempt failed
+        start_background_init()
+        if not _components_ready.wait(timeout=INIT_WAIT_SECONDS):
+            return jsonify({"error": "Service initializing, please try again"}), 503
+
+def _parse_result_options(data):
+    """Read the optional top_k / min_score trimming options from a request body."""
+    top_k = data.get('top_k')
+    min_score = data.get('min_score')
+    if top_k is not None and (not isinstance(top_k, int) or isinstance(top_k, bool) or top_k < 0):
+        raise ValueError("top_k must be a non-negative integer")
+    if min_score is not None and (not isinstance(min_score, (int, float)) or isinstance(min_score, bool)):
+        raise ValueError("min_score must be a number")
+    return top_k, min_score
+
+def _readiness():
+    # EmotionAnalyzer catches a failed model load and keeps classifier=None;
+    # a worker without a model must not be put into rotation
+    model_loaded = emotion_analyzer is not None and emotion_analyzer.classifier is not None
+    error = _init_error
+    if error is None and emotion_analyzer is not None and not model_loaded:
+        error = "Emotion model failed to load"
+    return {
+        "ready": _components_ready.is_set() and model_loaded,
+        "components": {
+            "database": database is not None,
+            "emotion_analyzer": model_loaded,
+            "chatbot": chatbot is not None
+        },
+        "timings": dict(_component_timings),
+        "error": error
+    }
 
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint - responds immediately."""
-    status = "healthy" if _components_initialized else "initializing"
+    state = _readiness()
+    if state["ready"]:
+        status = "healthy"
+    elif _components_ready.is_set():
+        status = "degraded"
+    else:
+        status = "initializing"
     return jsonify({
         "status": status, 
-        "message": f"Empath.ai API is {status}"
+        "message": f"Empath.ai API is {status}",
+        **state
+    })
+
+@app.route('/health/live', methods=['GET'])
+def liveness():
+    """Liveness probe - the process is up and serving requests."""
+    return jsonify({"status": "alive"})
+
+@app.route('/health/ready', methods=['GET'])
+def readiness():
+    """Readiness probe - 200 only once every component is loaded and warmed up."""
+    state = _readiness()
+    return jsonify(state), (200 if state["ready"] else 503)
+
+# Begin loading models at boot rather than on the first request.
+# Under gunicorn.conf.py (preload_app) the master loads the model once and
+# each worker starts its own initialization thread after fork.
+if os.getenv('PRELOAD_MODELS') == '1':
+    preload_models()
+elif os.getenv('EAGER_INIT', '1') == '1':
+    start_background_init()
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Inference metrics (batch sizes, queue depth, cache hit rate) and dependency state for tuning."""
+    return jsonify({
+        "emotion_analyzer": emotion_analyzer.get_metrics() if emotion_analyzer else None,
+        "external_sentiment": get_external_analyzer().get_metrics(),
+        "hedging": get_hedged_analyzer().get_metrics() if emotion_analyzer else None,
+        "chat_context": chatbot.context.get_metrics() if chatbot else None,
+        "prompts": chatbot.get_prompt_metrics() if chatbot else None,
+        "llm": chatbot.get_llm_metrics() if chatbot else None,
+        "chat_stream": _stream_metrics(),
+        "timeouts": get_timeout_metrics()
     })
 
 @app.route('/auth/register', methods=['POST'])
@@ -238,6 +388,9 @@ def chat():
         if not user_message:
             return jsonify({"error": "No message provided"}), 400
         
+        if len(user_message) > MAX_MESSAGE_CHARS:
+            return jsonify({"error": f"Message too long (max {MAX_MESSAGE_CHARS} characters)"}), 413
+        
         # Check if components are initialized
         if emotion_analyzer is None:
             print("ERROR: emotion_analyzer is None!")
@@ -251,44 +404,29 @@ def chat():
             print("ERROR: database is None!")
             return jsonify({"error": "Service initializing, please try again"}), 503
         
-        # Analyze emotion
-        try:
-            # 1. Try External API first
-            from mlmodel.external_sentiment import get_external_analyzer
-            ext_analyzer = get_external_analyzer()
-            print("Attempting external sentiment analysis...")
-            emotion_data = ext_analyzer.analyze(user_message)
-            print(f"External analysis result: {emotion_data}")
-            
-        except Exception as e:
-            print(f"External API failed ({e}), falling back to local model...")
-            # 2. Fallback to Local Model
-            try:
-                emotion_data = emotion_analyzer.analyze(user_message)
-                # Mark as local source
-                emotion_data['source'] = 'local_model'
-                print(f"Local analysis result: {emotion_data}")
-            except Exception as local_e:
-                print(f"Local analysis error: {local_e}")
-                import traceback
-                traceback.print_exc()
-                emotion_data = {"emotion": "neutral", "confidence": 0.5, "source": "fallback"}
+        # Analyze emotion with the external API and/or the local model
+        # (see EMOTION_HEDGE_POLICY). "source" records which path produced the
+        # result: external_api, external_api:probe (circuit half-open), or the
+        # local model, tagged with why the external API wasn't used
+        emotion_data = get_hedged_analyzer().analyze(user_message)
+        print(f"Emotion analysis result: {emotion_data}")
         
         # Save user message to database
         try:
-            database.save_conversation(
+            message_id = database.save_conversation(
                 user_id=user_id,
                 message=user_message,
                 sender='user',
                 emotion=emotion_data.get('emotion'),
                 confidence=emotion_data.get('confidence')
             )
+            chatbot.record_saved(user_id, message_id)
         except Exception as e:
             print(f"Database save error: {e}")
         
         # Generate response
         try:
-            response = chatbot.generate_response(user_message, emotion_data)
+            response = chatbot.generate_response(user_message, emotion_data, user_id=user_id)
             print(f"Chatbot response: {response[:100]}...")
         except Exception as e:
             print(f"Chatbot error: {e}")
@@ -298,11 +436,12 @@ def chat():
         
         # Save bot response to database
         try:
-            database.save_conversation(
+            message_id = database.save_conversation(
                 user_id=user_id,
                 message=response,
                 sender='bot'
             )
+            chatbot.record_saved(user_id, message_id)
         except Exception as e:
             print(f"Database save bot response error: {e}")
         
@@ -310,6 +449,7 @@ def chat():
             "response": response,
             "emotion": emotion_data.get("emotion"),
             "confidence": emotion_data.get("confidence"),
+            "source": emotion_data.get("source"),
             "timestamp": datetime.now().isoformat()
         })
     
@@ -322,6 +462,130 @@ def chat():
             "message": str(e)
         }), 500
 
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Like /chat, but streams the reply as Server-Sent Events.
+    Requires authentication.
+    
+    Expected JSON body:
+    {
+        "message": "user's message text"
+    }
+    
+    Events, in order:
+        event: emotion   data: {"emotion", "confidence", "source"}
+        event: delta     data: {"text"}  (repeated, while the LLM generates)
+        event: reply     data: {"text", "kind"}  (instead of deltas: a crisis
+                         response, acknowledgement or template fallback,
+                         sent whole)
+        event: done      data: {"response", "timestamp", "ttfb_ms"}
+    
+    The full reply is saved to the conversation history when the stream
+    ends (also if the client disconnects early).
+    """
+    started = time.perf_counter()
+    try:
+        if 'user_id' not in session:
+            return jsonify({"error": "Authentication required"}), 401
+        
+        user_id = session['user_id']
+        
+        data = request.get_json()
+        user_message = data.get('message', '')
+        
+        if not user_message:
+            return jsonify({"error": "No message provided"}), 400
+        
+        if len(user_message) > MAX_MESSAGE_CHARS:
+            return jsonify({"error": f"Message too long (max {MAX_MESSAGE_CHARS} characters)"}), 413
+        
+        if emotion_analyzer is None or chatbot is None or database is None:
+            return jsonify({"error": "Service initializing, please try again"}), 503
+    except Exception as e:
+        print(f"Error in /chat/stream endpoint: {e}")
+        return jsonify({"error": "Internal server error", "message": str(e)}), 500
+    
+    def events():
+        # Headers are already out; the emotion event is the first data
+        emotion_data = get_hedged_analyzer().analyze(user_message)
+        yield _sse("emotion", {
+            "emotion": emotion_data.get("emotion"),
+            "confidence": emotion_data.get("confidence"),
+            "source": emotion_data.get("source")
+        })
+        
+        try:
+            message_id = database.save_conversation(
+                user_id=user_id,
+                message=user_message,
+                sender='user',
+                emotion=emotion_data.get('emotion'),
+                confidence=emotion_data.get('confidence')
+            )
+            chatbot.record_saved(user_id, message_id)
+        except Exception as e:
+            print(f"Database save error: {e}")
+        
+        parts = []
+        ttfb_ms = None
+        kind = "llm"
+        try:
+            for kind_or_delta, text in chatbot.generate_response_stream(user_message, emotion_data, user_id=user_id):
+                if ttfb_ms is None:
+                    ttfb_ms = round((time.perf_counter() - started) * 1000.0, 1)
+                    _stream_ttfb.add(ttfb_ms)
+                parts.append(text)
+                if kind_or_delta == "delta":
+                    yield _sse("delta", {"text": text})
+                else:
+                    kind = kind_or_delta
+                    yield _sse("reply", {"text": text, "kind": kind})
+        except Exception as e:
+            print(f"Chatbot streaming error: {e}")
+            import traceback
+            traceback.print_exc()
+            if not parts:
+                kind = "error"
+                parts.append("I'm having a little trouble thinking clearly. Could you say that again?")
+                yield _sse("reply", {"text": parts[0], "kind": kind})
+        finally:
+            # Runs on normal completion and when the client goes away
+            response = "".join(parts).strip()
+            if response:
+                try:
+                    message_id = database.save_conversation(user_id=user_id, message=response, sender='bot')
+                    chatbot.record_saved(user_id, message_id)
+                except Exception as e:
+                    print(f"Database save bot response error: {e}")
+            _stream_total.add((time.perf_counter() - started) * 1000.0)
+            with _stream_counts_lock:
+                _stream_counts[kind] = _stream_counts.get(kind, 0) + 1
+        
+        yield _sse("done", {
+            "response": response,
+            "timestamp": datetime.now().isoformat(),
+            "ttfb_ms": ttfb_ms
+        })
+    
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+def _stream_metrics():
+    with _stream_counts_lock:
+        counts = dict(_stream_counts)
+    return {
+        "ttfb_ms": _stream_ttfb.snapshot(),
+        "total_ms": _stream_total.snapshot(),
+        "replies": counts
+    }
+
 @app.route('/analyze_emotion', methods=['POST'])
 def analyze_emotion():
     """
@@ -329,7 +593,9 @@ def analyze_emotion():
     
     Expected JSON body:
     {
-        "text": "text to analyze"
+        "text": "text to analyze",
+        "top_k": 3,            (optional) only return the 3 highest-scoring emotions
+        "min_score": 0.05      (optional) only return emotions scoring at least 0.05
     }
     
     Returns:
@@ -346,7 +612,15 @@ def analyze_emotion():
         if not text:
             return jsonify({"error": "No text provided"}), 400
         
-        emotion_data = emotion_analyzer.analyze(text)
+        try:
+            top_k, min_score = _parse_result_options(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        if len(text) > MAX_MESSAGE_CHARS:
+            return jsonify({"error": f"Text too long (max {MAX_MESSAGE_CHARS} characters)"}), 413
+        
+        emotion_data = emotion_analyzer.analyze(text, top_k=top_k, min_score=min_score)
         
         return jsonify(emotion_data)
     
@@ -357,6 +631,79 @@ def analyze_emotion():
             "message": str(e)
         }), 500
 
+@app.route('/analyze_emotion/batch', methods=['POST'])
+def analyze_emotion_batch():
+    """
+    Analyze the emotions in a list of texts in one request.
+    
+    Expected JSON body:
+    {
+        "texts": ["first text", "second text", ...],
+        "top_k": 3,            (optional, as in /analyze_emotion)
+        "min_score": 0.05      (optional, as in /analyze_emotion)
+    }
+    
+    Returns results in the same order as the input. Items that failed are
+    null in "results" and listed in "errors":
+    {
+        "results": [{"emotion": "joy", "confidence": 0.92, "all_emotions": {...}}, null],
+        "errors": [{"index": 1, "error": "Text must be a non-empty string"}],
+        "count": 2
+    }
+    """
+    try:
+        data = request.get_json()
+        texts = data.get('texts')
+        
+        if not isinstance(texts, list) or not texts:
+            return jsonify({"error": "texts must be a non-empty list"}), 400
+        
+        try:
+            top_k, min_score = _parse_result_options(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        max_batch = int(os.getenv('MAX_ANALYZE_BATCH', 64))
+        if len(texts) > max_batch:
+            return jsonify({"error": f"Too many texts (max {max_batch})"}), 413
+        
+        results = [None] * len(texts)
+        errors = []
+        
+        # Validate items first; only well-formed texts go to the model
+        valid_indexes = []
+        for i, text in enumerate(texts):
+            if not isinstance(text, str) or not text.strip():
+                errors.append({"index": i, "error": "Text must be a non-empty string"})
+            elif len(text) > MAX_MESSAGE_CHARS:
+                errors.append({"index": i, "error": f"Text too long (max {MAX_MESSAGE_CHARS} characters)"})
+            else:
+                valid_indexes.append(i)
+        
+        analyzed = emotion_analyzer.analyze_batch(
+            [texts[i] for i in valid_indexes], top_k=top_k, min_score=min_score
+        )
+        for i, result in zip(valid_indexes, analyzed):
+            if "error" in result:
+                errors.append({"index": i, "error": result["error"]})
+            else:
+                results[i] = result
+        
+        errors.sort(key=lambda e: e["index"])
+        
+        return jsonify({
+            "results": results,
+            "errors": errors,
+            "count": len(texts)
+        })
+    
+    except Exception as e:
+        print(f"Error in /analyze_emotion/batch endpoint: {e}")
+        return jsonify({
+            "error": "Internal server error",
+            "message": str(e)
+        }), 500
+
 @app.route('/mood_history', methods=['GET'])
 def mood_history():
     """
@@ -391,7 +738,7 @@ def mood_history():
 
 if __name__ == '__main__':
     print("Starting Empath.ai Backend API...")
-    print("Server starting... (models will load on first request)")
+    print("Server starting... (models are loading in the background)")
     
     # Get configuration from environment variables
     host = os.getenv('HOST', '0.0.0.0')
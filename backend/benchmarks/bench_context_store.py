@@ -0,0 +1,99 @@
+"""
+Show that per-user chat context stays within its memory cap as users grow.
+
+Usage (from backend/):
+    python benchmarks/bench_context_store.py [--users 100000] [--turns 6] [--max-mb 64]
+
+Simulates --users active users, each sending --turns messages (texts from
+benchmarks/emotion_corpus.jsonl, with bot replies), interleaved the way
+concurrent conversations arrive. Python heap use is measured with
+tracemalloc and reported alongside the store's own size estimate at a few
+checkpoints, for the bounded store and for an unbounded dict of lists
+(what a per-user dict without eviction would cost).
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../mlmodel')))
+
+from context_store import ConversationContextStore
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), 'emotion_corpus.jsonl')
+
+
+def waves(users, turns, texts, seed):
+    # Users arrive in waves of 1000 interleaved conversations; yields
+    # (users seen so far, [(user_id, role, content), ...]) per wave
+    rng = random.Random(seed)
+    for wave in range(0, users, 1000):
+        active = list(range(wave, min(users, wave + 1000)))
+        steps = []
+        for _ in range(turns):
+            rng.shuffle(active)
+            for user in active:
+                steps.append((user, "user", rng.choice(texts)))
+                steps.append((user, "assistant", rng.choice(texts)))
+        yield min(users, wave + 1000), steps
+
+
+def run(name, append, metrics, users, turns, texts):
+    checkpoints = {users // 10, users // 4, users // 2, users}
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    elapsed = 0.0
+    rows = []
+    for users_seen, steps in waves(users, turns, texts, seed=0):
+        started = time.perf_counter()
+        for user, role, content in steps:
+            append(user, role, content)
+        elapsed += time.perf_counter() - started
+        del steps
+        if users_seen in checkpoints:
+            rows.append(dict(users_seen=users_seen,
+                             heap_mb=round((tracemalloc.get_traced_memory()[0] - baseline) / 2**20, 1),
+                             **metrics()))
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return {"store": name, "appends_per_sec": round(2 * users * turns / elapsed), "peak_heap_mb": round(peak / 2**20, 1),
+            "checkpoints": rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--turns', type=int, default=6)
+    parser.add_argument('--max-mb', type=float, default=64)
+    parser.add_argument('--max-turns', type=int, default=20)
+    args = parser.parse_args()
+
+    with open(CORPUS_PATH) as f:
+        texts = [json.loads(line)["text"] for line in f if line.strip()]
+
+    store = ConversationContextStore(max_turns=args.max_turns, max_bytes=int(args.max_mb * 2**20))
+
+    def store_metrics():
+        m = store.get_metrics()
+        return {"cached_users": m["users"], "estimated_mb": round(m["bytes"] / 2**20, 1), "evictions": m["evictions"]}
+
+    unbounded = {}
+
+    def unbounded_append(user, role, content):
+        history = unbounded.setdefault(user, [])
+        history.append({"role": role, "content": content})
+        del history[:-args.max_turns]
+
+    results = [
+        run("bounded", store.append, store_metrics, args.users, args.turns, texts),
+        run("unbounded dict", unbounded_append, lambda: {"cached_users": len(unbounded)}, args.users, args.turns, texts),
+    ]
+    print(json.dumps({"users": args.users, "turns_per_user": args.turns, "max_mb": args.max_mb,
+                      "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Per-message cost of the crisis check as the pattern list grows.
+
+Usage (from backend/):
+    python benchmarks/bench_crisis_detector.py [--sizes 14,50,100,200,500] [--repeats 5]
+
+Compares the old check (re.search per pattern over the lowercased
+message) with CrisisDetector's single compiled alternation. The first size
+uses Chatbot's real pattern list; larger sizes add synthetic phrase
+patterns of the same shape ("word\\s*word"). Messages come from
+benchmarks/emotion_corpus.jsonl plus a few long ones, none of which match,
+so every pattern has to be ruled out (the worst case for the loop).
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../mlmodel')))
+
+from crisis_detector import CrisisDetector
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), 'emotion_corpus.jsonl')
+
+# Chatbot.crisis_keywords
+BASE_PATTERNS = [
+    r"kill\s*myself", r"suicid",
+    r"end\s*my\s*life", r"hurt\s*myself",
+    r"wanna\s*die", r"want\s*to\s*die",
+    r"better\s*off\s*dead", r"no\s*reason\s*to\s*live",
+    r"give\s*up", r"kill\s*my\s*family", r"murder",
+    r"harm\s*others", r"end\s*it\s*all", r"jump\s*off"
+]
+
+WORDS = ["hopeless", "worthless", "trapped", "burden", "overdose", "pills", "bridge", "rope", "goodbye",
+         "disappear", "vanish", "numb", "empty", "cut", "bleed", "gun", "knife", "unbearable", "forever", "tonight"]
+
+
+def make_patterns(size, rng):
+    patterns = list(BASE_PATTERNS)
+    while len(patterns) < size:
+        patterns.append(r"\s*".join(rng.sample(WORDS, rng.randint(2, 3))))
+    return patterns[:size]
+
+
+def load_messages():
+    with open(CORPUS_PATH) as f:
+        messages = [json.loads(line)["text"] for line in f if line.strip()]
+    messages += [" ".join(messages[i:i + 8]) for i in range(0, len(messages), 8)]
+    return messages
+
+
+def time_per_message(check, messages, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for message in messages:
+            check(message)
+        best = min(best, time.perf_counter() - started)
+    return best / len(messages) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='14,50,100,200,500')
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    messages = load_messages()
+    results = []
+    for size in (int(s) for s in args.sizes.split(',')):
+        patterns = make_patterns(size, rng)
+        detector = CrisisDetector(patterns)
+
+        def loop(message):
+            message_lower = message.lower()
+            for pattern in patterns:
+                if re.search(pattern, message_lower):
+                    return True
+            return False
+
+        mismatches = sum(loop(m) != detector.is_crisis(m) for m in messages)
+        loop_us = time_per_message(loop, messages, args.repeats)
+        compiled_us = time_per_message(detector.is_crisis, messages, args.repeats)
+        results.append({
+            "patterns": size,
+            "loop_us_per_message": round(loop_us, 2),
+            "compiled_us_per_message": round(compiled_us, 2),
+            "speedup": round(loop_us / compiled_us, 1),
+            "mismatches": mismatches,
+        })
+    print(json.dumps({"messages": len(messages), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Measure per-call overhead of the external sentiment client against a local stub.
+
+Usage (from backend/):
+    python benchmarks/bench_external_client.py [--calls 500] [--concurrency 4] [--latency-ms 0]
+
+Starts a keep-alive HTTP/1.1 stub of the sentiment service on localhost
+and calls it the old way (a bare requests.post per message, so a new
+TCP connection each time) and through ExternalSentimentAnalyzer's pooled
+session. The stub answers instantly unless --latency-ms is set, so the
+reported latency is mostly client and connection overhead. The stub also
+counts the TCP connections it accepted, which shows the reuse directly.
+Over TLS the gap is larger, since every new connection adds a handshake.
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../mlmodel')))
+
+from external_sentiment import ExternalSentimentAnalyzer
+from metrics import RollingStats
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    latency = 0.0
+    _lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        # Like a real server: no Nagle delay between the header and body writes
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with StubHandler._lock:
+            StubHandler.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.latency:
+            time.sleep(self.latency)
+        body = json.dumps({"label": "joy", "score": 0.93}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def drive(call, calls, concurrency):
+    latency = RollingStats(window=calls)
+    per_thread = calls // concurrency
+
+    def worker():
+        for _ in range(per_thread):
+            started = time.perf_counter()
+            call()
+            latency.add((time.perf_counter() - started) * 1000.0)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return latency.snapshot(), round(per_thread * concurrency / elapsed, 1)
+
+
+def measure(name, call, calls, concurrency):
+    StubHandler.connections = 0
+    snapshot, calls_per_sec = drive(call, calls, concurrency)
+    return {
+        "client": name,
+        "calls_per_sec": calls_per_sec,
+        "latency_ms": {key: snapshot[key] for key in ("mean", "p50", "p95", "p99")},
+        "tcp_connections": StubHandler.connections,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    args = parser.parse_args()
+
+    StubHandler.latency = args.latency_ms / 1000.0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/analyze"
+
+    os.environ['EXTERNAL_SENTIMENT_URL'] = url
+    os.environ.setdefault('EXTERNAL_SENTIMENT_POOL_SIZE', str(args.concurrency))
+    pooled = ExternalSentimentAnalyzer()
+
+    def bare_call():
+        # What ExternalSentimentAnalyzer.analyze used to do
+        requests.post(url, json={"text": "I'm so happy today"}, timeout=10).json()
+
+    # Warm both paths (imports, first connection)
+    bare_call()
+    pooled.analyze("warm up")
+
+    results = [
+        measure("requests.post per call", bare_call, args.calls, args.concurrency),
+        measure("pooled session", lambda: pooled.analyze("I'm so happy today"), args.calls, args.concurrency),
+    ]
+    server.shutdown()
+    print(json.dumps({"calls": args.calls, "concurrency": args.concurrency,
+                      "stub_latency_ms": args.latency_ms, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
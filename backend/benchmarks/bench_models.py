@@ -0,0 +1,166 @@
+"""
+Compare candidate emotion models on speed and quality.
+
+Usage (from backend/):
+    python benchmarks/bench_models.py --models SamLowe/roberta-base-go_emotions ./models/distilroberta-go \\
+        [--backend torch] [--batch-sizes 1 8 32] [--threads 1 4] [--repeats 3] [--output results.jsonl]
+
+The first model is the reference. Every model x batch size x thread count
+runs in its own subprocess (so peak RSS and thread settings don't leak
+between runs) over the labelled corpus in benchmarks/emotion_corpus.jsonl,
+with the cache, micro-batcher and lexicon tier off so only the model is
+measured. Reports per config:
+
+- texts/sec and p50/p95 latency per batch call
+- peak RSS of the process
+- accuracy: top label equals the corpus label
+- agreement: top label equals the reference model's (same batch size and threads)
+
+The JSON report carries a timestamp and git commit so runs can be
+appended to a history file (--output) and tracked over time.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../mlmodel')))
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), 'emotion_corpus.jsonl')
+
+
+def load_corpus():
+    with open(CORPUS_PATH) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def run_config(config):
+    """Benchmark one model/batch size/thread count in this process (the child side)."""
+    os.environ['EMOTION_CACHE'] = '0'
+    os.environ['EMOTION_BATCHING'] = '0'
+    os.environ['EMOTION_TIER0'] = '0'
+    os.environ['EMOTION_INFERENCE_MODE'] = 'local'
+
+    from emotion_analyzer import EmotionAnalyzer, configure_inference_threads
+    from metrics import RollingStats
+
+    configure_inference_threads(config["threads"])
+    load_started = time.perf_counter()
+    analyzer = EmotionAnalyzer(model_name=config["model"], backend=config["backend"])
+    if analyzer.classifier is None:
+        raise RuntimeError(f"Could not load {config['model']}")
+    load_seconds = time.perf_counter() - load_started
+    analyzer.warm_up()
+
+    corpus = load_corpus()
+    texts = [item["text"] for item in corpus]
+    batch_size = config["batch_size"]
+    analyzer.pipeline_batch_size = batch_size
+
+    latency = RollingStats(window=len(texts) * config["repeats"])
+    started = time.perf_counter()
+    for _ in range(config["repeats"]):
+        for i in range(0, len(texts), batch_size):
+            call_started = time.perf_counter()
+            scores = analyzer._score_texts(texts[i:i + batch_size])
+            latency.add((time.perf_counter() - call_started) * 1000.0)
+    elapsed = time.perf_counter() - started
+
+    top_labels = []
+    for i in range(0, len(texts), batch_size):
+        scores = analyzer._score_texts(texts[i:i + batch_size])
+        top_labels.extend(analyzer.labels[int(row.argmax())] for row in scores)
+
+    snapshot = latency.snapshot()
+    return {
+        "model": config["model"],
+        "backend": config["backend"],
+        "batch_size": batch_size,
+        "threads": config["threads"],
+        "load_seconds": round(load_seconds, 2),
+        "texts_per_sec": round(len(texts) * config["repeats"] / elapsed, 2),
+        "latency_ms": {"p50": snapshot["p50"], "p95": snapshot["p95"]},
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "accuracy": round(sum(1 for a, item in zip(top_labels, corpus) if a == item["label"]) / len(corpus), 4),
+        "top_labels": top_labels,
+    }
+
+
+def spawn_config(config, timeout):
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', json.dumps(config)],
+        capture_output=True, text=True, timeout=timeout
+    )
+    if completed.returncode != 0:
+        return dict(config, error=(completed.stderr.strip().splitlines() or ["failed"])[-1])
+    # The analyzer prints progress; the result is the last stdout line
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--models', nargs='+', default=[os.getenv('EMOTION_MODEL', 'SamLowe/roberta-base-go_emotions')])
+    parser.add_argument('--backend', default='torch')
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 8, 32])
+    parser.add_argument('--threads', nargs='+', type=int, default=[1, os.cpu_count() or 1])
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=1800, help="Seconds per config")
+    parser.add_argument('--output', help="Append the JSON report as one line to this file")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_config(json.loads(args.child))))
+        return
+
+    results = []
+    for model in args.models:
+        for batch_size in args.batch_sizes:
+            for threads in sorted(set(args.threads)):
+                config = {"model": model, "backend": args.backend, "batch_size": batch_size,
+                          "threads": threads, "repeats": args.repeats}
+                print(f"Benchmarking {config}...", file=sys.stderr)
+                results.append(spawn_config(config, args.timeout))
+
+    # Agreement with the reference model run under the same batch size and threads
+    reference = {
+        (r["batch_size"], r["threads"]): r.get("top_labels")
+        for r in results if r["model"] == args.models[0]
+    }
+    for result in results:
+        labels = result.pop("top_labels", None)
+        expected = reference.get((result["batch_size"], result["threads"]))
+        if labels and expected:
+            result["agreement_with_reference"] = round(
+                sum(1 for a, b in zip(labels, expected) if a == b) / len(expected), 4
+            )
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": git_commit(),
+        "reference_model": args.models[0],
+        "corpus_size": len(load_corpus()),
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'a') as f:
+            f.write(json.dumps(report) + "\n")
+
+
+if __name__ == "__main__":
+    main()
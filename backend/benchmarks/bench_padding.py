@@ -0,0 +1,114 @@
+"""
+Compare naive batching with length-bucketed batching on realistic message lengths.
+
+Usage (from backend/):
+    python benchmarks/bench_padding.py [--db empath.db] [--samples 512] [--submit-size 64] [--batch-size 16] [--repeats 3]
+
+Draws user messages from the conversations table (DATABASE_PATH or --db)
+so the benchmark sees the real mix of "thanks" and long vents. If the
+table has fewer than --samples messages, the rest is synthesized from
+benchmarks/emotion_corpus.jsonl with a long-tailed length distribution.
+
+Texts are submitted --submit-size at a time (like one /analyze_emotion/batch
+request of MAX_ANALYZE_BATCH texts) and run in forward passes of
+--batch-size rows (EMOTION_PIPELINE_BATCH_SIZE). Both modes score the same
+submissions in the same order; naive batching cuts each submission into
+passes in submission order, bucketing sorts it by token length first.
+Bucketing can only help when a submission spans several passes, so keep
+--submit-size above --batch-size. Reports texts/sec and the share of
+non-padding tokens.
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../mlmodel')))
+os.environ.setdefault('EMOTION_CACHE', '0')
+os.environ.setdefault('EMOTION_BATCHING', '0')
+
+from emotion_analyzer import EmotionAnalyzer
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), 'emotion_corpus.jsonl')
+
+
+def load_messages(db_path, samples, seed):
+    messages = []
+    if db_path and os.path.exists(db_path):
+        conn = sqlite3.connect(db_path)
+        try:
+            rows = conn.execute(
+                "SELECT message FROM conversations WHERE sender = 'user' ORDER BY RANDOM() LIMIT ?",
+                (samples,)
+            ).fetchall()
+            messages = [row[0] for row in rows if row[0]]
+        except sqlite3.Error as e:
+            print(f"Could not read conversations from {db_path}: {e}", file=sys.stderr)
+        finally:
+            conn.close()
+    from_db = len(messages)
+
+    # Top up with synthetic messages: mostly short, with a long tail of
+    # multi-sentence vents (roughly what chat traffic looks like)
+    with open(CORPUS_PATH) as f:
+        corpus = [json.loads(line)["text"] for line in f if line.strip()]
+    rng = random.Random(seed)
+    while len(messages) < samples:
+        sentences = min(40, int(rng.paretovariate(1.2)))
+        messages.append(" ".join(rng.choice(corpus) for _ in range(sentences)))
+    return messages, from_db
+
+
+def run(analyzer, texts, submit_size, repeats, bucketing):
+    analyzer.length_bucketing = bucketing
+    analyzer.real_tokens = analyzer.padded_tokens = 0
+
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for i in range(0, len(texts), submit_size):
+            analyzer._score_texts(texts[i:i + submit_size])
+    elapsed = time.perf_counter() - started
+
+    real, padded = analyzer.real_tokens, analyzer.padded_tokens
+    return {
+        "mode": "bucketed" if bucketing else "naive",
+        "texts_per_sec": round(len(texts) * repeats / elapsed, 2),
+        "padding_efficiency": round(real / padded, 4) if padded else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=os.getenv('DATABASE_PATH', 'empath.db'))
+    parser.add_argument('--samples', type=int, default=512)
+    parser.add_argument('--submit-size', type=int, default=int(os.getenv('MAX_ANALYZE_BATCH', 64)))
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    texts, from_db = load_messages(args.db, args.samples, args.seed)
+    analyzer = EmotionAnalyzer()
+    if analyzer.classifier is None:
+        raise RuntimeError("Could not load the emotion model")
+    analyzer.pipeline_batch_size = args.batch_size
+    analyzer.warm_up()
+
+    lengths = sorted(analyzer._token_lengths(texts))
+    report = {
+        "samples": len(texts),
+        "from_database": from_db,
+        "token_length_p50": lengths[len(lengths) // 2],
+        "token_length_p95": lengths[int(len(lengths) * 0.95)],
+        "submit_size": args.submit_size,
+        "batch_size": args.batch_size,
+        "results": [run(analyzer, texts, args.submit_size, args.repeats, bucketing) for bucketing in (False, True)],
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
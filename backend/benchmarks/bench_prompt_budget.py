@@ -0,0 +1,79 @@
+"""
+Prompt-token distribution with the fixed 20-message window vs. the token budget.
+
+Usage (from backend/):
+    python benchmarks/bench_prompt_budget.py [--conversations 200] [--turns 30] [--budget 1000]
+
+Replays synthetic conversations through both ways of assembling the
+prompt. User messages come from benchmarks/emotion_corpus.jsonl, with
+about one in eight turning into a long vent (several messages run
+together, repeated); replies are 2-3 sentence templates like the
+assistant's. The budgeted run uses PromptBuilder with a fixed-size stand-in
+summary (no LLM calls). Token counts use TokenCounter, i.e. tiktoken if it
+is installed, else the length heuristic.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../mlmodel')))
+
+from metrics import RollingStats
+from prompt_builder import PromptBuilder, TokenCounter
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), 'emotion_corpus.jsonl')
+
+SYSTEM_PROMPT = "You are Empath.ai, a compassionate and empathetic mental health companion. " * 12
+REPLY = "I hear you, and it makes sense that this feels heavy. What part of it is weighing on you most right now?"
+SUMMARY = "The user has been stressed about work and sleep, and has tried short breaks. " * 3
+
+
+def conversations(count, turns, texts, seed):
+    rng = random.Random(seed)
+    for _ in range(count):
+        history = []
+        for _ in range(turns):
+            message = rng.choice(texts)
+            if rng.random() < 0.125:
+                message = " ".join(rng.sample(texts, 6)) * rng.randint(2, 6)
+            history.append({"role": "user", "content": f"[User's detected emotion: sadness (confidence: 0.80)]\n\nUser: {message}"})
+            yield history
+            history.append({"role": "assistant", "content": REPLY})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--conversations', type=int, default=200)
+    parser.add_argument('--turns', type=int, default=30)
+    parser.add_argument('--budget', type=int, default=1000)
+    parser.add_argument('--max-turn-tokens', type=int, default=400)
+    args = parser.parse_args()
+
+    with open(CORPUS_PATH) as f:
+        texts = [json.loads(line)["text"] for line in f if line.strip()]
+
+    counter = TokenCounter()
+    builder = PromptBuilder(counter, budget_tokens=args.budget, max_turn_tokens=args.max_turn_tokens)
+    samples = args.conversations * args.turns
+    fixed = RollingStats(window=samples)
+    builder.prompt_tokens = RollingStats(window=samples)
+
+    for history in conversations(args.conversations, args.turns, texts, seed=0):
+        # Old assembly: system prompt plus the last 20 messages, whatever their length
+        fixed.add(counter.count_messages([{"role": "system", "content": SYSTEM_PROMPT}] + history[-20:]))
+        builder.build(SYSTEM_PROMPT, history[-20:], summary=SUMMARY if len(history) > 4 else None)
+
+    print(json.dumps({
+        "token_counter": counter.method,
+        "prompts": samples,
+        "fixed_window_20": fixed.snapshot(),
+        f"budget_{args.budget}": builder.prompt_tokens.snapshot(),
+        "turns_dropped": builder.turns_dropped,
+        "turns_clipped": builder.turns_clipped,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Per-message cost of fallback topic routing as the keyword table grows.
+
+Usage (from backend/):
+    python benchmarks/bench_topic_index.py [--sizes 0,1000,5000] [--repeats 5]
+
+Compares the old check_keywords scan (a substring test for every keyword
+of every topic) with TopicIndex. Each size appends synthetic topics with
+that many extra keywords after DEFAULT_TOPICS. Messages come from
+benchmarks/emotion_corpus.jsonl. Also reports how many messages the two
+route differently; those are the substring false positives ("ex" in
+"next") the index no longer makes.
+"""
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../mlmodel')))
+
+from topic_index import DEFAULT_TOPICS, TopicIndex
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), 'emotion_corpus.jsonl')
+
+
+def make_topics(extra_keywords, rng):
+    topics = dict(DEFAULT_TOPICS)
+    for t in range(extra_keywords // 50):
+        keywords = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(6, 10)))
+                    for _ in range(50)]
+        topics[f"synthetic{t}"] = {"keywords": keywords, "responses": ["..."]}
+    return topics
+
+
+def substring_lookup(topics, message):
+    # What check_keywords did before the index
+    msg = message.lower()
+    for topic, data in topics.items():
+        if any(keyword in msg for keyword in data["keywords"]):
+            return topic
+    return None
+
+
+def time_per_message(lookup, messages, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for message in messages:
+            lookup(message)
+        best = min(best, time.perf_counter() - started)
+    return best / len(messages) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='0,1000,5000')
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    with open(CORPUS_PATH) as f:
+        messages = [json.loads(line)["text"] for line in f if line.strip()]
+
+    rng = random.Random(0)
+    results = []
+    for size in (int(s) for s in args.sizes.split(',')):
+        topics = make_topics(size, rng)
+        index = TopicIndex(topics)
+        keywords = sum(len(data["keywords"]) for data in topics.values())
+        results.append({
+            "keywords": keywords,
+            "substring_us_per_message": round(time_per_message(lambda m: substring_lookup(topics, m), messages, args.repeats), 2),
+            "index_us_per_message": round(time_per_message(index.lookup, messages, args.repeats), 2),
+            "routed_differently": sum(substring_lookup(topics, m) != index.lookup(m) for m in messages),
+        })
+    print(json.dumps({"messages": len(messages), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
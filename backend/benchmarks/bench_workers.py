@@ -0,0 +1,143 @@
+"""
+Measure per-worker memory and throughput of the gunicorn setup for 1..N workers.
+
+Usage (from backend/):
+    python benchmarks/bench_workers.py --max-workers 4 [--duration 20] [--concurrency 16]
+
+For each worker count this starts `gunicorn -c gunicorn.conf.py app:app`,
+waits for /health/ready, drives /analyze_emotion with concurrent clients,
+and reports requests/sec plus RSS and PSS per worker. PSS divides shared
+pages between the processes sharing them, so it shows how much of the
+model is really shared copy-on-write.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), 'emotion_corpus.jsonl')
+
+
+def load_corpus():
+    with open(CORPUS_PATH) as f:
+        return [json.loads(line)["text"] for line in f if line.strip()]
+
+
+def child_pids(parent_pid):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # Field 4 is the parent pid; the command name may contain spaces
+                fields = f.read().rsplit(')', 1)[1].split()
+            if int(fields[1]) == parent_pid:
+                children.append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    return children
+
+
+def memory_kb(pid):
+    usage = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in ('Rss', 'Pss'):
+                    usage[key.lower() + '_mb'] = round(int(value.split()[0]) / 1024, 1)
+    except OSError:
+        pass
+    return usage
+
+
+def wait_until_ready(base_url, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{base_url}/health/ready", timeout=2).status_code == 200:
+                return True
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def drive_load(base_url, texts, duration, concurrency):
+    stop_at = time.time() + duration
+    counts = [0] * concurrency
+    errors = [0] * concurrency
+
+    def client(slot):
+        session = requests.Session()
+        i = slot
+        while time.time() < stop_at:
+            # Unique suffix so the result cache doesn't short-circuit the model
+            text = f"{texts[i % len(texts)]} #{slot}-{i}"
+            try:
+                response = session.post(f"{base_url}/analyze_emotion", json={"text": text}, timeout=30)
+                if response.status_code == 200:
+                    counts[slot] += 1
+                else:
+                    errors[slot] += 1
+            except requests.exceptions.RequestException:
+                errors[slot] += 1
+            i += concurrency
+
+    threads = [threading.Thread(target=client, args=(slot,)) for slot in range(concurrency)]
+    started = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.time() - started
+    return round(sum(counts) / elapsed, 2), sum(errors)
+
+
+def run(workers, args, texts):
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), PORT=str(args.port), EMOTION_CACHE='0')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        if not wait_until_ready(base_url, args.startup_timeout):
+            raise RuntimeError(f"gunicorn with {workers} workers never became ready")
+        rps, errors = drive_load(base_url, texts, args.duration, args.concurrency)
+        worker_memory = [memory_kb(pid) for pid in child_pids(server.pid)]
+        return {
+            "workers": workers,
+            "requests_per_sec": rps,
+            "errors": errors,
+            "master": memory_kb(server.pid),
+            "per_worker": worker_memory,
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--startup-timeout', type=float, default=300)
+    args = parser.parse_args()
+
+    texts = load_corpus()
+    reports = [run(n, args, texts) for n in range(1, args.max_workers + 1)]
+    print(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    main()
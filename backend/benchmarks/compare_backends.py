@@ -0,0 +1,80 @@
+"""
+Compare latency of the emotion model backends (torch / onnx / onnx-int8).
+
+Usage:
+    python benchmarks/compare_backends.py [--backends torch onnx onnx-int8] [--repeats 5] [--batch-size 1]
+
+Runs the fixed corpus in benchmarks/emotion_corpus.jsonl through each
+backend and prints per-call latency percentiles, throughput, and top-label
+agreement with the first backend listed.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../mlmodel')))
+os.environ.setdefault('EMOTION_CACHE', '0')
+os.environ.setdefault('EMOTION_BATCHING', '0')
+
+from emotion_analyzer import EmotionAnalyzer
+from metrics import RollingStats
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), 'emotion_corpus.jsonl')
+
+
+def load_corpus():
+    with open(CORPUS_PATH) as f:
+        return [json.loads(line)["text"] for line in f if line.strip()]
+
+
+def run_backend(backend, texts, repeats, batch_size):
+    analyzer = EmotionAnalyzer(backend=backend)
+    if analyzer.classifier is None:
+        raise RuntimeError(f"Could not load the {backend} backend")
+    analyzer.pipeline_batch_size = batch_size
+
+    # Warm-up pass so lazy allocations don't count
+    analyzer.analyze_batch(texts[:batch_size])
+
+    latency = RollingStats(window=len(texts) * repeats)
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for i in range(0, len(texts), batch_size):
+            call_started = time.perf_counter()
+            analyzer._score_texts(texts[i:i + batch_size])
+            latency.add((time.perf_counter() - call_started) * 1000.0)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "backend": backend,
+        "batch_size": batch_size,
+        "texts_per_sec": round(len(texts) * repeats / elapsed, 2),
+        "latency_ms": latency.snapshot(),
+        "top_labels": [r["emotion"] for r in analyzer.analyze_batch(texts)],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', nargs='+', default=list(EmotionAnalyzer.BACKENDS))
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=1)
+    args = parser.parse_args()
+
+    texts = load_corpus()
+    reports = [run_backend(b, texts, args.repeats, args.batch_size) for b in args.backends]
+
+    reference = reports[0]["top_labels"]
+    for report in reports:
+        labels = report.pop("top_labels")
+        report["agreement_with_" + args.backends[0]] = round(
+            sum(1 for a, b in zip(labels, reference) if a == b) / len(texts), 4
+        )
+
+    print(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    main()
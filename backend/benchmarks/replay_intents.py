@@ -0,0 +1,106 @@
+"""
+How many LLM calls the intent fast path saves on recorded traffic.
+
+Usage (from backend/):
+    python benchmarks/replay_intents.py [--db empath.db] [--examples 5]
+    python benchmarks/replay_intents.py --messages traffic.jsonl
+
+Replays user messages in order, either from the conversations table of a
+database (sender 'user', streamed in id order) or from a JSONL file with a
+"text" field per line. Each message goes through the chatbot's order of
+checks: crisis messages never reach the LLM, the remaining ones either
+match a fast-path intent or would have been an LLM call. Prints the calls
+saved per intent, the matcher's cost per message, and a few distinct
+matched messages per intent to eyeball for false positives.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../mlmodel')))
+
+from chatbot import Chatbot
+from intent_matcher import IntentMatcher
+
+
+def messages_from_db(path, chunk_size=1000):
+    conn = sqlite3.connect(path)
+    try:
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                "SELECT id, message FROM conversations WHERE sender = 'user' AND id > ? ORDER BY id LIMIT ?",
+                (last_id, chunk_size)
+            ).fetchall()
+            if not rows:
+                return
+            for row_id, message in rows:
+                yield message
+            last_id = rows[-1][0]
+    finally:
+        conn.close()
+
+
+def messages_from_jsonl(path):
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)["text"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=os.getenv('DATABASE_PATH', 'empath.db'))
+    parser.add_argument('--messages', help="JSONL file of messages to replay instead of the database")
+    parser.add_argument('--max-words', type=int, default=int(os.getenv('INTENT_FASTPATH_MAX_WORDS', 6)))
+    parser.add_argument('--examples', type=int, default=5)
+    args = parser.parse_args()
+
+    messages = messages_from_jsonl(args.messages) if args.messages else messages_from_db(args.db)
+    # The chatbot's own crisis patterns; no API key is needed, nothing is sent
+    bot = Chatbot()
+    matcher = IntentMatcher(max_words=args.max_words)
+
+    total = crisis = 0
+    saved = {}
+    examples = {}
+    match_seconds = 0.0
+    for message in messages:
+        total += 1
+        if bot.check_safety(message):
+            crisis += 1
+            continue
+        started = time.perf_counter()
+        intent = matcher.match(message)
+        match_seconds += time.perf_counter() - started
+        if intent is None:
+            continue
+        saved[intent] = saved.get(intent, 0) + 1
+        shown = examples.setdefault(intent, [])
+        if len(shown) < args.examples and message not in shown:
+            shown.append(message)
+
+    if not total:
+        print("No user messages to replay")
+        return
+
+    llm_calls_before = total - crisis
+    llm_calls_saved = sum(saved.values())
+    print(json.dumps({
+        "messages": total,
+        "crisis": crisis,
+        "llm_calls_before": llm_calls_before,
+        "llm_calls_after": llm_calls_before - llm_calls_saved,
+        "llm_calls_saved": llm_calls_saved,
+        "saved_share": round(llm_calls_saved / llm_calls_before, 4) if llm_calls_before else None,
+        "saved_by_intent": saved,
+        "match_us_per_message": round(match_seconds / llm_calls_before * 1e6, 2) if llm_calls_before else None,
+        "examples": examples,
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
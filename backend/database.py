@@ -44,6 +44,12 @@ class Database:
             )
         ''')
         
+        # Recent messages per user (chat context rebuilds, history pages)
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_conversations_user_id
+            ON conversations (user_id, id)
+        ''')
+        
         # Mood tracking table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS mood_entries (
@@ -238,6 +244,48 @@ class Database:
             for conv in conversations
         ]
     
+    def get_recent_messages(self, user_id, limit=20):
+        """Get a user's last `limit` messages, oldest first (one index range scan)."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT message, sender, emotion, confidence
+            FROM conversations
+            WHERE user_id = ?
+            ORDER BY id DESC
+            LIMIT ?
+        ''', (user_id, limit))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [
+            {
+                'message': row[0],
+                'sender': row[1],
+                'emotion': row[2],
+                'confidence': row[3]
+            }
+            for row in reversed(rows)
+        ]
+    
+    def get_conversation_version(self, user_id):
+        """Return (message count, latest message id) for a user, from the (user_id, id) index alone."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT COUNT(*), MAX(id)
+            FROM conversations
+            WHERE user_id = ?
+        ''', (user_id,))
+        
+        row = cursor.fetchone()
+        conn.close()
+        
+        return (row[0], row[1])
+    
     def save_mood_entry(self, user_id, emotion, intensity, note=None):
         """Save a mood tracking entry."""
         conn = self.get_connection()
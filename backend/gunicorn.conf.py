@@ -0,0 +1,52 @@
+"""
+Gunicorn configuration for the Empath.ai backend.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The app is preloaded in the master so the emotion model weights are loaded
+once and shared copy-on-write by every worker. After fork, each worker gets
+an equal share of the CPU budget for inference threads and starts its own
+database/chatbot initialization.
+
+Environment:
+    PORT              - port to bind (default 5000)
+    WEB_CONCURRENCY   - number of worker processes (default 2)
+    GUNICORN_THREADS  - request threads per worker (default 4)
+    GUNICORN_TIMEOUT  - seconds a worker may be silent before it is restarted (default 120)
+    CPU_BUDGET        - cores to split between workers for inference (default: all cores)
+"""
+import gc
+import os
+
+# Tell app.py to load the model synchronously in the master instead of
+# starting a background thread (threads don't survive fork)
+os.environ.setdefault('PRELOAD_MODELS', '1')
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+preload_app = True
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+
+cpu_budget = int(os.getenv('CPU_BUDGET', os.cpu_count() or 1))
+threads_per_worker = max(1, cpu_budget // workers)
+
+
+def when_ready(server):
+    # Move everything allocated during preload (model weights included) out of
+    # the GC's reach, so collections in workers don't touch those pages and
+    # break copy-on-write sharing.
+    gc.freeze()
+    server.log.info(f"Preload done; {workers} workers x {threads_per_worker} inference threads")
+
+
+def post_fork(server, worker):
+    import app as empath_app
+
+    # Stable slot per worker (ages count up from 1, replacements reuse slots
+    # modulo the worker count), so inference pools pin to different CPUs
+    os.environ['WEB_WORKER_INDEX'] = str((worker.age - 1) % workers)
+
+    empath_app.configure_inference_threads(threads_per_worker)
+    empath_app.start_background_init()
@@ -0,0 +1,214 @@
+"""
+Re-score the emotion/confidence of stored user messages with the current model.
+
+Usage (from backend/):
+    python rescore_conversations.py [--db empath.db] [--workers 4] [--chunk-size 512] [--restart]
+
+User rows are streamed out of the conversations table in id order, one
+chunk at a time (keyset pagination, so nothing is loaded up front and
+each query is an index range scan). Chunks are scored with batched
+EmotionAnalyzer inference, in this process or in --workers processes,
+and written back with one transaction per chunk.
+
+After every committed chunk the last rescored id is saved to the
+checkpoint file, so an interrupted run continues where it stopped. A
+checkpoint written for a different model is ignored and the job starts
+over; --restart forces that.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import time
+from collections import deque
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../mlmodel')))
+
+from dotenv import load_dotenv
+
+_analyzer = None
+
+
+def _set_job_defaults():
+    """Analyzer settings for this job, unless set explicitly in the environment."""
+    # Rows are scored once each; the web-serving cache and micro-batcher only add overhead
+    os.environ.setdefault('EMOTION_CACHE', '0')
+    os.environ.setdefault('EMOTION_BATCHING', '0')
+    # Stored rows should get the model's answer, not the lexicon tier's fixed one
+    os.environ.setdefault('EMOTION_TIER0', '0')
+    os.environ.setdefault('EMOTION_INFERENCE_MODE', 'local')
+
+
+def _init_worker(threads):
+    global _analyzer
+    from emotion_analyzer import EmotionAnalyzer, configure_inference_threads
+
+    _set_job_defaults()
+    configure_inference_threads(threads)
+    _analyzer = EmotionAnalyzer()
+    if _analyzer.classifier is None:
+        raise RuntimeError("Could not load the emotion model")
+
+
+def _score_chunk(texts, batch_size):
+    return score_texts(_analyzer, texts, batch_size)
+
+
+def score_texts(analyzer, texts, batch_size):
+    """Return (emotion, confidence) per text, or None where scoring failed."""
+    scored = []
+    for start in range(0, len(texts), batch_size):
+        for result in analyzer.analyze_batch(texts[start:start + batch_size], top_k=0):
+            if "error" in result:
+                scored.append(None)
+            else:
+                scored.append((result["emotion"], result["confidence"]))
+    return scored
+
+
+def load_checkpoint(path, model_name):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("model") != model_name:
+        print(f"Checkpoint {path} was written for model {checkpoint.get('model')}, starting over")
+        return None
+    return checkpoint
+
+
+def save_checkpoint(path, checkpoint):
+    # Write-then-rename so a crash never leaves a half-written checkpoint
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def read_chunks(conn, after_id, chunk_size):
+    """Yield lists of (id, message) for user rows with id > after_id, in id order."""
+    while True:
+        rows = conn.execute(
+            "SELECT id, message FROM conversations WHERE sender = 'user' AND id > ? ORDER BY id LIMIT ?",
+            (after_id, chunk_size)
+        ).fetchall()
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1][0]
+
+
+def write_chunk(conn, rows, scored):
+    updates = [
+        (result[0], result[1], row_id)
+        for (row_id, _), result in zip(rows, scored) if result is not None
+    ]
+    with conn:
+        conn.executemany("UPDATE conversations SET emotion = ?, confidence = ? WHERE id = ?", updates)
+    return len(updates)
+
+
+def rescore(db_path, checkpoint_path, model_name, chunk_size=512, batch_size=64, workers=1,
+            restart=False, analyzer=None, progress_every=10):
+    """
+    Re-score all user rows in db_path and return a summary dict.
+
+    With workers > 1 chunks are scored in a process pool; at most
+    2 x workers chunks are in flight, and results are written (and
+    checkpointed) in id order so the checkpoint never skips a chunk.
+    """
+    checkpoint = None if restart else load_checkpoint(checkpoint_path, model_name)
+    if checkpoint is None:
+        checkpoint = {"db": os.path.abspath(db_path), "model": model_name, "last_id": 0, "rows": 0, "failed": 0}
+    else:
+        print(f"Resuming after id {checkpoint['last_id']} ({checkpoint['rows']} rows already rescored)")
+
+    conn = sqlite3.connect(db_path, timeout=30)
+    pool = None
+    if workers > 1:
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        pool = multiprocessing.get_context("spawn").Pool(workers, initializer=_init_worker, initargs=(threads,))
+    elif analyzer is None:
+        _init_worker(max(1, os.cpu_count() or 1))
+        analyzer = _analyzer
+
+    rows_done = 0
+    chunks_done = 0
+    started = time.perf_counter()
+
+    def commit(rows, scored):
+        nonlocal rows_done, chunks_done
+        updated = write_chunk(conn, rows, scored)
+        checkpoint["last_id"] = rows[-1][0]
+        checkpoint["rows"] += updated
+        checkpoint["failed"] += len(rows) - updated
+        save_checkpoint(checkpoint_path, checkpoint)
+        rows_done += len(rows)
+        chunks_done += 1
+        if progress_every and chunks_done % progress_every == 0:
+            elapsed = time.perf_counter() - started
+            print(f"Rescored through id {checkpoint['last_id']}: {rows_done} rows, {rows_done / elapsed:.1f} rows/sec")
+
+    try:
+        in_flight = deque()
+        for rows in read_chunks(conn, checkpoint["last_id"], chunk_size):
+            texts = [message for _, message in rows]
+            if pool is None:
+                commit(rows, score_texts(analyzer, texts, batch_size))
+                continue
+            in_flight.append((rows, pool.apply_async(_score_chunk, (texts, batch_size))))
+            # Bounded window: memory stays flat however large the table is
+            while len(in_flight) >= 2 * workers:
+                head_rows, result = in_flight.popleft()
+                commit(head_rows, result.get())
+        while in_flight:
+            head_rows, result = in_flight.popleft()
+            commit(head_rows, result.get())
+    finally:
+        if pool is not None:
+            pool.terminate()
+        conn.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "rows": rows_done,
+        "failed": checkpoint["failed"],
+        "last_id": checkpoint["last_id"],
+        "seconds": round(elapsed, 2),
+        "rows_per_sec": round(rows_done / elapsed, 1) if elapsed else None,
+    }
+
+
+def main():
+    # Before .env, so the job's defaults win over the web server's settings
+    _set_job_defaults()
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=os.getenv('DATABASE_PATH', 'empath.db'))
+    parser.add_argument('--checkpoint', help="Checkpoint file (default: <db>.rescore.json)")
+    parser.add_argument('--chunk-size', type=int, default=512, help="Rows per read/write transaction")
+    parser.add_argument('--batch-size', type=int, default=64, help="Texts per inference call")
+    parser.add_argument('--workers', type=int, default=1, help="Scoring processes")
+    parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        parser.error(f"Database {args.db} not found")
+
+    model_name = f"{os.getenv('EMOTION_MODEL', 'SamLowe/roberta-base-go_emotions')}:{os.getenv('EMOTION_BACKEND', 'torch')}"
+    summary = rescore(
+        args.db,
+        args.checkpoint or args.db + '.rescore.json',
+        model_name,
+        chunk_size=args.chunk_size,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        restart=args.restart,
+    )
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
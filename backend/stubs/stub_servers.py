@@ -0,0 +1,313 @@
+"""
+Local fault-injecting stand-ins for the external sentiment API and OpenAI.
+
+Usage (from backend/):
+    # Stubs only
+    python stubs/stub_servers.py [--sentiment-latency lognormal:80,0.5] [--openai-error-rate 0.05] ...
+
+    # Stubs plus the backend wired to them (gunicorn, or --flask for app.py)
+    python stubs/stub_servers.py --run-backend [--port 5001]
+
+The sentiment stub follows the EXTERNAL_SENTIMENT_URL contract: POST
+{"text": ...} answers {"label": ..., "score": ...}. The OpenAI stub serves
+POST /v1/chat/completions in the Chat Completions format, including
+"stream": true (server-sent events ending in "data: [DONE]").
+
+Each stub takes a latency distribution and fault rates:
+
+    --<stub>-latency      fixed:MS | uniform:LO-HI | lognormal:MEDIAN,SIGMA | exp:MEAN   (milliseconds)
+    --<stub>-error-rate   share of requests answered with HTTP 500
+    --<stub>-timeout-rate share of requests that hang for --hang-seconds (client should time out)
+    --<stub>-malformed-rate share of requests answered with 200 and a broken body
+
+With --seed the fault sequence is reproducible. GET /_stats on either stub
+returns how many requests got each outcome. Streamed replies send one token
+every STUB_STREAM_TOKEN_MS milliseconds (default 15).
+"""
+import argparse
+import json
+import math
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+EMOTIONS = ["joy", "sadness", "anger", "fear", "gratitude", "neutral", "nervousness", "relief"]
+
+REPLIES = [
+    "That sounds like a lot to carry. What feels heaviest right now?",
+    "I hear you. It makes sense that you'd feel this way.",
+    "Thank you for sharing that with me. How are you taking care of yourself today?",
+    "It's okay to feel like this. Would it help to talk through what happened?",
+]
+
+
+def parse_latency(spec):
+    """Turn a latency spec into a function returning a delay in seconds."""
+    kind, _, args = spec.partition(':')
+    if kind == 'fixed':
+        value = float(args or 0) / 1000.0
+        return lambda rng: value
+    if kind == 'uniform':
+        low, high = (float(x) / 1000.0 for x in args.split('-'))
+        return lambda rng: rng.uniform(low, high)
+    if kind == 'lognormal':
+        median, sigma = (float(x) for x in args.split(','))
+        mu = math.log(median / 1000.0)
+        return lambda rng: rng.lognormvariate(mu, sigma)
+    if kind == 'exp':
+        mean = float(args) / 1000.0
+        return lambda rng: rng.expovariate(1.0 / mean)
+    raise argparse.ArgumentTypeError(f"Unknown latency spec '{spec}'")
+
+
+class FaultProfile:
+    """Latency and fault rates for one stub; picks an outcome per request."""
+
+    OUTCOMES = ("ok", "error", "timeout", "malformed")
+
+    def __init__(self, latency, error_rate, timeout_rate, malformed_rate, hang_seconds, seed=None):
+        self.latency = parse_latency(latency)
+        self.latency_spec = latency
+        self.rates = {"error": error_rate, "timeout": timeout_rate, "malformed": malformed_rate}
+        self.hang_seconds = hang_seconds
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = {outcome: 0 for outcome in self.OUTCOMES}
+
+    def draw(self):
+        """Return (outcome, delay_seconds) for the next request."""
+        with self._lock:
+            roll = self._rng.random()
+            delay = self.latency(self._rng)
+            outcome = "ok"
+            for name, rate in self.rates.items():
+                if roll < rate:
+                    outcome = name
+                    break
+                roll -= rate
+            self.counts[outcome] += 1
+        if outcome == "timeout":
+            delay = self.hang_seconds
+        return outcome, delay
+
+    def stats(self):
+        with self._lock:
+            return {"latency": self.latency_spec, "rates": self.rates, "counts": dict(self.counts)}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    profile = None
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_GET(self):
+        if self.path == '/_stats':
+            self._send_json(200, self.profile.stats())
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        try:
+            request = json.loads(body or b'{}')
+        except ValueError:
+            self._send_json(400, {"error": "invalid JSON"})
+            return
+
+        outcome, delay = self.profile.draw()
+        time.sleep(delay)
+        if outcome == "timeout":
+            # Hung long enough for the client to give up; answer nothing useful
+            self.close_connection = True
+            return
+        if outcome == "error":
+            self._send_json(500, {"error": {"message": "injected failure", "type": "server_error"}})
+            return
+        self.respond(request, malformed=outcome == "malformed")
+
+    def respond(self, request, malformed):
+        """Answer a POST that drew a normal (or malformed) outcome; subclasses serve their API here."""
+        self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def _send_json(self, status, payload):
+        self._send_raw(status, json.dumps(payload).encode())
+
+    def _send_raw(self, status, body, content_type='application/json'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class SentimentStubHandler(StubHandler):
+    def respond(self, request, malformed):
+        if malformed:
+            self._send_raw(200, b'{"label": "joy", "sco')
+            return
+        text = request.get("text", "")
+        # Deterministic per text, so repeated runs label messages the same way
+        rng = random.Random(text)
+        self._send_json(200, {"label": rng.choice(EMOTIONS), "score": round(rng.uniform(0.5, 0.99), 3)})
+
+
+class OpenAIStubHandler(StubHandler):
+    def respond(self, request, malformed):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            super().respond(request, malformed)
+            return
+        if malformed:
+            self._send_raw(200, b'{"id": "chatcmpl-stub", "choices": [')
+            return
+
+        reply = random.Random(json.dumps(request.get("messages", []))).choice(REPLIES)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        model = request.get("model", "gpt-3.5-turbo")
+        created = int(time.time())
+
+        if request.get("stream"):
+            self._stream(reply, completion_id, model, created)
+            return
+
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": reply},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 50, "completion_tokens": len(reply.split()), "total_tokens": 50 + len(reply.split())},
+        })
+
+    def _stream(self, reply, completion_id, model, created):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def chunk(delta, finish_reason=None):
+            return {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+
+        events = [chunk({"role": "assistant", "content": ""})]
+        events += [chunk({"content": word}) for word in _split_keep_spaces(reply)]
+        events.append(chunk({}, "stop"))
+        inter_token = float(os.getenv('STUB_STREAM_TOKEN_MS', 15)) / 1000.0
+        for event in events:
+            self._write_chunk(f"data: {json.dumps(event)}\n\n".encode())
+            time.sleep(inter_token)
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+def _split_keep_spaces(text):
+    words = text.split(' ')
+    return [word if i == 0 else ' ' + word for i, word in enumerate(words)]
+
+
+def start_stub(handler_class, profile, port):
+    handler = type(handler_class.__name__, (handler_class,), {"profile": profile})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_profile_args(parser, name, latency):
+    parser.add_argument(f'--{name}-port', type=int, default=0, help="0 picks a free port")
+    parser.add_argument(f'--{name}-latency', default=latency)
+    parser.add_argument(f'--{name}-error-rate', type=float, default=0.0)
+    parser.add_argument(f'--{name}-timeout-rate', type=float, default=0.0)
+    parser.add_argument(f'--{name}-malformed-rate', type=float, default=0.0)
+
+
+def make_profile(args, name, seed):
+    prefix = name.replace('-', '_')
+    return FaultProfile(
+        getattr(args, f'{prefix}_latency'),
+        error_rate=getattr(args, f'{prefix}_error_rate'),
+        timeout_rate=getattr(args, f'{prefix}_timeout_rate'),
+        malformed_rate=getattr(args, f'{prefix}_malformed_rate'),
+        hang_seconds=args.hang_seconds,
+        seed=seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_profile_args(parser, 'sentiment', 'lognormal:80,0.5')
+    add_profile_args(parser, 'openai', 'lognormal:600,0.4')
+    parser.add_argument('--hang-seconds', type=float, default=60, help="How long a 'timeout' request hangs")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--run-backend', action='store_true', help="Also start the backend wired to the stubs")
+    parser.add_argument('--flask', action='store_true', help="Run the backend with app.py instead of gunicorn")
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', 5001)), help="Backend port")
+    args = parser.parse_args()
+
+    sentiment = start_stub(SentimentStubHandler, make_profile(args, 'sentiment', args.seed), args.sentiment_port)
+    openai_stub = start_stub(
+        OpenAIStubHandler, make_profile(args, 'openai', None if args.seed is None else args.seed + 1), args.openai_port
+    )
+    sentiment_url = f"http://127.0.0.1:{sentiment.server_address[1]}/analyze"
+    openai_url = f"http://127.0.0.1:{openai_stub.server_address[1]}/v1"
+    print(f"Sentiment stub: {sentiment_url}")
+    print(f"OpenAI stub:    {openai_url}")
+
+    if not args.run_backend:
+        print(f"\nPoint the backend at them with:\n"
+              f"  EXTERNAL_SENTIMENT_URL={sentiment_url} OPENAI_BASE_URL={openai_url} OPENAI_API_KEY=stub")
+        try:
+            signal.pause()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    env = dict(
+        os.environ,
+        EXTERNAL_SENTIMENT_URL=sentiment_url,
+        OPENAI_BASE_URL=openai_url,
+        OPENAI_API_KEY='stub',
+        PORT=str(args.port),
+    )
+    if args.flask:
+        command = [sys.executable, 'app.py']
+    else:
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app']
+    print(f"Starting backend on port {args.port}: {' '.join(command)}")
+    backend = subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+    try:
+        backend.wait()
+    except KeyboardInterrupt:
+        backend.send_signal(signal.SIGINT)
+        backend.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+import sys
+import os
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../mlmodel')))
+
+
+@pytest.fixture
+def make_analyzer(monkeypatch):
+    """
+    Build an EmotionAnalyzer around a fake classifier, with micro-batching
+    and the result cache off. Extra keyword arguments are environment
+    overrides (EMOTION_WINDOW_TOKENS=5, ...); all of them are undone when
+    the test ends, whether it passed or not.
+    """
+    from emotion_analyzer import EmotionAnalyzer
+
+    def make(classifier, **env):
+        monkeypatch.setenv('EMOTION_BATCHING', '0')
+        monkeypatch.setenv('EMOTION_CACHE', '0')
+        for key, value in env.items():
+            monkeypatch.setenv(key, str(value))
+        return EmotionAnalyzer(classifier=classifier)
+
+    return make
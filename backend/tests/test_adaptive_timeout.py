@@ -0,0 +1,46 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../mlmodel')))
+from adaptive_timeout import AdaptiveTimeout
+
+def make_timeout():
+    return AdaptiveTimeout("test", min_seconds=0.5, max_seconds=10, percentile=99,
+                           multiplier=2.0, window=100, min_samples=10)
+
+def test_starts_at_max_until_warmed_up():
+    timeout = make_timeout()
+    for _ in range(9):
+        timeout.record(0.1)
+    assert timeout.timeout() == 10
+
+def test_tracks_percentile_within_bounds():
+    timeout = make_timeout()
+    for _ in range(98):
+        timeout.record(0.1)
+    timeout.record(1.5)
+    timeout.record(1.5)
+    # p99 of these 100 samples is 1.5s; times the multiplier
+    assert abs(timeout.timeout() - 3.0) < 1e-6
+
+    fast = make_timeout()
+    for _ in range(50):
+        fast.record(0.01)
+    assert fast.timeout() == 0.5
+
+def test_timeouts_let_the_limit_grow():
+    timeout = make_timeout()
+    for _ in range(20):
+        timeout.record(0.3)
+    assert abs(timeout.timeout() - 0.6) < 1e-6
+
+    # The dependency got slower: every call now hits the timeout
+    for _ in range(5):
+        timeout.record_timeout(timeout.timeout())
+    print(f"Metrics: {timeout.get_metrics()}")
+    assert timeout.timeout() == 10
+    assert timeout.timeouts == 5
+
+if __name__ == "__main__":
+    test_starts_at_max_until_warmed_up()
+    test_tracks_percentile_within_bounds()
+    test_timeouts_let_the_limit_grow()
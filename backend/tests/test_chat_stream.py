@@ -0,0 +1,134 @@
+import sys
+import os
+import json
+import pytest
+from types import SimpleNamespace
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../mlmodel')))
+from chatbot import Chatbot
+from llm_client import LLMClient
+
+SAD = {"emotion": "sadness", "confidence": 0.8}
+
+def chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+def make_bot(pieces, fail_after=None):
+    async def create(stream=False, **kwargs):
+        assert stream
+
+        async def chunks():
+            yield chunk(None)  # role-only first chunk
+            for i, piece in enumerate(pieces):
+                if fail_after is not None and i == fail_after:
+                    raise ConnectionError("stream dropped")
+                yield chunk(piece)
+        return chunks()
+
+    bot = Chatbot()
+    bot.client = LLMClient(SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))))
+    return bot
+
+def test_streams_deltas_and_records_reply_in_context():
+    bot = make_bot(["I hear", " you."])
+    events = list(bot.generate_response_stream("rough day", SAD, user_id=1))
+    assert events == [("delta", "I hear"), ("delta", " you.")]
+    assert bot.context.get(1)[-1] == {"role": "assistant", "content": "I hear you."}
+
+def test_crisis_reply_is_one_event_without_calling_llm():
+    bot = make_bot([])
+    bot.client = None
+    events = list(bot.generate_response_stream("I want to kill myself", SAD, user_id=1))
+    assert events == [("crisis", bot.crisis_response)]
+
+def test_without_client_sends_fallback_whole():
+    bot = make_bot([])
+    bot.client = None
+    [(kind, text)] = list(bot.generate_response_stream("I feel down", SAD, user_id=1))
+    assert kind == "fallback"
+    assert text in bot.responses["sadness"] + bot.fallback_responses
+
+def test_failure_before_first_token_falls_back():
+    bot = make_bot(["never sent"], fail_after=0)
+    [(kind, text)] = list(bot.generate_response_stream("my boss yelled at me", SAD, user_id=1))
+    assert kind == "fallback"
+    assert bot.context.get(1)[-1] == {"role": "assistant", "content": text}
+
+def test_failure_midway_keeps_partial_reply():
+    bot = make_bot(["That sounds", " hard", " lost"], fail_after=2)
+    events = list(bot.generate_response_stream("rough day", SAD, user_id=1))
+    assert events == [("delta", "That sounds"), ("delta", " hard")]
+    assert bot.context.get(1)[-1]["content"] == "That sounds hard"
+
+def test_consumer_stopping_early_still_records_what_was_sent():
+    bot = make_bot(["One", " two", " three"])
+    stream = bot.generate_response_stream("rough day", SAD, user_id=2)
+    next(stream)
+    stream.close()
+    assert bot.context.get(2)[-1] == {"role": "assistant", "content": "One"}
+
+@pytest.fixture
+def stream_app(monkeypatch, tmp_path):
+    """The Flask app with a fake analyzer, the streaming chatbot below, and a fresh database."""
+    monkeypatch.setenv('EAGER_INIT', '0')
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    import app as app_module
+    from database import Database
+
+    database = Database(str(tmp_path / "empath.db"))
+    bot = make_bot(["I hear", " you", " today."])
+    bot.history_loader = database.get_recent_messages
+    bot.history_version = database.get_conversation_version
+    analyzer = SimpleNamespace(analyze=lambda text: dict(SAD, source="local_model"))
+    monkeypatch.setattr(app_module, 'emotion_analyzer', analyzer)
+    monkeypatch.setattr(app_module, 'chatbot', bot)
+    monkeypatch.setattr(app_module, 'database', database)
+    monkeypatch.setattr(app_module, 'get_hedged_analyzer', lambda: analyzer)
+    monkeypatch.setattr(app_module._components_ready, 'is_set', lambda: True)
+
+    client = app_module.app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 4
+    return client, database
+
+def parse_events(body):
+    """(event, data) pairs from an SSE body; every data line must be JSON."""
+    events = []
+    for block in body.split("\n\n"):
+        if not block:
+            continue
+        event_line, data_line = block.split("\n")
+        assert event_line.startswith("event: ") and data_line.startswith("data: ")
+        events.append((event_line[len("event: "):], json.loads(data_line[len("data: "):])))
+    return events
+
+def test_endpoint_streams_emotion_deltas_then_done(stream_app):
+    client, database = stream_app
+    response = client.post('/chat/stream', json={"message": "rough day"})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+
+    events = parse_events(response.get_data(as_text=True))
+    assert [name for name, _ in events] == ["emotion", "delta", "delta", "delta", "done"]
+    assert events[0][1] == {"emotion": "sadness", "confidence": 0.8, "source": "local_model"}
+    assert "".join(data["text"] for name, data in events if name == "delta") == "I hear you today."
+    assert events[-1][1]["response"] == "I hear you today."
+    assert [(m['sender'], m['message']) for m in database.get_recent_messages(4)] == [
+        ('user', "rough day"), ('bot', "I hear you today.")]
+
+def test_endpoint_sends_acknowledgement_as_one_reply_event(stream_app):
+    client, _ = stream_app
+    events = parse_events(client.post('/chat/stream', json={"message": "thank you"}).get_data(as_text=True))
+    assert [name for name, _ in events] == ["emotion", "reply", "done"]
+    assert events[1][1]["kind"] == "intent"
+    assert events[2][1]["response"] == events[1][1]["text"]
+
+def test_endpoint_saves_partial_reply_when_client_disconnects(stream_app):
+    client, database = stream_app
+    response = client.post('/chat/stream', json={"message": "rough day"}, buffered=False)
+    chunks = response.iter_encoded()
+    assert next(chunks).startswith(b"event: emotion")
+    assert next(chunks).startswith(b"event: delta")
+    response.close()
+
+    assert [(m['sender'], m['message']) for m in database.get_recent_messages(4)] == [
+        ('user', "rough day"), ('bot', "I hear")]
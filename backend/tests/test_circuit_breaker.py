@@ -0,0 +1,63 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../mlmodel')))
+from circuit_breaker import CircuitBreaker
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def make_breaker(clock):
+    return CircuitBreaker("test", window=10, min_calls=4, failure_rate=0.5, slow_call_ms=1000,
+                          slow_call_rate=0.5, open_seconds=30, half_open_probes=1, clock=clock)
+
+def test_opens_on_failures_and_recovers_through_probe():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+
+    for success in (True, False, True, False):
+        breaker.record(breaker.allow(), success, 50)
+    assert breaker.state == "open"
+    # Open: callers are turned away without calling the dependency
+    assert breaker.allow() is None
+
+    clock.now = 31
+    assert breaker.allow() == "probe"
+    # Only one probe at a time while half-open
+    assert breaker.allow() is None
+    breaker.record("probe", True, 50)
+    assert breaker.state == "closed"
+    assert breaker.allow() == "call"
+
+    metrics = breaker.get_metrics()
+    print(f"Metrics: {metrics}")
+    assert metrics["transitions"] == {"closed->open": 1, "open->half_open": 1, "half_open->closed": 1}
+    assert metrics["rejected"] == 2
+
+def test_slow_calls_open_circuit_and_failed_probe_reopens():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+
+    for elapsed in (1500, 100, 1200, 100):
+        breaker.record(breaker.allow(), True, elapsed)
+    assert breaker.state == "open"
+
+    clock.now = 31
+    breaker.record(breaker.allow(), False, 10)
+    assert breaker.state == "open"
+    clock.now = 40
+    assert breaker.allow() is None
+
+def test_needs_min_calls_before_opening():
+    breaker = make_breaker(FakeClock())
+    for _ in range(3):
+        breaker.record(breaker.allow(), False, 10)
+    assert breaker.state == "closed"
+
+if __name__ == "__main__":
+    test_opens_on_failures_and_recovers_through_probe()
+    test_slow_calls_open_circuit_and_failed_probe_reopens()
+    test_needs_min_calls_before_opening()
@@ -0,0 +1,80 @@
+import sys
+import os
+import random
+import re
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../mlmodel')))
+from chatbot import Chatbot
+from crisis_detector import CrisisDetector
+
+# From test_safety.py
+GOLDEN_UNSAFE = [
+    "I want to kill myself",
+    "I'm thinking about suicide",
+    "I want to hurt myself",
+]
+GOLDEN_SAFE = [
+    "It would be better if I just die",  # not covered by any pattern today
+    "I'm feeling sad today",
+    "I had a bad day at work",
+    "I'm angry at my boss",
+]
+
+ADVERSARIAL = [
+    "", " ", "\n", "KILL MYSELF", "Kill    Myself", "killmyself", "kill\nmyself", "kill\tmy self",
+    "skill myself up", "I feel suicidal", "suiciding", "SUICIDE", "the suicide squad movie",
+    "i wanna die", "wannadie", "I want to  die", "I want to dye my hair", "want to diet",
+    "better off dead", "betteroffdead", "better off without me", "no reason to live",
+    "no reason to leave", "I won't give up", "never gonna give you up", "gave up", "giving up",
+    "kill my family", "kill my family's vibe", "murder", "murdered", "a murder mystery novel",
+    "harm others", "harmothers", "I would never harm anyone", "end it all", "the end of it all",
+    "endmylife", "end my life", "end my lifelong habit", "jump off", "jump off the diving board",
+    "hurt myself", "hurts myself", "hurt my self", "I'm hurting", "hurt  myself!!",
+    "Ünïcödé kill myself ✨", "😭 suicide 😭", "k i l l myself", "kil myself", "kill yourself",
+    "x" * 5000 + " end it all", "end it" + " " * 100 + "all", "give" + " " + "up",
+]
+
+
+def reference_check(patterns, message):
+    # What Chatbot.check_safety did before the compiled detector
+    message_lower = message.lower()
+    return any(re.search(pattern, message_lower) for pattern in patterns)
+
+
+def test_golden_set_matches_test_safety_expectations():
+    bot = Chatbot()
+    for message in GOLDEN_UNSAFE:
+        assert bot.check_safety(message) == bot.crisis_response
+    for message in GOLDEN_SAFE:
+        assert bot.check_safety(message) is None
+
+
+def test_identical_to_per_pattern_search():
+    bot = Chatbot()
+    detector = CrisisDetector(bot.crisis_keywords)
+    for message in GOLDEN_UNSAFE + GOLDEN_SAFE + ADVERSARIAL:
+        assert detector.is_crisis(message) == reference_check(bot.crisis_keywords, message), message
+
+
+def test_identical_with_hundreds_of_patterns():
+    rng = random.Random(0)
+    words = ["hurt", "end", "die", "life", "myself", "give", "up", "off", "all", "dead", "pain", "alone", "it"]
+    patterns = [r"\s*".join(rng.sample(words, rng.randint(1, 3))) for _ in range(300)]
+    detector = CrisisDetector(patterns)
+    for _ in range(500):
+        message = " ".join(rng.choice(words + ["the", "and", "I", "feel"]) for _ in range(rng.randint(0, 12)))
+        assert detector.is_crisis(message) == reference_check(patterns, message), message
+
+
+def test_patterns_that_cannot_be_grouped_keep_their_meaning():
+    patterns = [r"ab|cd", r"k*ill", r"\bdie\b", r"x(y|z)w", r"[|]pipe", r"hurt\s*(myself|others)"]
+    detector = CrisisDetector(patterns)
+    for message in ["cd", "ill", "a b", "diet", "die", "xzw", "xw", "|pipe", "pipe", "hurt others", "hurt them"]:
+        assert detector.is_crisis(message) == reference_check(patterns, message), message
+
+
+def test_reports_first_matching_pattern():
+    detector = CrisisDetector([r"give\s*up", r"kill\s*myself"])
+    assert detector.match("I could kill myself, I give up") == r"give\s*up"
+    assert detector.match("I could kill myself") == r"kill\s*myself"
+    assert detector.match("nothing to see") is None
+    assert CrisisDetector([]).match("kill myself") is None
@@ -0,0 +1,90 @@
+import sys
+import os
+import threading
+from types import SimpleNamespace
+import pytest
+
+@pytest.fixture
+def app_module(monkeypatch):
+    """The app module, imported without starting initialization, with nothing loaded yet."""
+    monkeypatch.setenv('EAGER_INIT', '0')
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    import app as app_module
+
+    for name in ('emotion_analyzer', 'chatbot', 'database', '_init_thread', '_init_error'):
+        monkeypatch.setattr(app_module, name, None)
+    monkeypatch.setattr(app_module, '_components_ready', threading.Event())
+    monkeypatch.setattr(app_module, '_component_timings', {})
+    return app_module
+
+def loaded(app_module, monkeypatch, classifier):
+    analyzer = SimpleNamespace(classifier=classifier, warm_up=lambda: None)
+    monkeypatch.setattr(app_module, 'emotion_analyzer', analyzer)
+    monkeypatch.setattr(app_module, 'chatbot', SimpleNamespace())
+    monkeypatch.setattr(app_module, 'database', SimpleNamespace())
+    app_module._components_ready.set()
+
+def test_live_while_initializing_but_not_ready(app_module):
+    client = app_module.app.test_client()
+    assert client.get('/health/live').status_code == 200
+    response = client.get('/health/ready')
+    assert response.status_code == 503
+    assert response.get_json()["ready"] is False
+    assert client.get('/health').get_json()["status"] == "initializing"
+
+def test_ready_once_model_is_loaded(app_module, monkeypatch):
+    loaded(app_module, monkeypatch, classifier=object())
+    client = app_module.app.test_client()
+    response = client.get('/health/ready')
+    assert response.status_code == 200
+    assert response.get_json()["components"] == {"database": True, "emotion_analyzer": True, "chatbot": True}
+    assert client.get('/health').get_json()["status"] == "healthy"
+
+def test_not_ready_when_model_failed_to_load(app_module, monkeypatch):
+    loaded(app_module, monkeypatch, classifier=None)
+    client = app_module.app.test_client()
+    assert client.get('/health/live').status_code == 200
+    response = client.get('/health/ready')
+    assert response.status_code == 503
+    state = response.get_json()
+    assert state["components"]["emotion_analyzer"] is False
+    assert state["error"]
+    assert client.get('/health').get_json()["status"] == "degraded"
+
+def test_background_init_runs_once(app_module, monkeypatch):
+    calls = {"database": 0, "analyzer": 0, "chatbot": 0}
+    release = threading.Event()
+
+    def get_database():
+        calls["database"] += 1
+        release.wait(5)
+        return SimpleNamespace(get_recent_messages=None, get_conversation_version=None)
+
+    def get_analyzer():
+        calls["analyzer"] += 1
+        return SimpleNamespace(classifier=object(), warm_up=lambda: None)
+
+    def get_chatbot():
+        calls["chatbot"] += 1
+        return SimpleNamespace()
+
+    monkeypatch.setattr(app_module, 'get_database', get_database)
+    monkeypatch.setattr(app_module, 'get_analyzer', get_analyzer)
+    monkeypatch.setattr(app_module, 'get_chatbot', get_chatbot)
+
+    for _ in range(3):
+        app_module.start_background_init()
+    first = app_module._init_thread
+    # Requests arriving during initialization wait on the same attempt
+    waiters = [threading.Thread(target=app_module.initialize_components) for _ in range(3)]
+    for waiter in waiters:
+        waiter.start()
+    release.set()
+    first.join(5)
+    for waiter in waiters:
+        waiter.join(5)
+
+    assert app_module._components_ready.is_set()
+    app_module.start_background_init()
+    assert app_module._init_thread is first
+    assert calls == {"database": 1, "analyzer": 1, "chatbot": 1}
@@ -0,0 +1,124 @@
+import sys
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../mlmodel')))
+from circuit_breaker import CircuitOpenError
+from hedged_analysis import HedgedEmotionAnalyzer
+
+class FakeLocal:
+    """Local model stand-in: always 'sadness', after `delay` seconds."""
+    labels = ["joy", "sadness"]
+
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    def analyze_scores(self, text):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("model down")
+        return np.array([0.1, 0.8], dtype=np.float32)
+
+    def to_result(self, scores, top_k=None, min_score=None):
+        return {"emotion": "sadness", "confidence": float(scores[1]), "all_emotions": {}}
+
+class FakeExternal:
+    """External API stand-in: 'joy' after `delay` seconds, or raises `error`."""
+    api_url = "http://sentiment.test"
+
+    def __init__(self, delay=0.0, error=None):
+        self.delay = delay
+        self.error = error
+
+    def analyze(self, text):
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return {"emotion": "joy", "confidence": 0.9, "source": "external_api"}
+
+@pytest.fixture
+def make_hedger(monkeypatch):
+    """Build a HedgedEmotionAnalyzer; keyword arguments are environment overrides, undone after the test."""
+    def make(policy, local, external, **env):
+        settings = {'EMOTION_HEDGE_PREFER_EXTERNAL_MS': '100', 'EMOTION_HEDGE_BUDGET_MS': '500'}
+        settings.update(env)
+        for key, value in settings.items():
+            monkeypatch.setenv(key, str(value))
+        return HedgedEmotionAnalyzer(local, external, policy=policy)
+
+    return make
+
+def test_fastest_wins(make_hedger):
+    hedger = make_hedger("fastest", FakeLocal(delay=0.0), FakeExternal(delay=0.3))
+    started = time.perf_counter()
+    result = hedger.analyze("hi")
+    assert result["source"] == "local_model:hedged"
+    assert time.perf_counter() - started < 0.2
+
+    hedger = make_hedger("fastest", FakeLocal(delay=0.3), FakeExternal(delay=0.0))
+    assert hedger.analyze("hi")["source"] == "external_api"
+
+def test_prefer_external_within_window(make_hedger):
+    # External answers inside the preference window: it wins even though local was faster
+    hedger = make_hedger("prefer_external", FakeLocal(delay=0.0), FakeExternal(delay=0.05))
+    assert hedger.analyze("hi")["source"] == "external_api"
+
+    # External too slow: local wins once the window is over
+    hedger = make_hedger("prefer_external", FakeLocal(delay=0.0), FakeExternal(delay=0.4))
+    started = time.perf_counter()
+    assert hedger.analyze("hi")["source"] == "local_model:hedged"
+    assert time.perf_counter() - started < 0.3
+
+def test_external_failure_does_not_add_latency(make_hedger):
+    hedger = make_hedger("fastest", FakeLocal(delay=0.1), FakeExternal(error=CircuitOpenError("open")))
+    assert hedger.analyze("hi")["source"] == "local_model:circuit_open"
+
+    hedger = make_hedger("sequential", FakeLocal(), FakeExternal(error=RuntimeError("500")))
+    assert hedger.analyze("hi")["source"] == "local_model:external_error"
+
+def test_hedge_delay_skips_local_when_external_is_fast(make_hedger):
+    local = FakeLocal()
+    hedger = make_hedger("fastest", local, FakeExternal(delay=0.0), EMOTION_HEDGE_DELAY_MS='100')
+    assert hedger.analyze("hi")["source"] == "external_api"
+    assert local.calls == 0
+
+def test_budget_exceeded_returns_neutral(make_hedger):
+    hedger = make_hedger("fastest", FakeLocal(fail=True), FakeExternal(delay=1.0), EMOTION_HEDGE_BUDGET_MS='200')
+    result = hedger.analyze("hi")
+    assert result["source"] == "fallback:budget"
+    assert result["emotion"] == "neutral"
+
+    metrics = hedger.get_metrics()
+    print(f"Metrics: {metrics}")
+    assert metrics["sources"] == {"fallback:budget": 1}
+
+def test_local_only_never_calls_external(make_hedger):
+    hedger = make_hedger("local_only", FakeLocal(), FakeExternal(error=AssertionError("called")))
+    assert hedger.analyze("hi")["source"] == "local_model"
+
+def test_slow_external_does_not_starve_local(make_hedger):
+    # Stuck external calls fill their own pool; local inference still runs,
+    # and calls beyond the cap skip the external API
+    hedger = make_hedger("fastest", FakeLocal(delay=0.02), FakeExternal(delay=1.0),
+                  EMOTION_HEDGE_WORKERS='4', EMOTION_HEDGE_BUDGET_MS='300')
+    with ThreadPoolExecutor(max_workers=12) as pool:
+        results = list(pool.map(hedger.analyze, ["hi"] * 12))
+    sources = {r["source"] for r in results}
+    assert sources <= {"local_model:hedged", "local_model:external_shed"}
+    metrics = hedger.get_metrics()
+    assert metrics["external_shed"] == 8
+    assert metrics["external_in_flight"] <= 4
+
+if __name__ == "__main__":
+    test_fastest_wins()
+    test_prefer_external_within_window()
+    test_external_failure_does_not_add_latency()
+    test_hedge_delay_skips_local_when_external_is_fast()
+    test_budget_exceeded_returns_neutral()
+    test_local_only_never_calls_external()
+    test_slow_external_does_not_starve_local()
@@ -0,0 +1,56 @@
+import sys
+import os
+import threading
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../mlmodel')))
+from inference_batcher import InferenceBatcher
+
+def test_concurrent_calls_are_batched():
+    calls = []
+
+    def batch_fn(items):
+        calls.append(list(items))
+        return [item.upper() for item in items]
+
+    batcher = InferenceBatcher(batch_fn, max_batch_size=8, max_wait_ms=50)
+    texts = [f"message {i}" for i in range(20)]
+    results = {}
+
+    def worker(text):
+        results[text] = batcher.submit(text, timeout=5)
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in texts]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    print(f"Batch sizes: {[len(c) for c in calls]}")
+
+    # Every caller gets its own result
+    for text in texts:
+        assert results[text] == text.upper()
+
+    # Concurrent calls were coalesced and no batch exceeded the limit
+    assert len(calls) < len(texts)
+    assert max(len(c) for c in calls) <= 8
+
+    metrics = batcher.get_metrics()
+    assert metrics["items_processed"] == len(texts)
+    assert metrics["batches_processed"] == len(calls)
+
+def test_batch_errors_reach_every_caller():
+    def batch_fn(items):
+        raise ValueError("model exploded")
+
+    batcher = InferenceBatcher(batch_fn, max_batch_size=4, max_wait_ms=1)
+    try:
+        batcher.submit("hello", timeout=5)
+        assert False, "expected the batch error to propagate"
+    except ValueError as e:
+        print(f"Propagated error: {e}")
+
+    assert batcher.get_metrics()["batch_errors"] == 1
+
+if __name__ == "__main__":
+    test_concurrent_calls_are_batched()
+    test_batch_errors_reach_every_caller()
@@ -0,0 +1,102 @@
+import sys
+import os
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../mlmodel')))
+from inference_pool import InferencePool
+
+class RecordingQueue:
+    """Wraps a worker's request queue to see which worker each request went to."""
+    def __init__(self, queue, index, sent):
+        self.queue = queue
+        self.index = index
+        self.sent = sent
+
+    def put(self, item):
+        self.sent.append(self.index)
+        self.queue.put(item)
+
+def wait_until(condition, seconds=90):
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.1)
+    return False
+
+@pytest.fixture(scope="module")
+def pool():
+    try:
+        pool = InferencePool(os.getenv('EMOTION_MODEL', 'SamLowe/roberta-base-go_emotions'), num_workers=2, timeout=60)
+    except Exception as e:
+        pytest.skip(f"Model could not be loaded: {e}")
+    if not wait_until(lambda: len(pool.ready_workers) == 2):
+        pool.close()
+        pytest.skip("Inference workers did not start")
+    yield pool
+    pool.close()
+
+def send_to(pool, index, texts):
+    """Route one request to worker `index` by making the other workers look busy."""
+    busy = {}
+    with pool._lock:
+        for other in range(pool.num_workers):
+            if other != index:
+                busy[-1 - other] = (Future(), other)
+        pool._pending.update(busy)
+    try:
+        return pool.predict_scores(texts)
+    finally:
+        with pool._lock:
+            for request_id in busy:
+                pool._pending.pop(request_id, None)
+
+def test_requests_go_to_least_loaded_worker(pool):
+    sent = []
+    originals = list(pool._request_queues)
+    pool._request_queues = [RecordingQueue(q, i, sent) for i, q in enumerate(originals)]
+    try:
+        scores = send_to(pool, 1, ["thank you so much", "this is awful"])
+        assert scores.shape == (2, len(pool.labels))
+        send_to(pool, 0, ["hello"])
+        # Idle pool: ties go to the first worker
+        pool.predict_scores(["hello"])
+        assert sent == [1, 0, 0]
+    finally:
+        pool._request_queues = originals
+    assert not pool._pending
+
+def test_timed_out_request_is_forgotten(pool):
+    failed = pool.failed_requests
+    pool.timeout = 1e-6
+    try:
+        with pytest.raises(FutureTimeoutError):
+            pool.predict_scores(["so slow"])
+    finally:
+        pool.timeout = 60
+    assert not pool._pending
+    assert pool.failed_requests == failed + 1
+    # The late result is dropped, and the pool keeps working
+    assert pool.predict_scores(["still fine"]).shape == (1, len(pool.labels))
+
+def test_killed_worker_is_restarted_without_blocking_others(pool):
+    restarts = pool.restarts
+    pool._processes[0].kill()
+    # The healthy worker answers while the other is down
+    assert send_to(pool, 1, ["are you there"]).shape == (1, len(pool.labels))
+
+    assert wait_until(lambda: pool.restarts > restarts and len(pool.ready_workers) == 2)
+    assert send_to(pool, 0, ["back again"]).shape == (1, len(pool.labels))
+    assert send_to(pool, 1, ["both fine"]).shape == (1, len(pool.labels))
+    assert pool.get_metrics()["pending_requests"] == 0
+
+def test_pools_of_different_web_workers_use_different_cpus(monkeypatch):
+    monkeypatch.setattr(os, 'sched_getaffinity', lambda pid: set(range(8)), raising=False)
+    first = InferencePool.__new__(InferencePool)
+    second = InferencePool.__new__(InferencePool)
+    for web_worker_index, pool in enumerate((first, second)):
+        pool.num_workers = 2
+        pool.threads_per_worker = 1
+        pool.web_worker_index = web_worker_index
+    assert not set(first._cpu_slice(0) + first._cpu_slice(1)) & set(second._cpu_slice(0) + second._cpu_slice(1))
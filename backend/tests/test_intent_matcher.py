@@ -0,0 +1,94 @@
+import sys
+import os
+import sqlite3
+from types import SimpleNamespace
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../mlmodel')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../benchmarks')))
+from chatbot import Chatbot
+from intent_matcher import INTENT_REPLIES, IntentMatcher
+from llm_client import LLMClient
+from replay_intents import messages_from_db
+
+SAD = {"emotion": "sadness", "confidence": 0.8}
+
+def test_short_acknowledgements_match():
+    matcher = IntentMatcher()
+    assert matcher.match("thanks") == "gratitude"
+    assert matcher.match("Thank you so much!") == "gratitude"
+    assert matcher.match("yeah I feel better") == "relief"
+    assert matcher.match("I agree") == "agreement"
+    assert matcher.match("ok bye") == "farewell"
+    assert matcher.match("talk to you later") == "farewell"
+    # Farewell wins over gratitude
+    assert matcher.match("thanks, bye") == "farewell"
+
+def test_anything_else_goes_to_llm():
+    matcher = IntentMatcher()
+    for message in [
+        "no thanks",               # disagreement phrase
+        "yeah but",                # continuation phrase
+        "right?",                  # a question
+        "right",                   # also a validation-seeking phrase
+        "ok",                      # filler only
+        "okay",                    # closure, but not a goodbye
+        "alright",
+        "I’m good",
+        "Thanks, I’m okay",
+        "thanks for nothing",      # words outside any phrase
+        "work was awful today, thanks",
+        "thanks thanks thanks thanks thanks thanks thanks",  # too long
+        "",
+    ]:
+        assert matcher.match(message) is None, message
+
+def make_bot():
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(kwargs)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="LLM reply"))])
+
+    bot = Chatbot()
+    bot.client = LLMClient(SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))))
+    return bot, calls
+
+def test_fast_path_skips_llm_and_keeps_context():
+    bot, calls = make_bot()
+    assert bot.generate_response("my week was awful", SAD, user_id=1) == "LLM reply"
+    reply = bot.generate_response("thank you", SAD, user_id=1)
+    assert reply in INTENT_REPLIES["gratitude"]
+    assert len(calls) == 1
+    history = bot.context.get(1)
+    assert history[-2]["role"] == "user" and "thank you" in history[-2]["content"]
+    assert history[-1] == {"role": "assistant", "content": reply}
+    assert bot.get_llm_metrics()["fast_path"] == {"gratitude": 1}
+
+    # The next LLM prompt includes the acknowledgement
+    bot.generate_response("but I still can't sleep", SAD, user_id=1)
+    assert any("thank you" in m["content"] for m in calls[-1]["messages"])
+
+def test_crisis_check_runs_first():
+    bot, calls = make_bot()
+    assert bot.generate_response("I want to kill myself thanks", SAD, user_id=1) == bot.crisis_response
+    assert not bot.get_llm_metrics()["fast_path"]
+
+def test_stream_sends_acknowledgement_whole():
+    bot, calls = make_bot()
+    [(kind, text)] = list(bot.generate_response_stream("ok bye", SAD, user_id=2))
+    assert kind == "intent" and text in INTENT_REPLIES["farewell"]
+    assert not calls
+
+def test_fast_path_can_be_disabled(monkeypatch):
+    monkeypatch.setenv('INTENT_FASTPATH', '0')
+    bot, calls = make_bot()
+    assert bot.generate_response("thanks", SAD, user_id=1) == "LLM reply"
+
+def test_replay_reads_user_messages_in_order(tmp_path):
+    path = str(tmp_path / "replay.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE conversations (id INTEGER PRIMARY KEY, message TEXT, sender TEXT)")
+    conn.executemany("INSERT INTO conversations (message, sender) VALUES (?, ?)",
+                     [("hi", "user"), ("hello", "bot"), ("thanks", "user"), ("bye", "user")])
+    conn.commit()
+    conn.close()
+    assert list(messages_from_db(path, chunk_size=2)) == ["hi", "thanks", "bye"]
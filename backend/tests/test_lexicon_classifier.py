@@ -0,0 +1,69 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../mlmodel')))
+from lexicon_classifier import LexiconClassifier
+
+LABELS = ["approval", "gratitude", "joy", "neutral", "relief", "sadness"]
+
+class FakeClassifier:
+    """Says 'sadness' for everything and counts how many texts it saw."""
+    labels = LABELS
+
+    def __init__(self):
+        self.texts = 0
+
+    def __call__(self, texts, batch_size=1):
+        self.texts += len(texts)
+        return [[{"label": label, "score": 0.9 if label == "sadness" else 0.01} for label in LABELS] for _ in texts]
+
+def top_label(result):
+    scores, _ = result
+    return LABELS[int(scores.argmax())]
+
+def test_intent_phrases_and_lexicon():
+    classifier = LexiconClassifier(LABELS)
+    assert top_label(classifier.classify("Thank you!")) == "gratitude"
+    assert top_label(classifier.classify("🙏")) == "gratitude"
+    assert top_label(classifier.classify("yeah")) == "approval"
+    # Curly and missing apostrophes match the same phrase
+    assert top_label(classifier.classify("I’m good now")) == "relief"
+    assert top_label(classifier.classify("Im good now")) == "relief"
+    assert top_label(classifier.classify("so happy :)")) == "joy"
+
+def test_unsure_messages_fall_through():
+    classifier = LexiconClassifier(LABELS)
+    assert classifier.classify("not happy") is None
+    assert classifier.classify("happy but sad") is None
+    assert classifier.classify("I got the job but I feel sad about leaving my team") is None
+    # Emotions the model doesn't have are never produced
+    assert classifier.classify("lol") is None
+
+def test_lexicon_word_inside_a_longer_message_falls_through():
+    classifier = LexiconClassifier(["amusement", "gratitude", "love", "neutral", "sadness"])
+    for message in ["hey my mom died", "hi, i relapsed", "want to die lol", "i hate you thanks", "killed it haha"]:
+        assert classifier.classify(message) is None, message
+    # Intensifiers and emoji modifiers don't count as other words
+    assert classifier.classify("so sad 😢") is not None
+    assert classifier.classify("really ❤️") is not None
+
+def test_serious_messages_reach_the_model(make_analyzer):
+    analyzer = make_analyzer(FakeClassifier(), EMOTION_TIER0='1')
+    results = analyzer.analyze_batch(["hey my mom died", "hi, i relapsed", "i hate you thanks"])
+    assert [r["emotion"] for r in results] == ["sadness"] * 3
+    assert analyzer.classifier.texts == 3
+
+def test_cascade_skips_model_for_pleasantries(make_analyzer):
+    analyzer = make_analyzer(FakeClassifier(), EMOTION_TIER0='1')
+
+    assert analyzer.analyze("thanks")["emotion"] == "gratitude"
+    assert analyzer.analyze("I have been feeling low all week")["emotion"] == "sadness"
+    results = analyzer.analyze_batch(["ok", "yeah", "my exam went badly"])
+    assert [r["emotion"] for r in results] == ["neutral", "approval", "sadness"]
+    assert analyzer.classifier.texts == 2
+
+    tiers = analyzer.get_metrics()["tiers"]
+    print(f"Tiers: {tiers}")
+    assert tiers["lexicon"]["count"] == 3
+    assert tiers["model"]["count"] == 2
+    assert tiers["lexicon"]["fraction"] == 0.6
+    assert tiers["lexicon"]["latency_ms"]["p99"] is not None
@@ -0,0 +1,131 @@
+import sys
+import os
+import asyncio
+import threading
+from types import SimpleNamespace
+import pytest
+from openai import APIConnectionError, APITimeoutError
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../mlmodel')))
+from chatbot import Chatbot
+from llm_client import LLMClient, LLMDeadlineError, LLMSaturatedError, RetryBudget
+from adaptive_timeout import AdaptiveTimeout
+
+def reply(text="ok"):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+def make_client(create, **kwargs):
+    kwargs.setdefault("backoff_base", 0.001)
+    kwargs.setdefault("backoff_max", 0.002)
+    return LLMClient(SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))), **kwargs)
+
+def timeouts():
+    return AdaptiveTimeout("test_llm", min_seconds=0.5, max_seconds=5)
+
+def test_retries_transient_errors_then_succeeds():
+    attempts = []
+
+    async def create(timeout, **kwargs):
+        attempts.append(timeout)
+        if len(attempts) < 3:
+            raise APIConnectionError(request=None)
+        return reply()
+
+    client = make_client(create, max_attempts=3)
+    assert client.complete(timeouts(), 5, model="m").choices[0].message.content == "ok"
+    assert len(attempts) == 3
+    assert client.get_metrics()["retries"] == 2
+    assert client.get_metrics()["succeeded"] == 1
+
+def test_non_retryable_errors_fail_at_once():
+    attempts = []
+
+    async def create(**kwargs):
+        attempts.append(1)
+        raise ValueError("bad request")
+
+    client = make_client(create)
+    with pytest.raises(ValueError):
+        client.complete(timeouts(), 5)
+    assert len(attempts) == 1
+    assert client.get_metrics()["failed"] == 1
+
+def test_retry_budget_caps_retries():
+    attempts = []
+
+    async def create(**kwargs):
+        attempts.append(1)
+        raise APITimeoutError(request=None)
+
+    budget = RetryBudget(ratio=0.0, min_per_second=0.1, window_seconds=10)
+    client = make_client(create, max_attempts=5, retry_budget=budget)
+    with pytest.raises(APITimeoutError):
+        client.complete(timeouts(), 5)
+    # One retry fits the budget (0.1/s over 10s); the next is refused
+    assert len(attempts) == 2
+    assert client.get_metrics()["retry_budget_exhausted"] == 1
+
+def test_attempt_timeout_is_cut_to_deadline():
+    seen = []
+
+    async def create(timeout, **kwargs):
+        seen.append(timeout)
+        await asyncio.sleep(timeout)
+        raise APITimeoutError(request=None)
+
+    client = make_client(create, max_attempts=10)
+    with pytest.raises((APITimeoutError, LLMDeadlineError)):
+        client.complete(timeouts(), 0.3)
+    assert seen and all(t <= 0.3 for t in seen)
+    assert sum(seen) <= 0.35
+
+def test_saturated_client_refuses_without_waiting():
+    started = threading.Event()
+    release = threading.Event()
+
+    async def create(**kwargs):
+        started.set()
+        await asyncio.get_running_loop().run_in_executor(None, release.wait, 5)
+        return reply()
+
+    client = make_client(create, max_concurrency=1)
+    worker = threading.Thread(target=client.complete, args=(timeouts(), 5))
+    worker.start()
+    assert started.wait(5)
+    with pytest.raises(LLMSaturatedError):
+        client.complete(timeouts(), 5)
+    release.set()
+    worker.join(5)
+    metrics = client.get_metrics()
+    assert metrics["saturated"] == 1 and metrics["in_flight"] == 0
+    # The slot is free again
+    assert client.complete(timeouts(), 5).choices[0].message.content == "ok"
+
+def test_abandoned_stream_releases_its_slot():
+    async def create(stream, **kwargs):
+        async def chunks():
+            for i in range(100):
+                yield i
+                await asyncio.sleep(0.01)
+        return chunks()
+
+    client = make_client(create, max_concurrency=1)
+    stream = client.stream(timeouts(), 5)
+    assert next(stream) == 0
+    stream.close()
+    metrics = client.get_metrics()
+    assert metrics["abandoned"] == 1 and metrics["in_flight"] == 0
+    assert list(client.stream(timeouts(), 5))[:3] == [0, 1, 2]
+
+def test_chatbot_falls_back_when_saturated():
+    bot = Chatbot()
+
+    async def create(**kwargs):
+        raise AssertionError("should not be called")
+
+    bot.client = make_client(create, max_concurrency=1)
+    bot.client._slots.acquire()
+    response = bot.generate_response("I feel down", {"emotion": "sadness", "confidence": 0.8})
+    assert response in bot.responses["sadness"] + bot.fallback_responses
+    [(kind, _)] = list(bot.generate_response_stream("I feel down", {"emotion": "sadness", "confidence": 0.8}))
+    assert kind == "fallback"
+    assert bot.get_llm_metrics()["fallbacks"] == {"saturated": 2}
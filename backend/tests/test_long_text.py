@@ -0,0 +1,91 @@
+import sys
+import os
+import re
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../mlmodel')))
+
+class WordTokenizer:
+    """One token per word, with character offsets like a fast tokenizer."""
+    def __call__(self, text, add_special_tokens=False, return_offsets_mapping=True):
+        return {"offset_mapping": [m.span() for m in re.finditer(r"\S+", text)]}
+
+class FakeClassifier:
+    """Scores 'joy' by the share of happy words and 'sadness' by the share of sad words."""
+    tokenizer = WordTokenizer()
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts, batch_size=1):
+        self.calls.append(list(texts))
+        outputs = []
+        for text in texts:
+            words = text.split()
+            joy = sum(w.startswith("happy") for w in words) / len(words)
+            sadness = sum(w.startswith("sad") for w in words) / len(words)
+            outputs.append([{"label": "joy", "score": joy}, {"label": "sadness", "score": sadness}])
+        return outputs
+
+@pytest.fixture
+def make_windowed(make_analyzer):
+    def make(window_tokens=10, max_input_tokens=100, aggregation="mean"):
+        return make_analyzer(FakeClassifier(), EMOTION_WINDOW_TOKENS=window_tokens,
+                             EMOTION_MAX_INPUT_TOKENS=max_input_tokens, EMOTION_AGGREGATION=aggregation)
+    return make
+
+def test_short_text_is_not_split(make_windowed):
+    analyzer = make_windowed()
+    assert analyzer._split_text("I am happy today.") == (["I am happy today."], [4])
+
+def test_windows_are_sentence_aligned(make_windowed):
+    analyzer = make_windowed(window_tokens=10)
+    text = "I am happy today. The sun is out. I went for a long walk. Then I felt sad."
+    windows, lengths = analyzer._split_text(text)
+    print(f"Windows: {windows}")
+
+    assert all(length <= 10 for length in lengths)
+    assert all(window.endswith(".") for window in windows)
+    assert " ".join(windows) == text
+
+def test_long_sentence_is_split_at_token_limit(make_windowed):
+    analyzer = make_windowed(window_tokens=5)
+    windows, lengths = analyzer._split_text("one two three four five six seven eight nine ten eleven twelve")
+    assert lengths == [5, 5, 2]
+
+def test_tokens_beyond_cap_are_dropped(make_windowed):
+    analyzer = make_windowed(window_tokens=5, max_input_tokens=10)
+    windows, lengths = analyzer._split_text(" ".join(["word"] * 50))
+    assert sum(lengths) == 10
+    assert analyzer.truncated_texts == 1
+
+def test_windows_scored_in_one_batch_and_aggregated(make_windowed):
+    text = "happy happy happy happy. " + "sad okay okay okay okay okay okay okay."
+
+    analyzer = make_windowed(window_tokens=5, aggregation="mean")
+    result = analyzer.analyze(text)
+    assert len(analyzer.classifier.calls) == 1
+    # Length-weighted mean: 4 joyful tokens out of 12 overall
+    assert abs(result["all_emotions"]["joy"] - 4 / 12) < 1e-6
+
+    analyzer = make_windowed(window_tokens=5, aggregation="max")
+    result = analyzer.analyze(text)
+    assert result["emotion"] == "joy"
+    assert result["confidence"] == 1.0
+
+def test_batches_are_bucketed_by_length(make_windowed):
+    analyzer = make_windowed(window_tokens=100)
+    analyzer.pipeline_batch_size = 2
+    texts = ["happy " * 9, "sad", "happy happy", "sad " * 7, "happy"]
+    scores = analyzer._score_texts(texts)
+
+    # Each forward pass holds neighbours in length order, not submission order
+    assert [[len(t.split()) for t in call] for call in analyzer.classifier.calls] == [[1, 1], [2, 7], [9]]
+    # ...but scores come back in the original order
+    joy = analyzer._label_index["joy"]
+    assert [float(row[joy]) for row in scores] == [1.0, 0.0, 1.0, 0.0, 1.0]
+
+def test_token_budget_limits_padded_batch(make_windowed):
+    analyzer = make_windowed(window_tokens=100)
+    analyzer.max_batch_tokens = 10
+    analyzer._score_texts(["sad"] * 3 + ["happy " * 8])
+    assert [len(call) for call in analyzer.classifier.calls] == [3, 1]
@@ -0,0 +1,57 @@
+import sys
+import os
+import json
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../mlmodel')))
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), '../benchmarks/emotion_corpus.jsonl')
+
+# Minimum top-label agreement with the PyTorch pipeline, and maximum
+# per-label score difference, for each ONNX backend
+TOLERANCES = {
+    "onnx": {"agreement": 1.0, "max_delta": 0.01},
+    "onnx-int8": {"agreement": 0.9, "max_delta": 0.15},
+}
+
+def load_corpus():
+    with open(CORPUS_PATH) as f:
+        return [json.loads(line)["text"] for line in f if line.strip()]
+
+@pytest.fixture(scope="module", autouse=True)
+def model_only():
+    # Lexicon-tier answers are the same for every backend and would count as agreement
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv('EMOTION_TIER0', '0')
+        yield
+
+@pytest.fixture(scope="module")
+def reference():
+    pytest.importorskip("onnxruntime")
+    from emotion_analyzer import EmotionAnalyzer
+
+    analyzer = EmotionAnalyzer(backend="torch")
+    if analyzer.classifier is None:
+        pytest.skip("Reference model could not be loaded")
+    texts = load_corpus()
+    return texts, analyzer.analyze_batch(texts)
+
+@pytest.mark.parametrize("backend", ["onnx", "onnx-int8"])
+def test_onnx_matches_pytorch(reference, backend):
+    from emotion_analyzer import EmotionAnalyzer
+
+    texts, expected = reference
+    analyzer = EmotionAnalyzer(backend=backend)
+    assert analyzer.classifier is not None
+    actual = analyzer.analyze_batch(texts)
+
+    agree = sum(1 for e, a in zip(expected, actual) if e["emotion"] == a["emotion"])
+    max_delta = max(
+        abs(e["all_emotions"][label] - a["all_emotions"][label])
+        for e, a in zip(expected, actual)
+        for label in e["all_emotions"]
+    )
+    agreement = agree / len(texts)
+    print(f"{backend}: top-label agreement {agreement:.3f}, max score delta {max_delta:.4f}")
+
+    assert agreement >= TOLERANCES[backend]["agreement"]
+    assert max_delta <= TOLERANCES[backend]["max_delta"]
@@ -0,0 +1,99 @@
+import sys
+import os
+import threading
+from types import SimpleNamespace
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../mlmodel')))
+from chatbot import Chatbot
+from llm_client import LLMClient
+from prompt_builder import ConversationSummarizer, PromptBuilder, TokenCounter
+
+def turns(*contents):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": c} for i, c in enumerate(contents)]
+
+def test_fits_budget_keeping_system_prompt_and_latest_turn():
+    counter = TokenCounter()
+    builder = PromptBuilder(counter, budget_tokens=200, max_turn_tokens=1000)
+    history = turns(*[f"message {i} " + "word " * 40 for i in range(9)])
+
+    messages, dropped = builder.build("be kind", history)
+    assert messages[0] == {"role": "system", "content": "be kind"}
+    assert messages[-1] == history[-1]
+    assert counter.count_messages(messages) <= 200
+    # Kept turns are the most recent ones, in order; the rest is returned
+    assert dropped + messages[1:] == history
+
+def test_latest_turn_is_sent_even_over_budget():
+    builder = PromptBuilder(TokenCounter(), budget_tokens=50)
+    history = turns("hi", "hello", "x " * 500)
+    messages, dropped = builder.build("sys", history)
+    assert [m["content"] for m in messages] == ["sys", history[-1]["content"]]
+    assert dropped == history[:2]
+
+def test_long_older_turns_are_clipped_not_dropped():
+    counter = TokenCounter()
+    builder = PromptBuilder(counter, budget_tokens=500, max_turn_tokens=100)
+    vent = "start " + "so much going on " * 200 + " end"
+    messages, dropped = builder.build("sys", turns(vent, "I hear you", "thanks"))
+    assert not dropped
+    assert messages[1]["content"].startswith("start") and messages[1]["content"].endswith("end")
+    assert counter.count(messages[1]["content"]) <= 110
+    assert builder.get_metrics()["turns_clipped"] == 1
+
+def test_summary_is_included_and_counted():
+    counter = TokenCounter()
+    builder = PromptBuilder(counter, budget_tokens=120)
+    history = turns(*["word " * 30 for _ in range(5)])
+    without, _ = builder.build("sys", history)
+    with_summary, dropped = builder.build("sys", history, summary="User is stressed about exams. " * 5)
+    assert with_summary[1]["role"] == "system" and "stressed" in with_summary[1]["content"]
+    assert counter.count_messages(with_summary) <= 120
+    assert len(with_summary) - 1 <= len(without)
+
+def test_summarizer_refreshes_in_background_once_per_turn():
+    calls = []
+    release = threading.Event()
+
+    def summarize(previous, new_turns):
+        release.wait(5)
+        calls.append((previous, [t["content"] for t in new_turns]))
+        return f"summary {len(calls)}"
+
+    summarizer = ConversationSummarizer(summarize)
+    summarizer.refresh("u", turns("a", "b"))
+    # Returns immediately; a second refresh while one is in flight is skipped
+    summarizer.refresh("u", turns("a", "b", "c"))
+    assert summarizer.get("u") is None
+    release.set()
+    summarizer._executor.submit(lambda: None).result(5)
+    assert summarizer.get("u") == "summary 1"
+
+    summarizer.refresh("u", turns("a", "b", "c"))
+    summarizer._executor.submit(lambda: None).result(5)
+    # Only the turn not folded yet is sent, with the previous summary
+    assert calls[1] == ("summary 1", ["c"])
+    summarizer.refresh("u", turns("a", "b"))
+    summarizer._executor.submit(lambda: None).result(5)
+    assert len(calls) == 2
+
+def test_chatbot_uses_budget_and_summary(monkeypatch):
+    monkeypatch.setenv('PROMPT_BUDGET_TOKENS', '400')
+    bot = Chatbot()
+    requests = []
+
+    async def create(messages, **kwargs):
+        requests.append(messages)
+        content = "They talked about work stress." if "summary" in messages[0]["content"] else "I hear you."
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    bot.client = LLMClient(SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))))
+    for i in range(8):
+        bot.generate_response(f"turn {i}: " + "my job is wearing me down " * 12, {"emotion": "sadness", "confidence": 0.7},
+                              user_id=3)
+        bot.summaries._executor.submit(lambda: None).result(5)
+
+    chat_prompts = [m for m in requests if "summary" not in m[0]["content"]]
+    assert all(bot.prompt_builder.counter.count_messages(m) <= 400 for m in chat_prompts)
+    assert "They talked about work stress." in chat_prompts[-1][1]["content"]
+    metrics = bot.get_prompt_metrics()
+    assert metrics["summaries"]["refreshes"] >= 1
+    assert metrics["prompt_tokens"]["max"] <= 400 < metrics["unbudgeted_prompt_tokens"]["max"]
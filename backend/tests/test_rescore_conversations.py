@@ -0,0 +1,71 @@
+import sys
+import os
+import json
+import sqlite3
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../mlmodel')))
+from rescore_conversations import rescore
+
+class FakeClassifier:
+    """Scores 'joy' for messages containing 'happy', 'sadness' otherwise."""
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, texts, batch_size=1):
+        self.calls += 1
+        return [
+            [{"label": "joy", "score": 0.9 if "happy" in text else 0.1},
+             {"label": "sadness", "score": 0.1 if "happy" in text else 0.9}]
+            for text in texts
+        ]
+
+def make_db(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE conversations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, message TEXT NOT NULL,
+            sender TEXT NOT NULL, emotion TEXT, confidence REAL, timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.executemany(
+        "INSERT INTO conversations (user_id, message, sender, emotion, confidence) VALUES (1, ?, ?, 'stale', 0.0)",
+        rows
+    )
+    conn.commit()
+    conn.close()
+
+def test_rescores_user_rows_and_resumes(make_analyzer):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "chat.db")
+        checkpoint_path = os.path.join(tmp, "chat.db.rescore.json")
+        rows = []
+        for i in range(25):
+            rows.append((f"happy message {i}" if i % 2 else f"gloomy message {i}", "user"))
+            rows.append((f"bot reply {i}", "bot"))
+        make_db(db_path, rows)
+
+        summary = rescore(db_path, checkpoint_path, "fake", chunk_size=10, batch_size=4,
+                          analyzer=make_analyzer(FakeClassifier(), EMOTION_TIER0='0'))
+        print(f"Summary: {summary}")
+        assert summary["rows"] == 25
+
+        conn = sqlite3.connect(db_path)
+        user_rows = conn.execute("SELECT message, emotion, confidence FROM conversations WHERE sender = 'user'").fetchall()
+        bot_rows = conn.execute("SELECT emotion FROM conversations WHERE sender = 'bot'").fetchall()
+        conn.close()
+        for message, emotion, confidence in user_rows:
+            assert emotion == ("joy" if "happy" in message else "sadness")
+            assert abs(confidence - 0.9) < 1e-6
+        assert all(emotion == "stale" for (emotion,) in bot_rows)
+
+        with open(checkpoint_path) as f:
+            assert json.load(f)["rows"] == 25
+
+        # A second run resumes after the checkpoint and has nothing left to do
+        analyzer = make_analyzer(FakeClassifier(), EMOTION_TIER0='0')
+        assert rescore(db_path, checkpoint_path, "fake", chunk_size=10, analyzer=analyzer)["rows"] == 0
+        assert analyzer.classifier.calls == 0
+
+        # ...unless the model changed
+        assert rescore(db_path, checkpoint_path, "other", chunk_size=10, analyzer=make_analyzer(FakeClassifier(), EMOTION_TIER0='0'))["rows"] == 25
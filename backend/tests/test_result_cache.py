@@ -0,0 +1,67 @@
+import sys
+import os
+import time
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../mlmodel')))
+from result_cache import EmotionResultCache
+
+SCORES = np.array([0.97, 0.02, 0.01], dtype=np.float32)
+
+def test_normalized_text_shares_entry():
+    cache = EmotionResultCache("test-model")
+    cache.set("Thanks", SCORES)
+
+    assert np.array_equal(cache.get("  thanks "), SCORES)
+    assert np.array_equal(cache.get("THANKS"), SCORES)
+    assert cache.get("thanks a lot") is None
+
+    metrics = cache.get_metrics()
+    print(f"Cache metrics: {metrics}")
+    assert metrics["hits"] == 2
+    assert metrics["misses"] == 1
+
+def test_model_name_is_part_of_key():
+    assert EmotionResultCache("model-a").make_key("ok") != EmotionResultCache("model-b").make_key("ok")
+
+def test_lru_eviction_and_ttl():
+    cache = EmotionResultCache("test-model", max_entries=2, ttl_seconds=0.05)
+    cache.set("ok", SCORES)
+    cache.set("idk", SCORES)
+    cache.get("ok")  # "idk" is now least recently used
+    cache.set("I'm tired", SCORES)
+
+    assert cache.get("idk") is None
+    assert cache.get("ok") is not None
+    assert cache.get_metrics()["evictions"] == 1
+
+    time.sleep(0.1)
+    assert cache.get("ok") is None
+    assert cache.get_metrics()["expirations"] == 1
+
+def test_cached_vectors_are_read_only():
+    cache = EmotionResultCache("test-model")
+    cache.set("ok", SCORES)
+    assert not cache.get("ok").flags.writeable
+
+def test_memory_cap():
+    cache = EmotionResultCache("test-model", max_bytes=2000)
+    for i in range(50):
+        cache.set(f"message {i}", SCORES)
+    assert cache.get_metrics()["bytes"] <= 2000
+
+def test_disk_tier_survives_restart(tmp_path):
+    db_path = str(tmp_path / "emotion_cache.db")
+    EmotionResultCache("test-model", db_path=db_path).set("bye", SCORES)
+
+    restarted = EmotionResultCache("test-model", db_path=db_path)
+    assert np.array_equal(restarted.get("Bye"), SCORES)
+    assert restarted.get_metrics()["disk_hits"] == 1
+
+if __name__ == "__main__":
+    import tempfile, pathlib
+    test_normalized_text_shares_entry()
+    test_model_name_is_part_of_key()
+    test_lru_eviction_and_ttl()
+    test_cached_vectors_are_read_only()
+    test_memory_cap()
+    test_disk_tier_survives_restart(pathlib.Path(tempfile.mkdtemp()))
@@ -0,0 +1,87 @@
+import sys
+import os
+import json
+import pytest
+import requests
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../mlmodel')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../stubs')))
+from stub_servers import FaultProfile, SentimentStubHandler, OpenAIStubHandler, StubHandler, start_stub
+from external_sentiment import ExternalSentimentAnalyzer
+
+def make_profile(**rates):
+    return FaultProfile("fixed:0", error_rate=rates.get("error", 0.0), timeout_rate=rates.get("timeout", 0.0),
+                        malformed_rate=rates.get("malformed", 0.0), hang_seconds=2, seed=7)
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(handler, profile):
+        server = start_stub(handler, profile, 0)
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+def test_sentiment_stub_follows_client_contract(stub, monkeypatch):
+    base = stub(SentimentStubHandler, make_profile())
+    monkeypatch.setenv('EXTERNAL_SENTIMENT_URL', f"{base}/analyze")
+    monkeypatch.setenv('EXTERNAL_SENTIMENT_BREAKER', '0')
+    analyzer = ExternalSentimentAnalyzer()
+
+    result = analyzer.analyze("I had a good day")
+    assert result["source"] == "external_api"
+    assert 0.5 <= result["confidence"] <= 1.0
+    # Same text, same label
+    assert analyzer.analyze("I had a good day")["emotion"] == result["emotion"]
+    analyzer.close()
+
+def test_injected_faults_surface_as_client_errors(stub, monkeypatch):
+    base = stub(SentimentStubHandler, make_profile(error=0.5, malformed=0.5))
+    monkeypatch.setenv('EXTERNAL_SENTIMENT_URL', f"{base}/analyze")
+    monkeypatch.setenv('EXTERNAL_SENTIMENT_BREAKER', '0')
+    analyzer = ExternalSentimentAnalyzer()
+
+    for _ in range(10):
+        with pytest.raises(Exception):
+            analyzer.analyze("hello there")
+    analyzer.close()
+
+    counts = requests.get(f"{base}/_stats").json()["counts"]
+    assert counts["ok"] == 0
+    assert counts["error"] + counts["malformed"] == 10
+    assert counts["error"] > 0 and counts["malformed"] > 0
+
+def test_timeout_fault_hangs_past_client_timeout(stub):
+    base = stub(SentimentStubHandler, make_profile(timeout=1.0))
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        requests.post(f"{base}/analyze", json={"text": "hi"}, timeout=0.2)
+
+def test_openai_stub_completion_and_stream(stub, monkeypatch):
+    openai = pytest.importorskip("openai")
+    monkeypatch.setenv('STUB_STREAM_TOKEN_MS', '0')
+    base = stub(OpenAIStubHandler, make_profile())
+    client = openai.OpenAI(api_key="stub", base_url=f"{base}/v1")
+    messages = [{"role": "user", "content": "I feel stressed"}]
+
+    completion = client.chat.completions.create(model="gpt-3.5-turbo", messages=messages)
+    reply = completion.choices[0].message.content
+    assert reply
+
+    stream = client.chat.completions.create(model="gpt-3.5-turbo", messages=messages, stream=True)
+    streamed = "".join(chunk.choices[0].delta.content or "" for chunk in stream)
+    assert streamed == reply
+
+def test_openai_stub_error_rate(stub):
+    base = stub(OpenAIStubHandler, make_profile(error=1.0))
+    response = requests.post(f"{base}/v1/chat/completions", json={"messages": []})
+    assert response.status_code == 500
+    assert json.loads(response.text)["error"]["type"] == "server_error"
+
+def test_base_handler_answers_404_json(stub):
+    base = stub(StubHandler, make_profile())
+    response = requests.post(f"{base}/anything", json={}, timeout=5)
+    assert response.status_code == 404
+    assert "error" in response.json()
@@ -0,0 +1,58 @@
+import sys
+import os
+import json
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../mlmodel')))
+from topic_index import DEFAULT_TOPICS, TopicIndex, load_topics
+
+@pytest.fixture(scope="module")
+def index():
+    return TopicIndex(DEFAULT_TOPICS)
+
+def test_keywords_match_whole_words_only(index):
+    # Substring matching used to route these to "love" and "health"
+    assert index.lookup("What should I do next?") is None
+    assert index.lookup("I will try tomorrow") is None
+    assert index.lookup("My ex texted me") == "love"
+    assert index.lookup("I feel ill") == "health"
+
+def test_phrases_plurals_and_apostrophes(index):
+    assert index.lookup("There's nothing to do here") == "boredom"
+    assert index.lookup("nothing much to do") is None
+    assert index.lookup("I don’t know anymore") == "future"
+    assert index.lookup("I have two exams and three classes") == "school"
+    assert index.lookup("My parents are fighting") == "family"
+
+def test_first_listed_topic_wins(index):
+    # "boss" (work) comes first in the message, but family is listed first
+    assert index.lookup("My boss yelled and then my mom called") == "family"
+    assert index.lookup("Money is tight and I can't sleep") == "health"
+
+def test_load_topics_from_file(tmp_path, monkeypatch):
+    topics = {
+        "pets": {"keywords": ["dog", "cat", "vet bill"], "responses": ["Pets are family too."]},
+        "finance": {"keywords": ["bill"], "responses": ["Money is stressful."]},
+    }
+    path = tmp_path / "topics.json"
+    path.write_text(json.dumps(topics))
+    monkeypatch.setenv('CHATBOT_TOPICS_FILE', str(path))
+
+    index = TopicIndex(load_topics())
+    assert index.lookup("The vet bill was huge") == "pets"
+    assert index.lookup("Another bill arrived") == "finance"
+    assert index.lookup("My dogs are sick") == "pets"
+    assert index.responses("pets") == ["Pets are family too."]
+
+def test_load_topics_rejects_incomplete_topic(tmp_path):
+    path = tmp_path / "topics.json"
+    path.write_text(json.dumps({"pets": {"keywords": ["dog"], "responses": []}}))
+    with pytest.raises(ValueError):
+        load_topics(str(path))
+
+def test_large_table_respects_priority():
+    topics = {f"topic{i}": {"keywords": [f"word{i}a", f"word{i}b", f"phrase {i} here"], "responses": [str(i)]}
+              for i in range(3000)}
+    index = TopicIndex(topics)
+    assert index.lookup("word2999b and word1500a") == "topic1500"
+    assert index.lookup("a phrase 42 here word100a") == "topic42"
+    assert index.lookup("phrase 42 there") is None
@@ -0,0 +1,95 @@
+import os
+import threading
+
+from metrics import RollingStats
+
+
+class AdaptiveTimeout:
+    """
+    Per-dependency timeout derived from recently observed latency.
+
+    The timeout for the next call is the `percentile` of the last `window`
+    call latencies times `multiplier`, clamped to [min_seconds, max_seconds].
+    Until `min_samples` calls have been seen it is `max_seconds`, the old
+    fixed value. A call that times out is recorded at its timeout, so when
+    a dependency slows down for real the timeout grows (by up to the
+    multiplier per window) instead of failing every call at a stale value.
+    """
+
+    def __init__(self, name, min_seconds, max_seconds, percentile=99, multiplier=2.0,
+                 window=200, min_samples=20):
+        self.name = name
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.min_samples = min_samples
+        self.latency = RollingStats(window=window)
+        self.timeouts = 0
+
+    def timeout(self):
+        """Timeout in seconds for the next call."""
+        if self.latency.count < self.min_samples:
+            return self.max_seconds
+        observed = self.latency.percentile(self.percentile) / 1000.0
+        return min(self.max_seconds, max(self.min_seconds, observed * self.multiplier))
+
+    def record(self, elapsed_seconds):
+        """Record the latency of a call that completed (successfully or with an error response)."""
+        self.latency.add(elapsed_seconds * 1000.0)
+
+    def record_timeout(self, timeout_seconds):
+        """Record a call that was cut off after timeout_seconds."""
+        self.timeouts += 1
+        self.latency.add(timeout_seconds * 1000.0)
+
+    def get_metrics(self):
+        snapshot = self.latency.snapshot()
+        return {
+            "timeout_seconds": round(self.timeout(), 3),
+            "observed_p50_ms": snapshot["p50"],
+            "observed_p99_ms": snapshot["p99"],
+            "samples": snapshot["count"],
+            "timeouts": self.timeouts,
+            "percentile": self.percentile,
+            "multiplier": self.multiplier,
+            "min_seconds": self.min_seconds,
+            "max_seconds": self.max_seconds,
+        }
+
+
+# Shared registry: one controller per dependency name
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+def get_timeout_controller(name, min_seconds, max_seconds):
+    """
+    Return the shared AdaptiveTimeout for a dependency, creating it on first use.
+
+    Percentile, multiplier, window and warm-up sample count come from
+    ADAPTIVE_TIMEOUT_* environment variables and apply to every dependency;
+    bounds are per dependency. ADAPTIVE_TIMEOUTS=0 pins every timeout to
+    max_seconds.
+    """
+    with _controllers_lock:
+        controller = _controllers.get(name)
+        if controller is None:
+            if os.getenv('ADAPTIVE_TIMEOUTS', '1') != '1':
+                min_seconds = max_seconds
+            controller = AdaptiveTimeout(
+                name,
+                min_seconds=min_seconds,
+                max_seconds=max_seconds,
+                percentile=float(os.getenv('ADAPTIVE_TIMEOUT_PERCENTILE', 99)),
+                multiplier=float(os.getenv('ADAPTIVE_TIMEOUT_MULTIPLIER', 2.0)),
+                window=int(os.getenv('ADAPTIVE_TIMEOUT_WINDOW', 200)),
+                min_samples=int(os.getenv('ADAPTIVE_TIMEOUT_MIN_SAMPLES', 20))
+            )
+            _controllers[name] = controller
+        return controller
+
+def get_timeout_metrics():
+    """Current timeout and observed latency per dependency, for the /metrics endpoint."""
+    with _controllers_lock:
+        controllers = list(_controllers.values())
+    return {controller.name: controller.get_metrics() for controller in controllers}
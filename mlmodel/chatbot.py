@@ -1,8 +1,17 @@
 import os
-import re
-from openai import OpenAI
+import threading
+from openai import AsyncOpenAI
 from dotenv import load_dotenv
 
+from adaptive_timeout import get_timeout_controller
+from context_store import ConversationContextStore
+from crisis_detector import CrisisDetector
+from topic_index import TopicIndex, load_topics
+from intent_matcher import INTENT_REPLIES, IntentMatcher
+from intents import USER_RESPONSES
+from llm_client import LLMClient, LLMSaturatedError, RetryBudget
+from prompt_builder import ConversationSummarizer, PromptBuilder, TokenCounter
+
 # Load environment variables
 load_dotenv()
 
@@ -10,14 +19,53 @@ class Chatbot:
     def __init__(self):
         """Initialize the chatbot with OpenAI GPT and safety features."""
         
-        # Initialize OpenAI client
+        # Initialize OpenAI client. Calls go through LLMClient, which limits
+        # concurrent calls (LLM_MAX_CONCURRENCY; when all are busy we answer
+        # from templates instead of queueing) and owns deadlines and retries
         api_key = os.getenv('OPENAI_API_KEY')
         if api_key:
-            self.client = OpenAI(api_key=api_key)
+            self.client = LLMClient(
+                AsyncOpenAI(api_key=api_key, max_retries=0),
+                max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', 8)),
+                admission_wait=float(os.getenv('LLM_ADMISSION_WAIT_MS', 0)) / 1000.0,
+                max_attempts=int(os.getenv('LLM_MAX_ATTEMPTS', 3)),
+                backoff_base=float(os.getenv('LLM_BACKOFF_BASE_MS', 200)) / 1000.0,
+                backoff_max=float(os.getenv('LLM_BACKOFF_MAX_MS', 2000)) / 1000.0,
+                retry_budget=RetryBudget(
+                    ratio=float(os.getenv('LLM_RETRY_BUDGET_RATIO', 0.1)),
+                    min_per_second=float(os.getenv('LLM_RETRY_BUDGET_MIN_PER_SECOND', 1))
+                )
+            )
             print("OpenAI client initialized successfully")
         else:
             self.client = None
             print("WARNING: No OpenAI API key found, using fallback responses")
+        # Total time for one LLM call, including retries and backoff
+        self.llm_deadline = float(os.getenv('LLM_DEADLINE_SECONDS', os.getenv('OPENAI_TIMEOUT', 30)))
+        # Why replies came from templates instead of the LLM
+        self.fallbacks = {}
+        # LLM calls skipped by the intent fast path, per intent
+        self.fast_path = {}
+        self._fallbacks_lock = threading.Lock()
+        
+        # Per-attempt timeout for the completion request, adapted to observed latency
+        self.llm_timeouts = get_timeout_controller(
+            "openai_chat",
+            min_seconds=float(os.getenv('OPENAI_MIN_TIMEOUT', 2)),
+            max_seconds=float(os.getenv('OPENAI_TIMEOUT', 30))
+        )
+        # Streaming requests: bounds the wait for the first (and each) chunk
+        self.stream_timeouts = get_timeout_controller(
+            "openai_chat_stream",
+            min_seconds=float(os.getenv('OPENAI_MIN_TIMEOUT', 2)),
+            max_seconds=float(os.getenv('OPENAI_TIMEOUT', 30))
+        )
+        # Background summary calls, kept apart so they don't skew the chat timeouts
+        self.summary_timeouts = get_timeout_controller(
+            "openai_summary",
+            min_seconds=float(os.getenv('OPENAI_MIN_TIMEOUT', 2)),
+            max_seconds=float(os.getenv('OPENAI_TIMEOUT', 30))
+        )
         
         # System prompt for empathetic mental health companion
         self.system_prompt = """You are Empath.ai, a compassionate and empathetic mental health companion. Your role is to:
@@ -43,6 +91,8 @@ IMPORTANT: If the user mentions anything about self-harm, suicide, or crisis, re
             r"give\s*up", r"kill\s*my\s*family", r"murder",
             r"harm\s*others", r"end\s*it\s*all", r"jump\s*off"
         ]
+        # Compiled once; scans each message a single time for all patterns
+        self.crisis_detector = CrisisDetector(self.crisis_keywords)
         
         self.crisis_response = (
             "I'm hearing that you're in a lot of pain right now, and I want you to know that you're not alone. "
@@ -468,343 +518,189 @@ IMPORTANT: If the user mentions anything about self-harm, suicide, or crisis, re
             ]
         }
 
-        # Structured user intent patterns (for classification/logic)
-        self.user_responses = {
-            "agreement": [
-                "yeah",
-                "yes",
-                "exactly",
-                "true",
-                "right",
-                "I agree",
-                "that makes sense",
-                "absolutely",
-                "100%",
-                "for sure"
-            ],
-
-            "gratitude": [
-                "thanks",
-                "thank you",
-                "appreciate it",
-                "thanks a lot",
-                "that helps",
-                "means a lot",
-                "ty",
-                "🙏",
-                "thanks for listening",
-                "glad you said that"
-            ],
-
-            "relief": [
-                "yeah I feel better",
-                "that helped",
-                "I feel calmer now",
-                "needed that",
-                "that reassures me",
-                "I feel lighter",
-                "okay yeah",
-                "I’m good now",
-                "that makes me feel better",
-                "phew"
-            ],
-
-            "continuation": [
-                "also",
-                "and another thing",
-                "there’s more",
-                "let me explain",
-                "wait",
-                "but",
-                "so basically",
-                "the thing is",
-                "one more thing",
-                "I should add"
-            ],
-
-            "clarification": [
-                "what do you mean",
-                "can you explain",
-                "I didn’t get that",
-                "how so",
-                "why",
-                "can you elaborate",
-                "not sure I understand",
-                "what does that mean",
-                "huh?",
-                "explain more"
-            ],
+        # Acknowledgements ("thanks", "ok bye") answered from templates without
+        # an LLM call (see intent_matcher.py); INTENT_FASTPATH=0 turns this off
+        self.intent_matcher = None
+        if os.getenv('INTENT_FASTPATH', '1') != '0':
+            self.intent_matcher = IntentMatcher(max_words=int(os.getenv('INTENT_FASTPATH_MAX_WORDS', 6)))
+        self.intent_replies = INTENT_REPLIES
 
-            "disagreement": [
-                "I don’t think so",
-                "not really",
-                "I disagree",
-                "I don’t feel that way",
-                "that’s not it",
-                "no",
-                "nah",
-                "I don’t agree",
-                "that’s not true",
-                "I see it differently"
-            ],
-
-            "validation_seeking": [
-                "am I wrong",
-                "does that make sense",
-                "is that okay",
-                "right?",
-                "do you get me",
-                "is that normal",
-                "is it bad",
-                "is this weird",
-                "does that sound right",
-                "am I overthinking"
-            ],
-
-            "emotional_release": [
-                "I just needed to say that",
-                "I had to get that out",
-                "feels good to say it",
-                "I’ve been holding that in",
-                "thanks for letting me vent",
-                "I needed to talk",
-                "I don’t usually say this",
-                "glad I said it",
-                "that’s been heavy",
-                "I’ve been carrying this"
-            ],
+        # Fallback topic routing, indexed once (see topic_index.py)
+        self.topic_index = TopicIndex(load_topics())
 
-            "closure": [
-                "okay",
-                "alright",
-                "I’m good",
-                "that’s all",
-                "nothing else",
-                "were done",
-                "I think thats it",
-                "yeah thats it",
-                "Im done for now",
-                "thanks, Im okay"
-            ],
+        # Structured user intent patterns (see intents.py)
+        self.user_responses = USER_RESPONSES
+        
+        # Recent turns per user for LLM context, bounded in total size.
+        # Users who aren't cached are rebuilt with history_loader, which
+        # app.py points at Database.get_recent_messages. history_version
+        # (Database.get_conversation_version) lets a cached user be checked
+        # for turns another worker saved
+        self.history_loader = None
+        self.history_version = None
+        self.context = ConversationContextStore(
+            max_turns=int(os.getenv('CONTEXT_MAX_TURNS', 20)),
+            max_bytes=int(os.getenv('CONTEXT_MAX_BYTES', 64 * 1024 * 1024)),
+            loader=self._load_context,
+            versioner=self._context_version
+        )
 
-            "confusion": [
-                "I’m still confused",
-                "I don’t know",
-                "I’m not sure",
-                "this is confusing",
-                "idk",
-                "I’m lost",
-                "I don’t get it",
-                "I can’t figure it out",
-                "I’m unsure",
-                "this doesn’t make sense"
-            ],
+        # Prompts are assembled within a token budget; turns that no longer
+        # fit are folded into a per-user summary in the background
+        self.prompt_builder = PromptBuilder(
+            TokenCounter("gpt-3.5-turbo"),
+            budget_tokens=int(os.getenv('PROMPT_BUDGET_TOKENS', 1000)),
+            max_turn_tokens=int(os.getenv('PROMPT_MAX_TURN_TOKENS', 400))
+        )
+        self.summaries = None
+        if os.getenv('PROMPT_SUMMARIES', '1') == '1':
+            self.summaries = ConversationSummarizer(
+                self._summarize_turns,
+                max_users=int(os.getenv('PROMPT_SUMMARY_MAX_USERS', 10000))
+            )
 
-            "emotional_shift_positive": [
-                "I feel better now",
-                "I’m calmer",
-                "that helped a lot",
-                "I feel hopeful",
-                "I’m okay now",
-                "I feel lighter",
-                "that changed my perspective",
-                "I feel more confident",
-                "I feel understood",
-                "that reassured me"
-            ],
+    @staticmethod
+    def format_user_turn(message, emotion, confidence):
+        """User turn as sent to the LLM, with the detected emotion as context."""
+        return f"[User's detected emotion: {emotion} (confidence: {confidence:.2f})]\n\nUser: {message}"
+
+    def _load_context(self, user_id, limit):
+        if self.history_loader is None:
+            return []
+        messages = []
+        for row in self.history_loader(user_id, limit):
+            if row['sender'] == 'user':
+                content = self.format_user_turn(row['message'], row['emotion'] or "neutral", 0.5 if row['confidence'] is None else row['confidence'])
+                messages.append({"role": "user", "content": content})
+            else:
+                messages.append({"role": "assistant", "content": row['message']})
+        return messages
+
+    def _context_version(self, user_id):
+        if self.history_version is None:
+            return None
+        return self.history_version(user_id)
+
+    def _summarize_turns(self, previous_summary, turns):
+        """Fold turns into previous_summary with one short completion call (runs in the background)."""
+        transcript = "\n".join(
+            turn["content"] if turn["role"] == "user" else f"Empath.ai: {turn['content']}" for turn in turns
+        )
+        request = f"Summary so far: {previous_summary}\n\n" if previous_summary else ""
+        request += f"Earlier messages:\n{transcript}"
+        response = self.client.complete(
+            self.summary_timeouts,
+            self.llm_deadline,
+            model="gpt-3.5-turbo",
+            messages=[
+                {"role": "system", "content": (
+                    "Update the summary of a conversation between a user and Empath.ai, a mental health "
+                    "companion. Keep what the user shared about their situation and feelings, and any "
+                    "coping steps discussed. At most 4 sentences, third person, no advice."
+                )},
+                {"role": "user", "content": request}
+            ],
+            max_tokens=int(os.getenv('PROMPT_SUMMARY_MAX_TOKENS', 150)),
+            temperature=0.2,
+        )
+        return response.choices[0].message.content.strip()
+
+    def get_llm_metrics(self):
+        """LLM call admission, retries and deadlines, why replies fell back to templates, and calls skipped by the fast path."""
+        with self._fallbacks_lock:
+            fallbacks = dict(self.fallbacks)
+            fast_path = dict(self.fast_path)
+        return {
+            **(self.client.get_metrics() if self.client else {}),
+            "fallbacks": fallbacks,
+            "fast_path": fast_path,
+        }
 
-            "emotional_shift_negative": [
-                "I still feel bad",
-                "I’m still upset",
-                "it still hurts",
-                "I feel worse",
-                "I don’t feel okay",
-                "that didn’t help",
-                "I’m still angry",
-                "I’m still sad",
-                "it’s still heavy",
-                "I feel stuck"
-            ],
+    def _record_fallback(self, reason):
+        with self._fallbacks_lock:
+            self.fallbacks[reason] = self.fallbacks.get(reason, 0) + 1
 
-            "silence_or_minimal": [
-                "hmm",
-                "ok",
-                "...",
-                "idk",
-                "maybe",
-                "sure",
-                "fine",
-                "whatever",
-                "I guess",
-                "meh"
-            ]
+    def get_prompt_metrics(self):
+        """Prompt token distributions (budgeted vs. what the full window would cost) and summary state."""
+        return {
+            **self.prompt_builder.get_metrics(),
+            "summaries": self.summaries.get_metrics() if self.summaries else None,
         }
-        
-        # Conversation history for context (per session)
-        self.conversation_history = []
 
     def check_safety(self, message):
         """
         Check message for safety/crisis keywords.
         Returns the crisis response if danger is detected, else None.
         """
-        message_lower = message.lower()
-        for pattern in self.crisis_keywords:
-            if re.search(pattern, message_lower):
-                return self.crisis_response
+        if self.crisis_detector.is_crisis(message):
+            return self.crisis_response
         return None
     
     def check_keywords(self, message):
         """
         Rule-based responses for a wide range of common topics.
-        Now uses a scalable dictionary structure for robust matching.
+        Topics and keywords live in topic_index.py (or CHATBOT_TOPICS_FILE).
         """
-        msg = message.lower()
         import random
-        
-        # Topic Definitions: Keywords -> Responses
-        topics = {
-            "family": {
-                "keywords": ['dad', 'mom', 'brother', 'sister', 'family', 'parents', 'grandma', 'grandpa', 'cousin', 'aunt', 'uncle'],
-                "responses": [
-                    "Family dynamics can be complex. How are you feeling about them right now?",
-                    "Relationships with family run deep. Remember to set boundaries if you need to.",
-                    "It sounds like a family matter. Do you have someone in the family you trust to talk to?",
-                    "Family stuff is tough. Try to focus on what you can control in this situation."
-                ]
-            },
-            "work": {
-                "keywords": ['job', 'work', 'boss', 'colleague', 'career', 'interview', 'salary', 'promotion', 'meeting', 'deadline'],
-                "responses": [
-                    "Work stress is real. Have you taken a short break today to reset?",
-                    "Career challenges are tough. Try making a small checklist to feel more in control.",
-                    "Is work affecting your personal life? Maybe try our 'Mindful Break' module?",
-                    "It sounds like work is heavy on your mind. What's the biggest stressor right now?"
-                ]
-            },
-            "school": {
-                "keywords": ['school', 'college', 'exam', 'grade', 'study', 'teacher', 'assignment', 'homework', 'class', 'gpa'],
-                "responses": [
-                    "School pressure can be overwhelming. Remember: Your grades don't define your worth.",
-                    "Studying is hard work. Have you tried the 50/10 rule? Study 50 mins, break 10 mins.",
-                    "If you're feeling behind, just focus on the very next small task. You got this.",
-                    "Academic stress is valid. Make sure you're getting enough sleep too."
-                ]
-            },
-            "love": {
-                "keywords": ['love', 'crush', 'boyfriend', 'girlfriend', 'partner', 'date', 'dating', 'breakup', 'ex', 'relationship', 'marriage', 'husband', 'wife'],
-                "responses": [
-                    "Matters of the heart are heavy. Journaling your feelings might help clarity.",
-                    "Relationships are tricky. Are you prioritizing your own happiness in this?",
-                    "Love is complex. It's okay to feel vulnerable about it.",
-                    "Heart stuff determines so much of our mood. What's the main feeling coming up?"
-                ]
-            },
-            "health": {
-                "keywords": ['sick', 'ill', 'pain', 'headache', 'stomach', 'tired', 'exhausted', 'sleep', 'insomnia', 'doctor', 'body', 'weight', 'fat', 'ugly'],
-                "responses": [
-                    "Your physical health affects your mind. Have you been sleeping okay?",
-                    "Being physically drained makes everything harder. Can you rest today?",
-                    "Be gentle with your body. It's doing the best it can.",
-                    "If you're feeling unwell, please prioritize rest. Health comes first."
-                ]
-            },
-            "finance": {
-                "keywords": ['money', 'broke', 'debt', 'rent', 'bill', 'expensive', 'cost', 'afford', 'loan', 'finance'],
-                "responses": [
-                    "Financial stress is a heavy burden. Just take it one step at a time.",
-                    "Money worries are very common. Try to focus on just this week's budget.",
-                    "It's normal to worry about finances. Are there any small expenses you can pause?",
-                    "I hear you. Financial security is important for peace of mind."
-                ]
-            },
-            "friends": {
-                "keywords": ['friend', 'bestie', 'lonely', 'alone', 'social', 'party', 'invite', 'exclude', 'drama'],
-                "responses": [
-                    "Friendships can have their ups and downs. Do you feel supported by them?",
-                    "Feeling lonely is tough. Usually, reaching out to just one person helps.",
-                    "Social connections are important. quality matters more than quantity.",
-                    "It sounds like a social issue. Are you being true to yourself in this group?"
-                ]
-            },
-            "future": {
-                "keywords": ['future', 'scared', 'worry', 'what if', 'don\'t know', 'unsure', 'plan', 'goal', 'dream'],
-                "responses": [
-                    "The future can be scary because it's unknown. Let's focus on today.",
-                    "Worrying about 'what if' steals joy from 'what is'. Try to ground yourself.",
-                    "You don't need to have it all figured out right now. One step is enough.",
-                    "Uncertainty is hard to sit with. What is one thing you ARE sure about?"
-                ]
-            },
-            "boredom": {
-                "keywords": ['bored', 'nothing to do', 'apathetic', 'meh', 'lazy'],
-                "responses": [
-                    "Boredom can actually be good—it's a reset! Maybe doodle or listen to music?",
-                    "Feeling 'meh' is valid. Maybe try a 5-minute Mindful Break?",
-                    "Sometimes doing nothing is exactly what we need. Enjoy the pause.",
-                    "If you're bored, maybe learn something new or call an old friend?"
-                ]
-            }
-        }
-        
-        # Check against topics
-        for topic, data in topics.items():
-            if any(keyword in msg for keyword in data["keywords"]):
-                return random.choice(data["responses"])
-            
+        topic = self.topic_index.lookup(message)
+        if topic:
+            return random.choice(self.topic_index.responses(topic))
         return None
     
-    def generate_response(self, user_message, emotion_data):
+    def intent_reply(self, user_message, emotion_data, user_id=None):
+        """
+        Templated reply for a short acknowledgement, or None.
+
+        The exchange is added to the user's context like an LLM turn, so a
+        later prompt still sees that the user said thanks or goodbye.
+        """
+        import random
+        if not self.intent_matcher:
+            return None
+        intent = self.intent_matcher.match(user_message)
+        if intent is None:
+            return None
+        reply = random.choice(self.intent_replies[intent])
+        self._record_exchange(user_message, emotion_data, user_id, reply)
+        with self._fallbacks_lock:
+            self.fast_path[intent] = self.fast_path.get(intent, 0) + 1
+        return reply
+
+    def generate_response(self, user_message, emotion_data, user_id=None):
         """
         Generate an empathetic response using OpenAI GPT.
-        Includes safety checks for crisis situations.
+        Includes safety checks for crisis situations. Context is the
+        recent conversation of user_id (anonymous callers share one).
         """
         # 1. IMMEDIATE SAFETY CHECK (always first)
         crisis_alert = self.check_safety(user_message)
         if crisis_alert:
+            self._record_exchange(user_message, emotion_data, user_id, crisis_alert)
             return crisis_alert
 
-        # 2. If no OpenAI client, use fallback
+        # 2. Acknowledgements and goodbyes don't need the LLM
+        intent_reply = self.intent_reply(user_message, emotion_data, user_id)
+        if intent_reply:
+            return intent_reply
+
+        # 3. If no OpenAI client, use fallback
         if not self.client:
-            import random
-            # Fallback Logic
-            # Check specific keywords first for context
-            keyword_reply = self.check_keywords(user_message)
-            if keyword_reply:
-                 return keyword_reply
-                 
-            # Use specific template for emotion
-            emotion = emotion_data.get("emotion", "neutral")
-            if emotion in self.responses:
-                return random.choice(self.responses[emotion])
-            else:
-                return random.choice(self.fallback_responses)
+            self._record_fallback("no_client")
+            reply = self.fallback_reply(user_message, emotion_data)
+            self._record_exchange(user_message, emotion_data, user_id, reply)
+            return reply
         
-        # 3. Build context with emotion data
-        emotion = emotion_data.get("emotion", "neutral")
-        confidence = emotion_data.get("confidence", 0.5)
-        
-        # Add emotion context to the user message
-        context_message = f"[User's detected emotion: {emotion} (confidence: {confidence:.2f})]\n\nUser: {user_message}"
-        
-        # Add to conversation history
-        self.conversation_history.append({
-            "role": "user",
-            "content": context_message
-        })
-        
-        # Keep only last 10 exchanges for context
-        if len(self.conversation_history) > 20:
-            self.conversation_history = self.conversation_history[-20:]
+        # 4. Build context with emotion data
+        messages = self._prepare_messages(user_message, emotion_data, user_id)
         
         try:
-            # 4. Call OpenAI API
-            response = self.client.chat.completions.create(
+            # 5. Call OpenAI API (per-attempt timeouts, retries and the
+            # overall deadline are handled by LLMClient)
+            response = self.client.complete(
+                self.llm_timeouts,
+                self.llm_deadline,
                 model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    *self.conversation_history
-                ],
+                messages=messages,
                 max_tokens=200,
                 temperature=0.7,
             )
@@ -812,34 +708,151 @@ IMPORTANT: If the user mentions anything about self-harm, suicide, or crisis, re
             assistant_message = response.choices[0].message.content.strip()
             
             # Add assistant response to history
-            self.conversation_history.append({
-                "role": "assistant",
-                "content": assistant_message
-            })
+            self.context.append(user_id, "assistant", assistant_message)
             
             return assistant_message
             
+        except LLMSaturatedError as e:
+            print(f"{e}; answering from templates")
+            self._record_fallback("saturated")
         except Exception as e:
             print(f"OpenAI API error: {e}")
-            import random
-            
-            # Fallback Logic (Modified)
-            
-            # Check specific keywords first for context
-            keyword_reply = self.check_keywords(user_message)
-            if keyword_reply:
-                 return keyword_reply
-                 
-            # Use specific template for emotion
-            emotion = emotion_data.get("emotion", "neutral")
-            if emotion in self.responses:
-                return random.choice(self.responses[emotion])
-            else:
-                return random.choice(self.fallback_responses)
+            self._record_fallback("error")
+        # The user turn is already in the context
+        reply = self.fallback_reply(user_message, emotion_data)
+        self.context.append(user_id, "assistant", reply)
+        return reply
+    
+    def generate_response_stream(self, user_message, emotion_data, user_id=None):
+        """
+        Like generate_response, but yields the reply as it is produced.
+
+        Yields (kind, text) pairs: ("crisis", text), ("intent", text) or
+        ("fallback", text) once for a complete reply that didn't come from
+        the LLM, or
+        ("delta", text) for each streamed piece of an LLM reply. If the LLM
+        fails before sending anything, a fallback reply is yielded instead;
+        if it fails midway, the stream just ends. Whatever was streamed is
+        added to the user's context, even if the consumer stops early, and
+        so are crisis and fallback replies.
+        """
+        crisis_alert = self.check_safety(user_message)
+        if crisis_alert:
+            self._record_exchange(user_message, emotion_data, user_id, crisis_alert)
+            yield "crisis", crisis_alert
+            return
+
+        intent_reply = self.intent_reply(user_message, emotion_data, user_id)
+        if intent_reply:
+            yield "intent", intent_reply
+            return
+
+        if not self.client:
+            self._record_fallback("no_client")
+            reply = self.fallback_reply(user_message, emotion_data)
+            self._record_exchange(user_message, emotion_data, user_id, reply)
+            yield "fallback", reply
+            return
+
+        messages = self._prepare_messages(user_message, emotion_data, user_id)
+
+        # The per-attempt timeout bounds each wait on the connection, so it
+        # adapts to the time to the first token rather than to the whole reply
+        parts = []
+        try:
+            stream = self.client.stream(
+                self.stream_timeouts,
+                self.llm_deadline,
+                model="gpt-3.5-turbo",
+                messages=messages,
+                max_tokens=200,
+                temperature=0.7,
+            )
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if not text:
+                    continue
+                parts.append(text)
+                yield "delta", text
+        except LLMSaturatedError as e:
+            print(f"{e}; answering from templates")
+            self._record_fallback("saturated")
+            parts.append(self.fallback_reply(user_message, emotion_data))
+            yield "fallback", parts[0]
+        except Exception as e:
+            print(f"OpenAI streaming error: {e}")
+            if not parts:
+                self._record_fallback("error")
+                parts.append(self.fallback_reply(user_message, emotion_data))
+                yield "fallback", parts[0]
+        finally:
+            reply = "".join(parts).strip()
+            if reply:
+                self.context.append(user_id, "assistant", reply)
+
+    def fallback_reply(self, user_message, emotion_data):
+        """Reply without the LLM: a topic response if a keyword matches, else a template for the emotion."""
+        import random
+        
+        # Check specific keywords first for context
+        keyword_reply = self.check_keywords(user_message)
+        if keyword_reply:
+             return keyword_reply
+             
+        # Use specific template for emotion
+        emotion = emotion_data.get("emotion", "neutral")
+        if emotion in self.responses:
+            return random.choice(self.responses[emotion])
+        else:
+            return random.choice(self.fallback_responses)
+
+    def _prepare_messages(self, user_message, emotion_data, user_id):
+        """Record the user turn in the user's context and assemble the prompt messages."""
+        history = self._record_user_turn(user_message, emotion_data, user_id)
+        
+        # Fit the prompt into the token budget; refresh the summary with
+        # whatever was left out (the next prompt uses it)
+        summary = self.summaries.get(user_id) if self.summaries else None
+        messages, dropped = self.prompt_builder.build(self.system_prompt, history, summary)
+        if dropped and self.summaries:
+            self.summaries.refresh(user_id, dropped)
+        return messages
+
+    def _record_exchange(self, user_message, emotion_data, user_id, reply):
+        """Add a user turn and a reply that didn't come from the LLM to the user's context."""
+        self._record_user_turn(user_message, emotion_data, user_id)
+        self.context.append(user_id, "assistant", reply)
+
+    def _record_user_turn(self, user_message, emotion_data, user_id):
+        """Add the user turn (with its emotion) to the user's context and return the history."""
+        emotion = emotion_data.get("emotion", "neutral")
+        confidence = emotion_data.get("confidence", 0.5)
+        
+        # Add emotion context to the user message
+        context_message = self.format_user_turn(user_message, emotion, confidence)
+        
+        # Add to the user's conversation history (last CONTEXT_MAX_TURNS
+        # messages). If the user wasn't cached, the history was just rebuilt
+        # from the conversations table, which already has this message
+        # (app.py saves it before generating the reply)
+        history = self.context.get(user_id)
+        if not history or history[-1] != {"role": "user", "content": context_message}:
+            self.context.append(user_id, "user", context_message)
+            history.append({"role": "user", "content": context_message})
+        return history
     
-    def clear_history(self):
-        """Clear conversation history for new session."""
-        self.conversation_history = []
+    def record_saved(self, user_id, message_id):
+        """Tell the user's context that this worker saved message_id (see ConversationContextStore)."""
+        self.context.record_saved(user_id, message_id)
+    
+    def clear_history(self, user_id=None):
+        """Clear conversation history for one user, or for everyone."""
+        if user_id is None:
+            self.context.clear()
+        else:
+            self.context.discard(user_id)
 
 # Singleton instance
 _chatbot = None
@@ -0,0 +1,146 @@
+import threading
+import time
+from collections import deque
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Rolling-window circuit breaker for a remote dependency.
+
+    closed:    calls go through; the outcome of the last `window` calls is
+               kept. Once at least `min_calls` are recorded and the share of
+               failures or of slow calls reaches its threshold, the circuit
+               opens.
+    open:      calls are rejected (fail fast) for `open_seconds`.
+    half_open: up to `half_open_probes` calls go through as probes. If they
+               all succeed quickly the circuit closes; any failure or slow
+               probe opens it again.
+
+    Usage: call allow() before the call; if it returns a ticket, pass that
+    ticket to record() with the outcome.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, window=20, min_calls=5, failure_rate=0.5, slow_call_ms=2000,
+                 slow_call_rate=0.5, open_seconds=30, half_open_probes=1, clock=time.monotonic):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_ms = slow_call_ms
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self._clock = clock
+
+        self.state = self.CLOSED
+        self._outcomes = deque(maxlen=window)  # (failed, slow)
+        self._opened_at = None
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.transitions = {}
+        self.rejected = 0
+        self.calls = 0
+        self.failures = 0
+        self.slow_calls = 0
+
+    def allow(self):
+        """
+        Return "call" or "probe" if a call may go through, or None if the
+        circuit is open (or half-open with all probe slots taken).
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                if self._clock() - self._opened_at < self.open_seconds:
+                    self.rejected += 1
+                    return None
+                self._transition(self.HALF_OPEN)
+
+            if self.state == self.HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_probes:
+                    self.rejected += 1
+                    return None
+                self._probes_in_flight += 1
+                return "probe"
+            return "call"
+
+    def record(self, ticket, success, elapsed_ms):
+        """Record the outcome of a call that allow() let through."""
+        slow = elapsed_ms >= self.slow_call_ms
+        with self._lock:
+            self.calls += 1
+            self.failures += not success
+            self.slow_calls += slow
+
+            if ticket == "probe":
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if self.state != self.HALF_OPEN:
+                    return
+                if not success or slow:
+                    self._open()
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_probes:
+                        self._transition(self.CLOSED)
+                return
+
+            if self.state != self.CLOSED:
+                return
+            self._outcomes.append((not success, slow))
+            if len(self._outcomes) < self.min_calls:
+                return
+            failed = sum(1 for f, _ in self._outcomes if f) / len(self._outcomes)
+            slowed = sum(1 for _, s in self._outcomes if s) / len(self._outcomes)
+            if failed >= self.failure_rate or slowed >= self.slow_call_rate:
+                self._open()
+
+    def _open(self):
+        # Caller holds the lock
+        self._opened_at = self._clock()
+        self._transition(self.OPEN)
+
+    def _transition(self, state):
+        # Caller holds the lock
+        key = f"{self.state}->{state}"
+        self.transitions[key] = self.transitions.get(key, 0) + 1
+        self.state = state
+        self._outcomes.clear()
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+    def get_metrics(self):
+        with self._lock:
+            outcomes = list(self._outcomes)
+            return {
+                "name": self.name,
+                "state": self.state,
+                "window_calls": len(outcomes),
+                "window_failure_rate": round(sum(1 for f, _ in outcomes if f) / len(outcomes), 4) if outcomes else None,
+                "window_slow_rate": round(sum(1 for _, s in outcomes if s) / len(outcomes), 4) if outcomes else None,
+                "open_for_seconds": round(max(0.0, self.open_seconds - (self._clock() - self._opened_at)), 1)
+                if self.state == self.OPEN else None,
+                "transitions": dict(self.transitions),
+                "calls": self.calls,
+                "failures": self.failures,
+                "slow_calls": self.slow_calls,
+                "rejected": self.rejected,
+                "config": {
+                    "window": self.window,
+                    "min_calls": self.min_calls,
+                    "failure_rate": self.failure_rate,
+                    "slow_call_ms": self.slow_call_ms,
+                    "slow_call_rate": self.slow_call_rate,
+                    "open_seconds": self.open_seconds,
+                    "half_open_probes": self.half_open_probes,
+                },
+            }
@@ -0,0 +1,197 @@
+import threading
+from collections import OrderedDict, deque
+
+
+class ConversationContextStore:
+    """
+    Per-user LRU of recent chat turns used as LLM context.
+
+    Each user keeps at most `max_turns` messages ({"role", "content"}
+    dicts, oldest first). The whole store is capped by approximate size:
+    when adding a turn pushes it over `max_bytes`, the least recently used
+    users are dropped. A user who isn't cached (evicted, new worker,
+    restart) is rebuilt by `loader(user_id, max_turns)`, which returns the
+    same kind of message list, typically from the conversations table.
+
+    With several processes serving the same users, a cached user goes stale
+    as soon as another process handles one of their turns. If `versioner`
+    is given, `versioner(user_id)` returns a cheap version of the user's
+    stored conversation, (number of messages, latest message id), and a
+    cached user whose version no longer matches is reloaded before use.
+    Messages this process saves itself are reported with record_saved(),
+    which advances the cached version without a reload; a message saved
+    anywhere else changes the count and forces one.
+    """
+
+    # Dict, deque slot and bookkeeping tuple per message; dict entry, deque
+    # and list per user (approximate, CPython 64-bit)
+    _MESSAGE_OVERHEAD = 340
+    _USER_OVERHEAD = 800
+
+    def __init__(self, max_turns=20, max_bytes=64 * 1024 * 1024, loader=None, versioner=None):
+        self.max_turns = max_turns
+        self.max_bytes = max_bytes
+        self.loader = loader
+        self.versioner = versioner
+
+        self._users = OrderedDict()  # user_id -> [deque of (message, size), total size, version]
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.load_errors = 0
+        self.evictions = 0
+        self.stale_reloads = 0
+
+    def get(self, user_id):
+        """Return a copy of the user's recent messages, oldest first."""
+        with self._lock:
+            entry = self._lookup(user_id)
+        if entry is not None and self._revalidate(user_id, entry):
+            with self._lock:
+                return [message for message, _ in entry[0]]
+
+        messages, version = self._load(user_id)
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                # Another request may have loaded this user meanwhile; keep theirs
+                entry = self._insert(user_id, messages, version)
+                self._evict(keep=user_id)
+            return [message for message, _ in entry[0]]
+
+    def append(self, user_id, role, content):
+        """Add a turn to the user's context, loading it first if it isn't cached."""
+        with self._lock:
+            entry = self._lookup(user_id)
+        cached = entry is not None and self._revalidate(user_id, entry)
+        messages, version = ([], None) if cached else self._load(user_id)
+
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                entry = self._insert(user_id, messages, version)
+            self._push(entry, {"role": role, "content": content})
+            self._evict(keep=user_id)
+
+    def record_saved(self, user_id, message_id):
+        """Note that this process saved message_id for the user, with the same turn cached here."""
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None and entry[2] is not None:
+                count, _ = entry[2]
+                entry[2] = (count + 1, message_id)
+
+    def discard(self, user_id):
+        with self._lock:
+            entry = self._users.pop(user_id, None)
+            if entry is not None:
+                self._bytes -= entry[1] + self._USER_OVERHEAD
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+            self._bytes = 0
+
+    def _lookup(self, user_id):
+        # Caller holds the lock
+        entry = self._users.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._users.move_to_end(user_id)
+        self.hits += 1
+        return entry
+
+    def _revalidate(self, user_id, entry):
+        """Whether the cached entry still matches the stored conversation; drops it if not."""
+        version = self._version(user_id)
+        if version is None or version == entry[2]:
+            return True
+        with self._lock:
+            if self._users.get(user_id) is entry:
+                self._users.pop(user_id)
+                self._bytes -= entry[1] + self._USER_OVERHEAD
+            self.stale_reloads += 1
+        return False
+
+    def _version(self, user_id):
+        # None when there is no way to tell; the cached entry is then kept
+        if self.versioner is None or user_id is None:
+            return None
+        try:
+            return self.versioner(user_id)
+        except Exception as e:
+            print(f"Context version error for user {user_id}: {e}")
+            with self._lock:
+                self.load_errors += 1
+            return None
+
+    def _load(self, user_id):
+        """Return (messages, version) for the user."""
+        if self.loader is None or user_id is None:
+            return [], None
+        # Version first: a message saved while loading makes it look older
+        # than the messages, so the next lookup reloads rather than missing it
+        version = self._version(user_id)
+        try:
+            return self.loader(user_id, self.max_turns), version
+        except Exception as e:
+            print(f"Context load error for user {user_id}: {e}")
+            with self._lock:
+                self.load_errors += 1
+            return [], None
+
+    def _insert(self, user_id, messages, version=None):
+        # Caller holds the lock
+        entry = [deque(), 0, version]
+        self._users[user_id] = entry
+        self._bytes += self._USER_OVERHEAD
+        for message in messages[-self.max_turns:]:
+            self._push(entry, message)
+        return entry
+
+    def _push(self, entry, message):
+        # Caller holds the lock
+        turns = entry[0]
+        size = self._estimate_size(message)
+        turns.append((message, size))
+        entry[1] += size
+        self._bytes += size
+        while len(turns) > self.max_turns:
+            _, dropped = turns.popleft()
+            entry[1] -= dropped
+            self._bytes -= dropped
+
+    def _evict(self, keep=None):
+        # Caller holds the lock. Drop least recently used users until under
+        # the cap, but never the user being served right now
+        while self._bytes > self.max_bytes and self._users:
+            oldest = next(iter(self._users))
+            if oldest == keep:
+                break
+            entry = self._users.pop(oldest)
+            self._bytes -= entry[1] + self._USER_OVERHEAD
+            self.evictions += 1
+
+    @classmethod
+    def _estimate_size(cls, message):
+        return len(message["content"].encode("utf-8")) + cls._MESSAGE_OVERHEAD
+
+    def get_metrics(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "users": len(self._users),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "max_turns": self.max_turns,
+                "hits": self.hits,
+                "misses": self.misses,
+                "load_errors": self.load_errors,
+                "evictions": self.evictions,
+                "stale_reloads": self.stale_reloads,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
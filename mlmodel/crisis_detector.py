@@ -0,0 +1,78 @@
+import re
+
+
+class CrisisDetector:
+    """
+    Scans a message for any of a list of crisis regex patterns in one pass.
+
+    The patterns are compiled once into a single alternation. Patterns that
+    start with a plain letter or digit are grouped by it ("k(?:ill\\s*myself|
+    ill\\s*my\\s*family)|s(?:uicid)|..."), so at each position of the message
+    the regex engine only tries the branches that can start there instead
+    of every pattern. Branches are non-capturing: capture groups would stop
+    the engine from skipping ahead on the leading literals, which makes a
+    large alternation slower than the old loop.
+
+    A message matches exactly when re.search would find at least one of the
+    patterns in the lowercased text, so results are identical to checking
+    the patterns one by one.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self._regex = re.compile(self._combine(self.patterns)) if self.patterns else None
+
+    @classmethod
+    def _combine(cls, patterns):
+        groups = {}
+        other = []
+        for pattern in patterns:
+            if cls._groupable(pattern):
+                groups.setdefault(pattern[0], []).append(pattern[1:])
+            else:
+                other.append(pattern)
+        branches = [f"{char}(?:{'|'.join(rests)})" for char, rests in groups.items()]
+        branches += [f"(?:{pattern})" for pattern in other]
+        return "|".join(branches)
+
+    @staticmethod
+    def _groupable(pattern):
+        # The first character must be a literal on its own (no escape, no
+        # quantifier after it) and the pattern must have no top-level "|",
+        # or factoring it out would change what the pattern means
+        if len(pattern) < 2 or not pattern[0].isalnum() or pattern[1] in "*+?{":
+            return False
+        depth = 0
+        in_class = False
+        escaped = False
+        for char in pattern:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif in_class:
+                in_class = char != "]"
+            elif char == "[":
+                in_class = True
+            elif char == "(":
+                depth += 1
+            elif char == ")":
+                depth -= 1
+            elif char == "|" and depth == 0:
+                return False
+        return True
+
+    def is_crisis(self, message):
+        if self._regex is None:
+            return False
+        return self._regex.search(message.lower()) is not None
+
+    def match(self, message):
+        """Return the first pattern (in list order) found in message, or None."""
+        if not self.is_crisis(message):
+            return None
+        message_lower = message.lower()
+        for pattern in self.patterns:
+            if re.search(pattern, message_lower):
+                return pattern
+        return None
@@ -1,68 +1,533 @@
 from transformers import pipeline
+from bisect import bisect_left
+from contextlib import nullcontext
 import numpy as np
+import os
+import re
+import time
+import torch
+
+from inference_batcher import InferenceBatcher
+from lexicon_classifier import LexiconClassifier
+from metrics import RollingStats
+from result_cache import EmotionResultCache
+
+# Relative cache paths (MODEL_CACHE_DIR, EMOTION_ONNX_DIR) are taken from the
+# project root, so exports land in the same place whatever the working directory
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 
 class EmotionAnalyzer:
-    def __init__(self):
+    # Supported values for EMOTION_BACKEND
+    BACKENDS = ("torch", "onnx", "onnx-int8")
+
+    # Supported values for EMOTION_INFERENCE_MODE
+    INFERENCE_MODES = ("local", "pool")
+
+    # Supported values for EMOTION_AGGREGATION (how window scores combine)
+    AGGREGATIONS = ("mean", "max")
+
+    # Cascade tiers, cheapest first (reported in get_metrics)
+    TIERS = ("lexicon", "cache", "model")
+
+    # A sentence ends at ., !, ? or an ellipsis (plus closing quotes/brackets), or at a line break
+    SENTENCE_END = re.compile(r'[.!?\u2026]+["\')\]]*\s+|\n+')
+
+    def __init__(self, classifier=None, model_name=None, backend=None, inference_mode=None):
         """Initialize the emotion analyzer with a pre-trained model."""
-        print("Loading emotion detection model...")
-        try:
+        self.model_name = model_name or os.getenv('EMOTION_MODEL', 'SamLowe/roberta-base-go_emotions')
+        self.backend = backend or os.getenv('EMOTION_BACKEND', 'torch')
+        if self.backend not in self.BACKENDS:
+            raise ValueError(f"Unknown EMOTION_BACKEND '{self.backend}', expected one of {self.BACKENDS}")
+        # "pool" runs the model in separate inference processes (see inference_pool.py)
+        self.inference_mode = inference_mode or os.getenv('EMOTION_INFERENCE_MODE', 'local')
+        if self.inference_mode not in self.INFERENCE_MODES:
+            raise ValueError(f"Unknown EMOTION_INFERENCE_MODE '{self.inference_mode}', expected one of {self.INFERENCE_MODES}")
+
+        if os.getenv('EMOTION_NUM_THREADS'):
+            configure_inference_threads(int(os.getenv('EMOTION_NUM_THREADS')))
+
+        if classifier is not None:
+            self.classifier = classifier
+        else:
+            print(f"Loading emotion detection model ({self.backend} backend, {self.inference_mode} inference)...")
+            try:
+                self.classifier = self._load_classifier()
+                print("Model loaded successfully!")
+            except Exception as e:
+                print(f"Error loading model: {e}")
+                self.classifier = None
+
+        # Fixed label index: every score vector is ordered like self.labels
+        self.labels = self._resolve_labels()
+        self._label_index = self._build_label_index(self.labels)
+
+        # Long-text handling: texts are tokenized once, capped at max_input_tokens,
+        # and split into sentence-aligned windows of at most window_tokens
+        self.tokenizer = getattr(self.classifier, 'tokenizer', None)
+        self.max_input_tokens = int(os.getenv('EMOTION_MAX_INPUT_TOKENS', 2048))
+        self.window_tokens = int(os.getenv('EMOTION_WINDOW_TOKENS', 256))
+        self.aggregation = os.getenv('EMOTION_AGGREGATION', 'mean')
+        if self.aggregation not in self.AGGREGATIONS:
+            raise ValueError(f"Unknown EMOTION_AGGREGATION '{self.aggregation}', expected one of {self.AGGREGATIONS}")
+        self.long_texts = 0
+        self.truncated_texts = 0
+
+        # Rows per forward pass when the pipeline is given a list of texts
+        self.pipeline_batch_size = int(os.getenv('EMOTION_PIPELINE_BATCH_SIZE', 16))
+
+        # Length bucketing: sort a batch by token length so each forward pass
+        # only pads to the longest text in its own bucket. An optional token
+        # budget (rows x longest row) caps the padded size of one forward pass.
+        self.length_bucketing = os.getenv('EMOTION_LENGTH_BUCKETING', '1') == '1'
+        self.max_batch_tokens = int(os.getenv('EMOTION_MAX_BATCH_TOKENS', 0))
+        self.real_tokens = 0
+        self.padded_tokens = 0
+
+        # Micro-batching: concurrent analyze() calls share one forward pass
+        self.batcher = None
+        if self.classifier and os.getenv('EMOTION_BATCHING', '1') == '1':
+            self.batcher = InferenceBatcher(
+                self._score_texts,
+                max_batch_size=int(os.getenv('EMOTION_BATCH_MAX_SIZE', 16)),
+                max_wait_ms=float(os.getenv('EMOTION_BATCH_MAX_WAIT_MS', 5)),
+                name="emotion"
+            )
+
+        # Result cache: repeated messages ("thanks", "ok") skip the model
+        self.cache = None
+        if os.getenv('EMOTION_CACHE', '1') == '1':
+            self.cache = EmotionResultCache(
+                # int8 scores differ slightly from fp32, so keep them apart
+                f"{self.model_name}:{self.backend}",
+                max_entries=int(os.getenv('EMOTION_CACHE_MAX_ENTRIES', 10000)),
+                max_bytes=int(float(os.getenv('EMOTION_CACHE_MAX_MB', 16)) * 1024 * 1024),
+                ttl_seconds=float(os.getenv('EMOTION_CACHE_TTL_SECONDS', 3600)),
+                db_path=os.getenv('EMOTION_CACHE_DB') or None
+            )
+
+        # Tier 0: acknowledgements and pleasantries ("yeah", "thank you", "🙏")
+        # are answered by a lexicon classifier when it is confident enough;
+        # only the rest pays for a transformer pass
+        self.tier0_enabled = os.getenv('EMOTION_TIER0', '1') == '1'
+        self.tier0_threshold = float(os.getenv('EMOTION_TIER0_THRESHOLD', 0.85))
+        self._tier0 = None
+        self.tier_counts = {tier: 0 for tier in self.TIERS}
+        self.tier_latency = {tier: RollingStats() for tier in self.TIERS}
+
+    def _load_classifier(self):
+        """Load the classifier for the configured backend."""
+        if self.inference_mode == "pool":
+            from inference_pool import InferencePool
+            return InferencePool(
+                self.model_name,
+                backend=self.backend,
+                num_workers=int(os.getenv('EMOTION_POOL_WORKERS', 2)),
+                threads_per_worker=int(os.getenv('EMOTION_POOL_THREADS', 1)),
+                max_batch_size=int(os.getenv('EMOTION_POOL_MAX_BATCH', 32)),
+                max_wait_ms=float(os.getenv('EMOTION_POOL_MAX_WAIT_MS', 5)),
+                timeout=float(os.getenv('EMOTION_POOL_TIMEOUT', 30)),
+                web_worker_index=int(os.getenv('WEB_WORKER_INDEX', 0))
+            )
+
+        if self.backend == "torch":
             # Using GoEmotions model (28 labels)
-            self.classifier = pipeline(
+            return pipeline(
                 "text-classification",
-                model="SamLowe/roberta-base-go_emotions",
+                model=self.model_name,
                 top_k=None
             )
-            print("Model loaded successfully!")
+
+        from onnx_backend import OnnxEmotionClassifier
+        # Export directory for this model's graph; EMOTION_ONNX_DIR names one
+        # model's directory, not a shared parent
+        onnx_dir = os.getenv('EMOTION_ONNX_DIR') or os.path.join(
+            os.getenv('MODEL_CACHE_DIR', 'model_cache'), 'onnx', self.model_name.replace('/', '--')
+        )
+        return OnnxEmotionClassifier(
+            self.model_name,
+            os.path.join(PROJECT_ROOT, onnx_dir),
+            quantize=self.backend == "onnx-int8"
+        )
+
+    def _resolve_labels(self):
+        """Read the model's label names in output order, if the classifier exposes them."""
+        labels = getattr(self.classifier, 'labels', None)
+        if labels is None:
+            config = getattr(getattr(self.classifier, 'model', None), 'config', None)
+            if config is not None and getattr(config, 'id2label', None):
+                labels = [config.id2label[i] for i in range(len(config.id2label))]
+        return [label.lower() for label in labels] if labels else None
+
+    @staticmethod
+    def _build_label_index(labels):
+        return {label: i for i, label in enumerate(labels)} if labels else {}
+
+    def warm_up(self):
+        """Run one throwaway inference so lazy allocations happen before real traffic."""
+        if not self.classifier:
+            return
+        try:
+            self._score_texts(["Warming up the emotion model."])
         except Exception as e:
-            print(f"Error loading model: {e}")
-            self.classifier = None
-    
-    def analyze(self, text):
+            print(f"Warm-up inference failed: {e}")
+
+    def analyze(self, text, top_k=None, min_score=None):
         """
         Analyze the emotion in the given text.
-        
+
         Args:
             text (str): The text to analyze
-            
+            top_k (int, optional): Only include the top_k emotions in all_emotions
+            min_score (float, optional): Only include emotions scoring at least this
+
         Returns:
             dict: Dictionary containing emotion and confidence scores
         """
         if not self.classifier:
-            return {
-                "emotion": "neutral",
-                "confidence": 0.5,
-                "all_emotions": {}
-            }
-        
+            return self._neutral_result()
+
         try:
-            results = self.classifier(text)[0]
-            
-            # Convert to a more readable format
-            emotions = {}
-            top_emotion = None
-            top_score = 0
-            
-            for result in results:
-                emotion = result['label'].lower()
-                score = result['score']
-                emotions[emotion] = score
-                
-                if score > top_score:
-                    top_score = score
-                    top_emotion = emotion
-            
-            return {
-                "emotion": top_emotion,
-                "confidence": top_score,
-                "all_emotions": emotions
-            }
+            scores = self.analyze_scores(text)
         except Exception as e:
             print(f"Error analyzing emotion: {e}")
-            return {
-                "emotion": "neutral",
-                "confidence": 0.5,
-                "all_emotions": {}
+            return self._neutral_result()
+
+        return self.to_result(scores, top_k=top_k, min_score=min_score)
+
+    def analyze_scores(self, text):
+        """
+        Return the float32 score vector for text, indexed like self.labels.
+
+        Tries the lexicon tier, then the cache, then the model. Raises on
+        inference errors; analyze() turns those into a neutral result.
+        """
+        started = time.perf_counter()
+        scores = self._tier0_scores(text)
+        if scores is not None:
+            self._record_tier("lexicon", started)
+            return scores
+
+        if self.cache:
+            cached = self.cache.get(text)
+            if cached is not None:
+                self._record_tier("cache", started)
+                return cached
+
+        if self.batcher:
+            scores = self.batcher.submit(text)
+        else:
+            scores = self._score_texts([text])[0]
+        self._record_tier("model", started)
+
+        if self.cache:
+            self.cache.set(text, scores)
+        return scores
+
+    def analyze_batch(self, texts, top_k=None, min_score=None):
+        """
+        Analyze a list of texts using the pipeline's native batching.
+
+        Args:
+            texts (list[str]): The texts to analyze
+            top_k (int, optional): Only include the top_k emotions in all_emotions
+            min_score (float, optional): Only include emotions scoring at least this
+
+        Returns:
+            list[dict]: One result per text, in order. Items that could not be
+            analyzed are returned as {"error": "..."} instead of a result.
+        """
+        if not texts:
+            return []
+
+        if not self.classifier:
+            return [self._neutral_result() for _ in texts]
+
+        scores = [None] * len(texts)
+        for i, text in enumerate(texts):
+            started = time.perf_counter()
+            scores[i] = self._tier0_scores(text)
+            if scores[i] is not None:
+                self._record_tier("lexicon", started)
+            elif self.cache:
+                scores[i] = self.cache.get(text)
+                if scores[i] is not None:
+                    self._record_tier("cache", started)
+
+        pending = [i for i, vector in enumerate(scores) if vector is None]
+        if pending:
+            started = time.perf_counter()
+            try:
+                analyzed = list(self._score_texts([texts[i] for i in pending]))
+            except Exception as e:
+                print(f"Batch analysis failed ({e}), retrying items individually...")
+                # Isolate the failing items so one bad input doesn't fail the whole batch
+                analyzed = []
+                for i in pending:
+                    try:
+                        analyzed.append(self._score_texts([texts[i]])[0])
+                    except Exception as item_e:
+                        analyzed.append(item_e)
+
+            for i, vector in zip(pending, analyzed):
+                scores[i] = vector
+                if not isinstance(vector, Exception):
+                    # Every item in the batch waited for the whole batch
+                    self._record_tier("model", started)
+                    if self.cache:
+                        self.cache.set(texts[i], vector)
+
+        return [
+            {"error": str(vector)} if isinstance(vector, Exception)
+            else self.to_result(vector, top_k=top_k, min_score=min_score)
+            for vector in scores
+        ]
+
+    def to_result(self, scores, top_k=None, min_score=None):
+        """
+        Build the JSON result dict from a score vector.
+
+        This is the only place the per-label dict is created; all_emotions is
+        ordered by score and can be trimmed with top_k / min_score.
+        """
+        top = int(np.argmax(scores))
+        order = np.argsort(scores)[::-1]
+        if top_k is not None:
+            order = order[:top_k]
+        if min_score is not None:
+            order = order[scores[order] >= min_score]
+
+        return {
+            "emotion": self.labels[top],
+            "confidence": float(scores[top]),
+            "all_emotions": {self.labels[i]: float(scores[i]) for i in order}
+        }
+
+    def _tier0_scores(self, text):
+        """Score vector from the lexicon tier, or None if it is not confident enough."""
+        if not self.tier0_enabled or not self.labels:
+            return None
+        if self._tier0 is None:
+            self._tier0 = LexiconClassifier(self.labels)
+        result = self._tier0.classify(text)
+        if result is None or result[1] < self.tier0_threshold:
+            return None
+        return result[0]
+
+    def _record_tier(self, tier, started):
+        self.tier_counts[tier] += 1
+        self.tier_latency[tier].add((time.perf_counter() - started) * 1000.0)
+
+    def _score_texts(self, texts):
+        """
+        Run the classifier once over a list of texts and return an
+        (n_texts, n_labels) float32 score matrix.
+
+        Over-length texts are split into windows (see _split_text) and all
+        windows of all texts are scored in the same batch. Window scores are
+        then combined per text according to EMOTION_AGGREGATION:
+
+        - "mean": token-length-weighted mean of each label's score, so a long
+          paragraph counts more than a short closing line
+        - "max": each label's highest score in any window, so a strong
+          emotion anywhere in the text is not averaged away
+        """
+        windows = []
+        groups = []
+        for text in texts:
+            parts, lengths = self._split_text(text)
+            groups.append((len(windows), lengths))
+            windows.extend(parts)
+
+        window_lengths = [length for _, lengths in groups for length in lengths]
+        window_scores = self._run_model(windows, window_lengths)
+        if len(windows) == len(texts):
+            return window_scores
+
+        scores = np.empty((len(texts), window_scores.shape[1]), dtype=np.float32)
+        for row, (start, lengths) in enumerate(groups):
+            chunk = window_scores[start:start + len(lengths)]
+            if len(lengths) == 1:
+                scores[row] = chunk[0]
+            elif self.aggregation == "max":
+                scores[row] = chunk.max(axis=0)
+            else:
+                scores[row] = np.average(chunk, axis=0, weights=np.asarray(lengths, dtype=np.float32))
+        return scores
+
+    def _split_text(self, text):
+        """
+        Split text into sentence-aligned windows of at most window_tokens tokens.
+
+        Returns (window_texts, window_token_counts). Text beyond
+        max_input_tokens is dropped so worst-case latency stays bounded. A
+        single sentence longer than a window is split at the token limit.
+        """
+        if self.tokenizer is None:
+            return [text], [1]
+
+        offsets = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)['offset_mapping']
+        if len(offsets) <= self.window_tokens:
+            return [text], [max(1, len(offsets))]
+
+        self.long_texts += 1
+        if len(offsets) > self.max_input_tokens:
+            self.truncated_texts += 1
+            offsets = offsets[:self.max_input_tokens]
+
+        # Token index at which each sentence starts
+        token_starts = [start for start, _ in offsets]
+        sentence_starts = sorted({
+            bisect_left(token_starts, match.end())
+            for match in self.SENTENCE_END.finditer(text)
+        })
+
+        windows = []
+        lengths = []
+        start = 0
+        while start < len(offsets):
+            limit = min(start + self.window_tokens, len(offsets))
+            end = limit
+            if limit < len(offsets):
+                # Latest sentence boundary that still fits in this window
+                index = bisect_left(sentence_starts, limit + 1) - 1
+                if index >= 0 and sentence_starts[index] > start:
+                    end = sentence_starts[index]
+            windows.append(text[offsets[start][0]:offsets[end - 1][1]])
+            lengths.append(end - start)
+            start = end
+        return windows, lengths
+
+    def _run_model(self, texts, lengths=None):
+        """
+        Run the classifier over texts and return an (n, n_labels) float32 score matrix.
+
+        With length bucketing on, texts are sorted by token length (lengths,
+        or computed here if not given) and cut into forward passes of at most
+        pipeline_batch_size rows and max_batch_tokens padded tokens. Each pass
+        pads only to its own longest text; rows are put back in input order.
+        """
+        texts = list(texts)
+        # The pool's workers bucket the batches they run, so send them as is
+        if not self.length_bucketing or self.inference_mode == "pool" or len(texts) <= 1:
+            if lengths is not None:
+                for start in range(0, len(lengths), self.pipeline_batch_size):
+                    batch = lengths[start:start + self.pipeline_batch_size]
+                    self.real_tokens += sum(batch)
+                    self.padded_tokens += len(batch) * max(batch)
+            return self._forward(texts, self.pipeline_batch_size)
+
+        if lengths is None:
+            lengths = self._token_lengths(texts)
+        order = sorted(range(len(texts)), key=lengths.__getitem__)
+
+        scores = None
+        start = 0
+        while start < len(order):
+            end = start + 1
+            while end < len(order) and end - start < self.pipeline_batch_size:
+                # Sorted ascending, so the row being added is the longest so far
+                if self.max_batch_tokens and (end - start + 1) * lengths[order[end]] > self.max_batch_tokens:
+                    break
+                end += 1
+            bucket = order[start:end]
+            bucket_scores = self._forward([texts[i] for i in bucket], len(bucket))
+            if scores is None:
+                scores = np.empty((len(texts), bucket_scores.shape[1]), dtype=np.float32)
+            scores[bucket] = bucket_scores
+            self.real_tokens += sum(lengths[i] for i in bucket)
+            self.padded_tokens += len(bucket) * lengths[bucket[-1]]
+            start = end
+        return scores
+
+    def _forward(self, texts, batch_size):
+        """Run the classifier over texts, batch_size rows per forward pass."""
+        # inference_mode skips autograd bookkeeping entirely (cheaper than no_grad)
+        local_torch = self.backend == "torch" and self.inference_mode == "local"
+        context = torch.inference_mode() if local_torch else nullcontext()
+        with context:
+            if hasattr(self.classifier, 'predict_scores'):
+                # ONNX backend and inference pool already return label-ordered vectors
+                return self.classifier.predict_scores(texts, batch_size=batch_size)
+            outputs = self.classifier(texts, batch_size=batch_size)
+        return self._outputs_to_scores(outputs)
+
+    def _token_lengths(self, texts):
+        """Token count per text, or character count if there is no tokenizer."""
+        if self.tokenizer is None:
+            return [len(text) for text in texts]
+        encoded = self.tokenizer(texts, add_special_tokens=False)['input_ids']
+        return [len(ids) for ids in encoded]
+
+    def _outputs_to_scores(self, outputs):
+        """Convert pipeline output (per text, a list of label/score dicts) to a score matrix."""
+        if self.labels is None:
+            # Classifier didn't expose its labels; take them from the first output
+            self.labels = sorted(result['label'].lower() for result in outputs[0])
+            self._label_index = self._build_label_index(self.labels)
+
+        index = self._label_index
+        scores = np.zeros((len(outputs), len(self.labels)), dtype=np.float32)
+        for row, results in enumerate(outputs):
+            for result in results:
+                label = result['label']
+                column = index.get(label)
+                if column is None:
+                    column = index[label.lower()]
+                scores[row, column] = result['score']
+        return scores
+
+    def _neutral_result(self):
+        return {
+            "emotion": "neutral",
+            "confidence": 0.5,
+            "all_emotions": {}
+        }
+
+    def get_metrics(self):
+        """Return inference metrics for the /metrics endpoint."""
+        return {
+            "model": self.model_name,
+            "backend": self.backend,
+            "model_loaded": self.classifier is not None,
+            "inference_mode": self.inference_mode,
+            "labels": len(self.labels) if self.labels else None,
+            "long_texts": self.long_texts,
+            "truncated_texts": self.truncated_texts,
+            "length_bucketing": self.length_bucketing,
+            # Share of tokens in forward passes that were real text rather than padding
+            "padding_efficiency": round(self.real_tokens / self.padded_tokens, 4) if self.padded_tokens else None,
+            "inference_threads": torch.get_num_threads(),
+            "pool": self.classifier.get_metrics() if self.inference_mode == "pool" and self.classifier else None,
+            "batcher": self.batcher.get_metrics() if self.batcher else None,
+            "cache": self.cache.get_metrics() if self.cache else None,
+            "tiers": self._tier_metrics()
+        }
+
+    def _tier_metrics(self):
+        """Share of analyzed texts answered by each cascade tier, with latency percentiles."""
+        total = sum(self.tier_counts.values())
+        return {
+            tier: {
+                "count": self.tier_counts[tier],
+                "fraction": round(self.tier_counts[tier] / total, 4) if total else None,
+                "latency_ms": self.tier_latency[tier].snapshot(),
             }
+            for tier in self.TIERS
+        }
+
+def configure_inference_threads(num_threads):
+    """
+    Limit the intra-op CPU threads used for inference in this process.
+
+    With several gunicorn workers on one host, torch's default (one thread
+    per core in every worker) oversubscribes the CPU; each worker should get
+    its share of the core budget instead.
+    """
+    num_threads = max(1, int(num_threads))
+    os.environ['OMP_NUM_THREADS'] = str(num_threads)
+    os.environ['EMOTION_ONNX_THREADS'] = str(num_threads)
+    torch.set_num_threads(num_threads)
+    return num_threads
 
 # Singleton instance
 _analyzer = None
@@ -1,6 +1,11 @@
 import requests
 import os
+import threading
 import time
+from requests.adapters import HTTPAdapter
+
+from adaptive_timeout import get_timeout_controller
+from circuit_breaker import CircuitBreaker, CircuitOpenError
 
 class ExternalSentimentAnalyzer:
     def __init__(self):
@@ -8,21 +13,92 @@ class ExternalSentimentAnalyzer:
         self.api_url = os.getenv('EXTERNAL_SENTIMENT_URL')
         if not self.api_url:
             print("WARNING: EXTERNAL_SENTIMENT_URL not set.")
+        
+        # Separate connect and read timeouts: a dead host should fail fast.
+        # The read timeout adapts to observed latency, between the min and
+        # EXTERNAL_SENTIMENT_READ_TIMEOUT (see adaptive_timeout.py)
+        self.connect_timeout = float(os.getenv('EXTERNAL_SENTIMENT_CONNECT_TIMEOUT', 2))
+        self.read_timeout = float(os.getenv('EXTERNAL_SENTIMENT_READ_TIMEOUT', 10))
+        self.timeouts = get_timeout_controller(
+            "external_sentiment",
+            min_seconds=float(os.getenv('EXTERNAL_SENTIMENT_MIN_READ_TIMEOUT', 0.5)),
+            max_seconds=self.read_timeout
+        )
+        self.keep_alive = os.getenv('EXTERNAL_SENTIMENT_KEEP_ALIVE', '1') == '1'
+        
+        # One connection pool shared by all request threads. urllib3's pool is
+        # thread-safe, but a requests.Session (cookies, settings) is not, so
+        # each thread gets its own Session mounted on the shared adapter.
+        pool_size = int(os.getenv('EXTERNAL_SENTIMENT_POOL_SIZE', 10))
+        self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self._local = threading.local()
+        
+        # Circuit breaker: after repeated failures or slow calls, skip the
+        # API entirely (callers fall back to the local model) and probe it
+        # again after a cool-down
+        self.breaker = None
+        if os.getenv('EXTERNAL_SENTIMENT_BREAKER', '1') == '1':
+            self.breaker = CircuitBreaker(
+                "external_sentiment",
+                window=int(os.getenv('EXTERNAL_SENTIMENT_BREAKER_WINDOW', 20)),
+                min_calls=int(os.getenv('EXTERNAL_SENTIMENT_BREAKER_MIN_CALLS', 5)),
+                failure_rate=float(os.getenv('EXTERNAL_SENTIMENT_BREAKER_FAILURE_RATE', 0.5)),
+                slow_call_ms=float(os.getenv('EXTERNAL_SENTIMENT_BREAKER_SLOW_CALL_MS', 2000)),
+                slow_call_rate=float(os.getenv('EXTERNAL_SENTIMENT_BREAKER_SLOW_CALL_RATE', 0.5)),
+                open_seconds=float(os.getenv('EXTERNAL_SENTIMENT_BREAKER_OPEN_SECONDS', 30)),
+                half_open_probes=int(os.getenv('EXTERNAL_SENTIMENT_BREAKER_PROBES', 1))
+            )
+    
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.mount('http://', self._adapter)
+            session.mount('https://', self._adapter)
+            if not self.keep_alive:
+                session.headers['Connection'] = 'close'
+            self._local.session = session
+        return session
     
     def analyze(self, text):
         """
         Analyze text using external API. 
         Returns dict with 'emotion' and 'confidence'.
-        Raises Exception on failure so caller can fallback to local model.
+        Raises Exception on failure so caller can fallback to local model
+        (CircuitOpenError if the call was skipped because the circuit is open).
         """
         if not self.api_url:
             raise Exception("External API URL not configured")
-            
+        
+        if self.breaker is None:
+            return self._call_api(text)
+        
+        ticket = self.breaker.allow()
+        if ticket is None:
+            raise CircuitOpenError("External API circuit is open")
+        
+        started = time.perf_counter()
+        try:
+            result = self._call_api(text)
+        except Exception:
+            self.breaker.record(ticket, False, (time.perf_counter() - started) * 1000.0)
+            raise
+        self.breaker.record(ticket, True, (time.perf_counter() - started) * 1000.0)
+        if ticket == "probe":
+            result["source"] = "external_api:probe"
+        return result
+    
+    def _call_api(self, text):
         payload = {"text": text}
         
+        read_timeout = self.timeouts.timeout()
+        started = time.perf_counter()
         try:
-            # 10s timeout for network latency
-            response = requests.post(self.api_url, json=payload, timeout=10)
+            # Pooled keep-alive connection: no new TCP/TLS handshake per call
+            response = self._session().post(
+                self.api_url, json=payload, timeout=(self.connect_timeout, read_timeout)
+            )
+            self.timeouts.record(time.perf_counter() - started)
             
             if response.status_code == 200:
                 data = response.json()
@@ -40,8 +116,24 @@ class ExternalSentimentAnalyzer:
             else:
                 raise Exception(f"API returned status {response.status_code}: {response.text}")
                 
+        except requests.exceptions.ReadTimeout as e:
+            self.timeouts.record_timeout(read_timeout)
+            raise Exception(f"Network error: {e}")
         except requests.exceptions.RequestException as e:
             raise Exception(f"Network error: {e}")
+    
+    def get_metrics(self):
+        """Return client settings and circuit breaker state for the /metrics endpoint."""
+        return {
+            "configured": bool(self.api_url),
+            "connect_timeout": self.connect_timeout,
+            "read_timeout": self.timeouts.get_metrics(),
+            "circuit_breaker": self.breaker.get_metrics() if self.breaker else None
+        }
+    
+    def close(self):
+        """Close pooled connections."""
+        self._adapter.close()
 
 # Singleton
 _analyzer = None
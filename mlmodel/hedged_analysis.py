@@ -0,0 +1,226 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from circuit_breaker import CircuitOpenError
+from metrics import RollingStats
+
+
+class HedgedEmotionAnalyzer:
+    """
+    Picks the emotion for a chat message from the external sentiment API
+    and/or the local model, according to EMOTION_HEDGE_POLICY:
+
+    - "sequential" (default): external API first; the local model runs
+      only after it fails, so a failure costs both latencies
+    - "prefer_external": both run in parallel; the external result is used
+      if it arrives within EMOTION_HEDGE_PREFER_EXTERNAL_MS, otherwise
+      whichever acceptable result comes first
+    - "fastest": both run in parallel; the first acceptable result wins
+    - "local_only": the external API is never called
+
+    In the parallel policies the local model starts EMOTION_HEDGE_DELAY_MS
+    after the external call (0 = immediately), so a fast external answer
+    doesn't cost any local inference. The loser is ignored. If no
+    acceptable result arrives within EMOTION_HEDGE_BUDGET_MS, a neutral
+    result is returned.
+
+    External calls and local inference run on separate thread pools, so
+    external calls that are slow (and whose results end up ignored) can't
+    delay local inference. At most EMOTION_HEDGE_WORKERS external calls
+    are outstanding; beyond that the external API is skipped and the local
+    model answers alone ("local_model:external_shed").
+
+    Every result carries a "source" naming the path that produced it.
+    """
+
+    POLICIES = ("sequential", "prefer_external", "fastest", "local_only")
+
+    def __init__(self, local_analyzer, external_analyzer, policy=None):
+        self.local = local_analyzer
+        self.external = external_analyzer
+        self.policy = policy or os.getenv('EMOTION_HEDGE_POLICY', 'sequential')
+        if self.policy not in self.POLICIES:
+            raise ValueError(f"Unknown EMOTION_HEDGE_POLICY '{self.policy}', expected one of {self.POLICIES}")
+        self.hedge_delay_ms = float(os.getenv('EMOTION_HEDGE_DELAY_MS', 0))
+        self.prefer_external_ms = float(os.getenv('EMOTION_HEDGE_PREFER_EXTERNAL_MS', 300))
+        self.budget_ms = float(os.getenv('EMOTION_HEDGE_BUDGET_MS', 3000))
+
+        # Shared by all request threads. External calls get their own pool,
+        # capped at max_external, so a slow API can't starve local inference
+        self.max_external = int(os.getenv('EMOTION_HEDGE_WORKERS', 16))
+        self._external_executor = ThreadPoolExecutor(
+            max_workers=self.max_external,
+            thread_name_prefix="emotion-hedge-external"
+        )
+        self._local_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('EMOTION_HEDGE_LOCAL_WORKERS', 16)),
+            thread_name_prefix="emotion-hedge-local"
+        )
+
+        # Metrics
+        self._lock = threading.Lock()
+        self.sources = {}
+        self.local_started = 0
+        self.losers_ignored = 0
+        self.external_in_flight = 0
+        self.external_shed = 0
+        self.latency = RollingStats()
+
+    def analyze(self, text):
+        """Return {"emotion", "confidence", "source"} for text."""
+        started = time.perf_counter()
+        if self.policy == "local_only" or not self.external.api_url:
+            result = self._local_or_fallback(text, "local_model")
+        elif self.policy == "sequential":
+            result = self._sequential(text)
+        else:
+            result = self._hedged(text, started)
+
+        self.latency.add((time.perf_counter() - started) * 1000.0)
+        with self._lock:
+            self.sources[result["source"]] = self.sources.get(result["source"], 0) + 1
+        return result
+
+    def _sequential(self, text):
+        try:
+            print("Attempting external sentiment analysis...")
+            return self.external.analyze(text)
+        except CircuitOpenError:
+            return self._local_or_fallback(text, "local_model:circuit_open")
+        except Exception as e:
+            print(f"External API failed ({e}), falling back to local model...")
+            return self._local_or_fallback(text, "local_model:external_error")
+
+    def _hedged(self, text, started):
+        deadline = started + self.budget_ms / 1000.0
+        prefer_until = started + (self.prefer_external_ms / 1000.0 if self.policy == "prefer_external" else 0)
+
+        local = None
+        local_result = None
+        local_failed = False
+        local_source = "local_model:hedged"
+
+        external = self._submit_external(text)
+        if external is None:
+            # Too many external calls outstanding (the API is slow); don't add to them
+            local_source = "local_model:external_shed"
+        elif self.hedge_delay_ms > 0:
+            wait([external], timeout=min(self.hedge_delay_ms, self.budget_ms) / 1000.0)
+        while True:
+            if external is not None and external.done():
+                try:
+                    result = external.result()
+                    if local is not None and not local.done():
+                        self._ignored()
+                    return result
+                except CircuitOpenError:
+                    local_source = "local_model:circuit_open"
+                except Exception as e:
+                    print(f"External API failed ({e}), using local model...")
+                    local_source = "local_model:external_error"
+                external = None
+
+            if local is None and time.perf_counter() < deadline:
+                with self._lock:
+                    self.local_started += 1
+                local = self._local_executor.submit(self._analyze_local, text)
+
+            if local is not None and local.done() and local_result is None and not local_failed:
+                try:
+                    local_result = local.result()
+                except Exception as e:
+                    print(f"Local analysis error: {e}")
+                    local_failed = True
+                    if external is None:
+                        return self._neutral("fallback")
+            if local_result is not None and (external is None or time.perf_counter() >= prefer_until):
+                if external is not None:
+                    self._ignored()
+                return dict(local_result, source=local_source)
+
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            waiting = [f for f in (external, local) if f is not None and not f.done()]
+            if not waiting:
+                break
+            timeout = deadline - now
+            if local_result is not None:
+                # Local is ready; only wait out the rest of the external preference window
+                timeout = min(timeout, prefer_until - now)
+            wait(waiting, timeout=timeout, return_when=FIRST_COMPLETED)
+
+        if local_result is not None:
+            return dict(local_result, source=local_source)
+        self._ignored()
+        return self._neutral("fallback:budget")
+
+    def _submit_external(self, text):
+        with self._lock:
+            if self.external_in_flight >= self.max_external:
+                self.external_shed += 1
+                return None
+            self.external_in_flight += 1
+        future = self._external_executor.submit(self.external.analyze, text)
+        future.add_done_callback(self._external_done)
+        return future
+
+    def _external_done(self, future):
+        with self._lock:
+            self.external_in_flight -= 1
+
+    def _analyze_local(self, text):
+        # analyze_scores raises on failure (analyze() would hide it as neutral)
+        return self.local.to_result(self.local.analyze_scores(text), top_k=0)
+
+    def _local_or_fallback(self, text, source):
+        try:
+            return dict(self._analyze_local(text), source=source)
+        except Exception as e:
+            print(f"Local analysis error: {e}")
+            return self._neutral("fallback")
+
+    def _ignored(self):
+        with self._lock:
+            self.losers_ignored += 1
+
+    @staticmethod
+    def _neutral(source):
+        return {"emotion": "neutral", "confidence": 0.5, "all_emotions": {}, "source": source}
+
+    def get_metrics(self):
+        with self._lock:
+            sources = dict(self.sources)
+            local_started = self.local_started
+            losers_ignored = self.losers_ignored
+            external_in_flight = self.external_in_flight
+            external_shed = self.external_shed
+        return {
+            "policy": self.policy,
+            "hedge_delay_ms": self.hedge_delay_ms,
+            "prefer_external_ms": self.prefer_external_ms,
+            "budget_ms": self.budget_ms,
+            "sources": sources,
+            "local_started": local_started,
+            "losers_ignored": losers_ignored,
+            "external_in_flight": external_in_flight,
+            "max_external": self.max_external,
+            "external_shed": external_shed,
+            "latency_ms": self.latency.snapshot(),
+        }
+
+
+# Singleton
+_hedged_analyzer = None
+_hedged_lock = threading.Lock()
+
+def get_hedged_analyzer():
+    global _hedged_analyzer
+    with _hedged_lock:
+        if _hedged_analyzer is None:
+            from emotion_analyzer import get_analyzer
+            from external_sentiment import get_external_analyzer
+            _hedged_analyzer = HedgedEmotionAnalyzer(get_analyzer(), get_external_analyzer())
+    return _hedged_analyzer
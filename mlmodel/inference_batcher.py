@@ -0,0 +1,116 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from metrics import RollingStats
+
+
+class InferenceBatcher:
+    """
+    Collects concurrent single-item calls into one batched call.
+
+    Callers block in submit() while a background thread drains the queue:
+    it takes the first waiting item, then keeps collecting until either
+    max_batch_size items are gathered or max_wait_ms has passed, and runs
+    batch_fn once over the whole group. Each caller gets back its own result.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=16, max_wait_ms=5, name="inference"):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+
+        # Metrics
+        self.batch_sizes = RollingStats()
+        self.queue_wait_ms = RollingStats()
+        self.batch_latency_ms = RollingStats()
+        self.items_processed = 0
+        self.batches_processed = 0
+        self.batch_errors = 0
+        self.max_queue_depth = 0
+
+    def submit(self, item, timeout=None):
+        """Queue one item and block until its result is ready."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        depth = self._queue.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+        return future.result(timeout)
+
+    def _ensure_worker(self):
+        # Started lazily (and restarted after a fork) because threads do not
+        # survive os.fork() in gunicorn workers.
+        if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+                return
+            if self._worker_pid != os.getpid():
+                self._queue = queue.Queue()
+            self._worker = threading.Thread(target=self._run, name=f"{self.name}-batcher", daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            started = time.perf_counter()
+            for _, _, enqueued in batch:
+                self.queue_wait_ms.add((started - enqueued) * 1000.0)
+
+            try:
+                results = self.batch_fn([item for item, _, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"batch_fn returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                self.batch_errors += 1
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            finally:
+                self.batch_latency_ms.add((time.perf_counter() - started) * 1000.0)
+
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+            self.batches_processed += 1
+            self.items_processed += len(batch)
+            self.batch_sizes.add(len(batch))
+
+    def get_metrics(self):
+        """Return queue depth and batch-size statistics."""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "items_processed": self.items_processed,
+            "batches_processed": self.batches_processed,
+            "batch_errors": self.batch_errors,
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_wait_ms": self.queue_wait_ms.snapshot(),
+            "batch_latency_ms": self.batch_latency_ms.snapshot(),
+        }
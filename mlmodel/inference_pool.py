@@ -0,0 +1,289 @@
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from multiprocessing.connection import wait
+
+
+class InferencePool:
+    """
+    Runs emotion model inference in dedicated worker processes.
+
+    The web process keeps no model weights; it sends batches of texts over
+    a per-process request queue and reads score vectors back from a
+    per-process result pipe, so long forward passes no longer hold the web
+    worker's GIL. Each inference process drains several pending requests
+    into one forward pass, pins itself to its own slice of CPUs, and is
+    restarted (with fresh queue and pipe) if it dies. Nothing is shared
+    between inference processes, so one that is killed mid-write can't
+    block the others.
+
+    Like OnnxEmotionClassifier it exposes labels, tokenizer and
+    predict_scores(), so EmotionAnalyzer can use it as its classifier.
+    """
+
+    def __init__(self, model_name, backend="torch", num_workers=2, threads_per_worker=1,
+                 max_batch_size=32, max_wait_ms=5, timeout=30, start_method="spawn", web_worker_index=0):
+        self.model_name = model_name
+        self.backend = backend
+        self.num_workers = max(1, int(num_workers))
+        self.threads_per_worker = max(1, int(threads_per_worker))
+        # Which gunicorn worker owns this pool; pools of different web
+        # workers take consecutive CPU slices instead of the same ones
+        self.web_worker_index = max(0, int(web_worker_index))
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.timeout = timeout
+
+        # The web process still tokenizes (to split long texts into windows)
+        # and needs the label order of the returned score vectors
+        from transformers import AutoConfig, AutoTokenizer
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        config = AutoConfig.from_pretrained(model_name)
+        self.labels = [config.id2label[i] for i in range(len(config.id2label))]
+
+        self._ctx = multiprocessing.get_context(start_method)
+        self._processes = [None] * self.num_workers
+        self._request_queues = [None] * self.num_workers
+        self._result_conns = [None] * self.num_workers
+        self._retired_conns = []  # pipes of replaced workers, until the collector sees them close
+        self._pending = {}  # request_id -> (future, worker_index)
+        self._restart_at = [None] * self.num_workers
+        self._consecutive_failures = [0] * self.num_workers
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._closed = False
+
+        # Metrics
+        self.requests_sent = 0
+        self.restarts = 0
+        self.failed_requests = 0
+        self.ready_workers = set()
+
+        for index in range(self.num_workers):
+            self._start_worker(index)
+
+        threading.Thread(target=self._collect_results, name="inference-pool-results", daemon=True).start()
+        threading.Thread(target=self._monitor_workers, name="inference-pool-monitor", daemon=True).start()
+
+    def predict_scores(self, texts, batch_size=None):
+        """Score texts in a worker process; returns an (n, n_labels) float32 matrix."""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Inference pool is closed")
+            request_id = next(self._ids)
+            # Least-loaded ready worker gets the request; a dead or restarting
+            # one only if none is ready (it is served once the worker is up)
+            candidates = [i for i in range(self.num_workers) if i in self.ready_workers] or range(self.num_workers)
+            index = min(candidates, key=self._pending_count)
+            self._pending[request_id] = (future, index)
+            request_queue = self._request_queues[index]
+            self.requests_sent += 1
+        request_queue.put((request_id, list(texts)))
+        try:
+            return future.result(self.timeout)
+        except FutureTimeoutError:
+            # Forget the request so it doesn't count against the worker's load
+            with self._lock:
+                if self._pending.pop(request_id, None) is not None:
+                    self.failed_requests += 1
+            raise
+
+    def _pending_count(self, index):
+        return sum(1 for _, worker in self._pending.values() if worker == index)
+
+    def _cpu_slice(self, index):
+        if not hasattr(os, 'sched_getaffinity'):
+            return None
+        cpus = sorted(os.sched_getaffinity(0))
+        slot = self.web_worker_index * self.num_workers + index
+        start = (slot * self.threads_per_worker) % len(cpus)
+        return [cpus[(start + i) % len(cpus)] for i in range(min(self.threads_per_worker, len(cpus)))]
+
+    def _start_worker(self, index):
+        request_queue = self._ctx.Queue()
+        result_conn, worker_conn = self._ctx.Pipe(duplex=False)
+        config = {
+            "index": index,
+            "model_name": self.model_name,
+            "backend": self.backend,
+            "threads": self.threads_per_worker,
+            "cpus": self._cpu_slice(index),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+        }
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(config, request_queue, worker_conn),
+            name=f"emotion-inference-{index}",
+            daemon=True
+        )
+        process.start()
+        # Only the worker holds the write end, so its exit closes the pipe
+        worker_conn.close()
+        if self._result_conns[index] is not None:
+            self._retired_conns.append(self._result_conns[index])
+        self._processes[index] = process
+        self._request_queues[index] = request_queue
+        self._result_conns[index] = result_conn
+
+    def _collect_results(self):
+        while not self._closed:
+            with self._lock:
+                conns = [conn for conn in self._result_conns if conn is not None] + self._retired_conns
+            for conn in wait(conns, timeout=0.5):
+                try:
+                    message = conn.recv()
+                except Exception:
+                    # The worker exited (maybe mid-write); the monitor restarts
+                    # it with a new pipe and fails its pending requests
+                    self._drop_conn(conn)
+                    continue
+                self._handle_message(message)
+
+    def _drop_conn(self, conn):
+        with self._lock:
+            if conn in self._retired_conns:
+                self._retired_conns.remove(conn)
+            elif conn in self._result_conns:
+                self._result_conns[self._result_conns.index(conn)] = None
+        conn.close()
+
+    def _handle_message(self, message):
+        kind = message[0]
+        if kind == "ready":
+            _, index, pid = message
+            self.ready_workers.add(index)
+            self._consecutive_failures[index] = 0
+            print(f"Inference worker {index} ready (pid {pid})")
+            return
+
+        _, request_id, scores, error = message
+        with self._lock:
+            entry = self._pending.pop(request_id, None)
+        if entry is None:
+            return
+        future, _ = entry
+        if error:
+            self.failed_requests += 1
+            future.set_exception(RuntimeError(error))
+        else:
+            future.set_result(scores)
+
+    def _monitor_workers(self):
+        while not self._closed:
+            time.sleep(0.5)
+            for index, process in enumerate(self._processes):
+                if process.is_alive() or self._closed:
+                    continue
+                now = time.time()
+                if self._restart_at[index] is None:
+                    print(f"Inference worker {index} exited (code {process.exitcode})")
+                    self._fail_pending(index)
+                    # Back off when a worker keeps dying (e.g. the model can't load)
+                    delay = min(30.0, 0.5 * (2 ** self._consecutive_failures[index]))
+                    self._consecutive_failures[index] += 1
+                    self._restart_at[index] = now + delay
+                if now >= self._restart_at[index]:
+                    print(f"Restarting inference worker {index}...")
+                    with self._lock:
+                        # Requests queued while it was down are lost with its queue
+                        self._fail_pending_locked(index)
+                        self._restart_at[index] = None
+                        self.restarts += 1
+                        self._start_worker(index)
+
+    def _fail_pending(self, index):
+        # Fail whatever the dead worker was holding; callers fall back to neutral
+        with self._lock:
+            self._fail_pending_locked(index)
+
+    def _fail_pending_locked(self, index):
+        lost = [rid for rid, (_, worker) in self._pending.items() if worker == index]
+        for request_id in lost:
+            future, _ = self._pending.pop(request_id)
+            future.set_exception(RuntimeError("Inference worker crashed"))
+        self.failed_requests += len(lost)
+        self.ready_workers.discard(index)
+
+    def close(self):
+        """Stop all worker processes."""
+        self._closed = True
+        for request_queue in self._request_queues:
+            request_queue.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+
+    def get_metrics(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "workers": self.num_workers,
+            "ready_workers": len(self.ready_workers),
+            "pids": [p.pid for p in self._processes],
+            "threads_per_worker": self.threads_per_worker,
+            "pending_requests": pending,
+            "requests_sent": self.requests_sent,
+            "failed_requests": self.failed_requests,
+            "restarts": self.restarts,
+        }
+
+
+def _worker_main(config, request_queue, result_conn):
+    """Entry point of an inference process: load the model, then serve batches."""
+    if config["cpus"]:
+        os.sched_setaffinity(0, config["cpus"])
+    # The web process already caches and batches; the worker just runs the model
+    os.environ['EMOTION_BATCHING'] = '0'
+    os.environ['EMOTION_CACHE'] = '0'
+    os.environ['EMOTION_INFERENCE_MODE'] = 'local'
+
+    from emotion_analyzer import EmotionAnalyzer, configure_inference_threads
+
+    configure_inference_threads(config["threads"])
+    analyzer = EmotionAnalyzer(model_name=config["model_name"], backend=config["backend"])
+    if analyzer.classifier is None:
+        raise SystemExit(1)
+    analyzer.warm_up()
+    result_conn.send(("ready", config["index"], os.getpid()))
+
+    max_wait = config["max_wait_ms"] / 1000.0
+    while True:
+        first = request_queue.get()
+        if first is None:
+            return
+
+        # Drain more waiting requests into the same forward pass
+        batch = [first]
+        size = len(first[1])
+        deadline = time.perf_counter() + max_wait
+        while size < config["max_batch_size"]:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = request_queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                request_queue.put(None)
+                break
+            batch.append(item)
+            size += len(item[1])
+
+        texts = [text for _, request_texts in batch for text in request_texts]
+        try:
+            scores = analyzer._run_model(texts)
+        except Exception as e:
+            for request_id, _ in batch:
+                result_conn.send(("result", request_id, None, str(e)))
+            continue
+
+        offset = 0
+        for request_id, request_texts in batch:
+            result_conn.send(("result", request_id, scores[offset:offset + len(request_texts)], None))
+            offset += len(request_texts)
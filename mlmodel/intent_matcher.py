@@ -0,0 +1,110 @@
+"""
+Acknowledgement intents the chatbot answers from templates, and the matcher that spots them.
+"""
+from intents import USER_RESPONSES, normalize_utterance
+
+# Intents answered without the LLM, most specific first: a message that
+# both thanks and says goodbye ("thanks, bye") gets the farewell reply.
+# Closure ("okay", "I'm good") is left out: mid-conversation it usually
+# isn't a goodbye, so only explicit farewells get the goodbye template
+FAST_PATH_INTENTS = ("farewell", "relief", "gratitude", "agreement")
+
+INTENT_REPLIES = {
+    "agreement": [
+        "Okay. I’m listening — tell me more whenever you’re ready.",
+        "Go ahead, I’m here.",
+        "I’m with you. What would you like to talk about next?",
+    ],
+    "gratitude": [
+        "You’re welcome. I’m glad I could be here for you.",
+        "Anytime. I’m here whenever you need to talk.",
+        "I’m really glad that helped. Is there anything else on your mind?",
+    ],
+    "relief": [
+        "I’m so glad you’re feeling a bit better.",
+        "That’s good to hear. Be gentle with yourself for the rest of the day.",
+        "I’m happy that helped. I’m here if anything else comes up.",
+    ],
+    "farewell": [
+        "Take care of yourself. I’m here whenever you want to talk again.",
+        "Alright. Go easy on yourself, and come back anytime.",
+        "Thanks for talking with me. Take care until next time.",
+    ],
+}
+
+# Words that may surround an acknowledgement without changing it
+# ("ok thanks so much", "oh well bye")
+FILLER_WORDS = frozenset([
+    "ok", "oh", "well", "so", "much", "very", "really", "again", "too", "and", "just", "now", "then",
+])
+
+# Trie node key holding the intents of the phrase that ends at that node
+_INTENTS = ""
+
+
+class IntentMatcher:
+    """
+    Word-level trie over the normalized USER_RESPONSES phrases.
+
+    A message matches when it is short (at most `max_words` words after
+    normalize_utterance), is not a question, and splits entirely into
+    phrases and filler words, taking the longest phrase at each position.
+    Every phrase found must belong only to FAST_PATH_INTENTS: "no thanks",
+    "yeah but" or "right?" (also a validation-seeking phrase) don't match,
+    and go to the LLM as before. Matching walks the trie once per word,
+    so its cost doesn't depend on how many phrases there are.
+    """
+
+    def __init__(self, responses=USER_RESPONSES, fast_intents=FAST_PATH_INTENTS, max_words=6):
+        self.fast_intents = fast_intents
+        self.max_words = max_words
+        self._root = {}
+        for intent, phrases in responses.items():
+            for phrase in phrases:
+                words = normalize_utterance(phrase).split()
+                if not words:
+                    continue
+                node = self._root
+                for word in words:
+                    node = node.setdefault(word, {})
+                intents = node.setdefault(_INTENTS, [])
+                if intent not in intents:
+                    intents.append(intent)
+
+    def match(self, message):
+        """Return the fast-path intent of message, or None."""
+        if message.rstrip().endswith("?"):
+            return None
+        words = normalize_utterance(message).split()
+        if not words or len(words) > self.max_words:
+            return None
+
+        found = set()
+        i = 0
+        while i < len(words):
+            end, intents = self._longest(words, i)
+            if intents is None or (end == i + 1 and words[i] in FILLER_WORDS):
+                if words[i] not in FILLER_WORDS:
+                    return None
+                i += 1
+                continue
+            if any(intent not in self.fast_intents for intent in intents):
+                return None
+            found.update(intents)
+            i = end
+
+        for intent in self.fast_intents:
+            if intent in found:
+                return intent
+        return None
+
+    def _longest(self, words, start):
+        node = self._root
+        end, intents = start, None
+        for i in range(start, len(words)):
+            node = node.get(words[i])
+            if node is None:
+                break
+            if _INTENTS in node:
+                end, intents = i + 1, node[_INTENTS]
+        return end, intents
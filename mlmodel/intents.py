@@ -0,0 +1,206 @@
+"""
+User intent phrase lists shared by the chatbot and the tier-0 emotion classifier.
+"""
+import re
+
+# Structured user intent patterns (for classification/logic)
+USER_RESPONSES = {
+    "agreement": [
+        "yeah",
+        "yes",
+        "exactly",
+        "true",
+        "right",
+        "I agree",
+        "that makes sense",
+        "absolutely",
+        "100%",
+        "for sure"
+    ],
+
+    "gratitude": [
+        "thanks",
+        "thank you",
+        "appreciate it",
+        "thanks a lot",
+        "that helps",
+        "means a lot",
+        "ty",
+        "🙏",
+        "thanks for listening",
+        "glad you said that"
+    ],
+
+    "relief": [
+        "yeah I feel better",
+        "that helped",
+        "I feel calmer now",
+        "needed that",
+        "that reassures me",
+        "I feel lighter",
+        "okay yeah",
+        "I’m good now",
+        "that makes me feel better",
+        "phew"
+    ],
+
+    "continuation": [
+        "also",
+        "and another thing",
+        "there’s more",
+        "let me explain",
+        "wait",
+        "but",
+        "so basically",
+        "the thing is",
+        "one more thing",
+        "I should add"
+    ],
+
+    "clarification": [
+        "what do you mean",
+        "can you explain",
+        "I didn’t get that",
+        "how so",
+        "why",
+        "can you elaborate",
+        "not sure I understand",
+        "what does that mean",
+        "huh?",
+        "explain more"
+    ],
+
+    "disagreement": [
+        "I don’t think so",
+        "not really",
+        "I disagree",
+        "I don’t feel that way",
+        "that’s not it",
+        "no",
+        "nah",
+        "I don’t agree",
+        "that’s not true",
+        "I see it differently"
+    ],
+
+    "validation_seeking": [
+        "am I wrong",
+        "does that make sense",
+        "is that okay",
+        "right?",
+        "do you get me",
+        "is that normal",
+        "is it bad",
+        "is this weird",
+        "does that sound right",
+        "am I overthinking"
+    ],
+
+    "emotional_release": [
+        "I just needed to say that",
+        "I had to get that out",
+        "feels good to say it",
+        "I’ve been holding that in",
+        "thanks for letting me vent",
+        "I needed to talk",
+        "I don’t usually say this",
+        "glad I said it",
+        "that’s been heavy",
+        "I’ve been carrying this"
+    ],
+
+    "closure": [
+        "okay",
+        "alright",
+        "I’m good",
+        "that’s all",
+        "nothing else",
+        "were done",
+        "I think thats it",
+        "yeah thats it",
+        "Im done for now",
+        "thanks, Im okay"
+    ],
+
+    "farewell": [
+        "bye",
+        "goodbye",
+        "good night",
+        "goodnight",
+        "see you",
+        "talk later",
+        "talk to you later",
+        "gotta go"
+    ],
+
+    "confusion": [
+        "I’m still confused",
+        "I don’t know",
+        "I’m not sure",
+        "this is confusing",
+        "idk",
+        "I’m lost",
+        "I don’t get it",
+        "I can’t figure it out",
+        "I’m unsure",
+        "this doesn’t make sense"
+    ],
+
+    "emotional_shift_positive": [
+        "I feel better now",
+        "I’m calmer",
+        "that helped a lot",
+        "I feel hopeful",
+        "I’m okay now",
+        "I feel lighter",
+        "that changed my perspective",
+        "I feel more confident",
+        "I feel understood",
+        "that reassured me"
+    ],
+
+    "emotional_shift_negative": [
+        "I still feel bad",
+        "I’m still upset",
+        "it still hurts",
+        "I feel worse",
+        "I don’t feel okay",
+        "that didn’t help",
+        "I’m still angry",
+        "I’m still sad",
+        "it’s still heavy",
+        "I feel stuck"
+    ],
+
+    "silence_or_minimal": [
+        "hmm",
+        "ok",
+        "...",
+        "idk",
+        "maybe",
+        "sure",
+        "fine",
+        "whatever",
+        "I guess",
+        "meh"
+    ]
+}
+
+
+_APOSTROPHES = str.maketrans({"\u2019": "'", "\u2018": "'"})
+_PUNCTUATION = re.compile(r"[.,!?;:\"()]+")
+
+
+def normalize_utterance(text):
+    """
+    Normalize a short message for exact phrase lookup.
+
+    Case is folded, curly apostrophes are straightened and then dropped
+    ("I’m" and "Im" match alike), punctuation is removed unless the
+    message is nothing but punctuation ("..."), and whitespace is collapsed.
+    """
+    text = text.translate(_APOSTROPHES).casefold().replace("'", "")
+    stripped = _PUNCTUATION.sub(" ", text)
+    if stripped.strip():
+        text = stripped
+    return " ".join(text.split())
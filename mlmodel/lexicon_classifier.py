@@ -0,0 +1,126 @@
+import re
+
+import numpy as np
+
+from intents import USER_RESPONSES, normalize_utterance
+
+# Emotion (GoEmotions label) and confidence for a message that is exactly
+# one of an intent's phrases. Intents whose phrases don't carry one clear
+# emotion (validation seeking, "I still feel bad"-style shifts) are left to
+# the transformer.
+INTENT_EMOTIONS = {
+    "gratitude": ("gratitude", 0.95),
+    "agreement": ("approval", 0.9),
+    "relief": ("relief", 0.9),
+    "emotional_shift_positive": ("relief", 0.85),
+    "emotional_release": ("relief", 0.85),
+    "disagreement": ("disapproval", 0.85),
+    "confusion": ("confusion", 0.9),
+    "clarification": ("curiosity", 0.85),
+    "closure": ("neutral", 0.9),
+    "farewell": ("neutral", 0.9),
+    "silence_or_minimal": ("neutral", 0.9),
+    "continuation": ("neutral", 0.85),
+}
+
+# Words and emoji that carry one emotion on their own ("lol", "so sad 😢")
+EMOTION_LEXICON = {
+    "amusement": ["lol", "lmao", "haha", "hahaha", "rofl", "funny", "hilarious", "😂", "🤣", "😆"],
+    "joy": ["happy", "yay", "glad", "excited", "woohoo", "😀", "😄", "😁", "😊"],
+    "sadness": ["sad", "unhappy", "depressed", "heartbroken", "crying", "😢", "😭", "😞", "☹️", "🙁"],
+    "anger": ["angry", "furious", "mad", "pissed", "livid", "😠", "😡", "🤬"],
+    "annoyance": ["ugh", "annoyed", "annoying", "irritated", "smh", "🙄", "😒"],
+    "love": ["love", "❤", "❤️", "😍", "🥰", "💕"],
+    "fear": ["scared", "afraid", "terrified", "frightened", "😨", "😱"],
+    "nervousness": ["nervous", "anxious", "worried", "stressed", "😬", "😰"],
+    "gratitude": ["thanks", "thank", "thx", "ty", "grateful", "🙏"],
+    "disappointment": ["disappointed", "disappointing", "bummer", "😔"],
+    "surprise": ["wow", "whoa", "omg", "woah", "😮", "😲"],
+    "disgust": ["gross", "disgusting", "eww", "ew", "🤢", "🤮"],
+    "neutral": ["hi", "hello", "hey", "bye", "goodbye", "goodnight", "cya", "later", "👋"],
+}
+
+# Any of these flips or hedges a lexicon word ("not happy"), so skip the lexicon
+NEGATIONS = {"not", "no", "never", "dont", "cant", "isnt", "wasnt", "arent", "aint", "nothing", "hardly", "without"}
+
+# Intensifiers that may sit next to a lexicon word ("so sad", "really happy")
+FILLER_WORDS = frozenset(["so", "soo", "sooo", "very", "really", "too", "just", "oh", "well", "much"])
+
+# Emoji modifiers that _TOKEN splits off as tokens of their own
+_JOINERS = {"\ufe0f", "\u200d"}
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+class LexiconClassifier:
+    """
+    Tier-0 emotion classifier for acknowledgements and pleasantries.
+
+    A message that is exactly one of the intent phrases in intents.py
+    ("yeah", "thank you", "bye"-style closures) maps straight to an emotion;
+    a short message whose words/emoji all point at one emotion in a small
+    lexicon maps to that emotion. Every word has to be a lexicon word or
+    an intensifier: "hey my mom died" or "want to die lol" carry more than
+    the greeting or the "lol", so they go to the model. Everything else returns None and goes to
+    the transformer. Results are score vectors over the analyzer's labels,
+    with all weight on the matched emotion.
+    """
+
+    def __init__(self, labels, lexicon_confidence=0.85, max_lexicon_tokens=4):
+        self.labels = labels
+        self.lexicon_confidence = lexicon_confidence
+        self.max_lexicon_tokens = max_lexicon_tokens
+        label_index = {label: i for i, label in enumerate(labels)}
+
+        # Exact-phrase table; the first intent listing a phrase wins
+        self._phrases = {}
+        for intent, phrases in USER_RESPONSES.items():
+            if intent not in INTENT_EMOTIONS:
+                continue
+            emotion, confidence = INTENT_EMOTIONS[intent]
+            if emotion not in label_index:
+                continue
+            for phrase in phrases:
+                self._phrases.setdefault(normalize_utterance(phrase), (label_index[emotion], confidence))
+
+        self._lexicon = {}
+        for emotion, words in EMOTION_LEXICON.items():
+            if emotion not in label_index:
+                continue
+            for word in words:
+                self._lexicon.setdefault(word, label_index[emotion])
+
+    def classify(self, text):
+        """Return (scores, confidence) for text, or None if this tier has no answer."""
+        normalized = normalize_utterance(text)
+        if not normalized:
+            return None
+
+        match = self._phrases.get(normalized)
+        if match is not None:
+            return self._result(*match)
+
+        tokens = _TOKEN.findall(normalized)
+        if len(tokens) > self.max_lexicon_tokens or NEGATIONS.intersection(tokens):
+            return None
+        hits = set()
+        for word in normalized.split():
+            # Variation selectors etc. split emoji into several tokens; match them whole first
+            if word in self._lexicon:
+                hits.add(self._lexicon[word])
+                continue
+            if word in FILLER_WORDS:
+                continue
+            parts = [token for token in _TOKEN.findall(word) if token not in _JOINERS]
+            if not parts or any(token not in self._lexicon for token in parts):
+                return None
+            hits.update(self._lexicon[token] for token in parts)
+        if len(hits) != 1:
+            return None
+        return self._result(hits.pop(), self.lexicon_confidence)
+
+    def _result(self, column, confidence):
+        scores = np.zeros(len(self.labels), dtype=np.float32)
+        scores[column] = confidence
+        scores.setflags(write=False)
+        return scores, confidence
@@ -0,0 +1,293 @@
+import asyncio
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+from metrics import RollingStats
+
+
+class LLMSaturatedError(Exception):
+    """Raised instead of queueing when all LLM call slots are taken."""
+
+
+class LLMDeadlineError(Exception):
+    """Raised when a call (including its retries) runs past its deadline."""
+
+
+class RetryBudget:
+    """
+    Caps retries to a share of recent traffic.
+
+    Over the last `window_seconds`, retries may add up to `ratio` of the
+    calls made, plus `min_per_second` so a quiet process can still retry.
+    When a dependency is failing for everyone, this keeps retries from
+    multiplying the load on it.
+    """
+
+    def __init__(self, ratio=0.1, min_per_second=1.0, window_seconds=10.0, clock=time.monotonic):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.window_seconds = window_seconds
+        self._clock = clock
+        self._calls = deque()
+        self._retries = deque()
+        self._lock = threading.Lock()
+
+    def record_call(self):
+        with self._lock:
+            self._calls.append(self._clock())
+
+    def try_spend(self):
+        """Return True (and count it) if one more retry fits in the budget."""
+        with self._lock:
+            now = self._clock()
+            for events in (self._calls, self._retries):
+                while events and events[0] <= now - self.window_seconds:
+                    events.popleft()
+            allowed = self.ratio * len(self._calls) + self.min_per_second * self.window_seconds
+            if len(self._retries) + 1 > allowed:
+                return False
+            self._retries.append(now)
+            return True
+
+
+class LLMClient:
+    """
+    Runs OpenAI chat completions on an AsyncOpenAI client with explicit
+    admission, deadlines and retries.
+
+    - Admission: at most `max_concurrency` calls (or open streams) at once
+      in this process. A caller that can't get a slot within
+      `admission_wait` seconds (default: immediately) gets
+      LLMSaturatedError, so it can answer from templates instead of
+      queueing behind slow completions.
+    - Deadlines: every call has a total deadline covering all attempts and
+      backoff; each attempt's timeout comes from the caller's
+      AdaptiveTimeout, cut to whatever is left of the deadline.
+    - Retries: timeouts, connection errors, 429s and 5xx are retried up to
+      `max_attempts` with full-jitter exponential backoff (honouring
+      Retry-After), as long as the RetryBudget allows. The OpenAI client's
+      own retries are disabled.
+
+    Calls run on one event loop in a background thread; request threads
+    submit to it and wait for the result, so any number of in-flight
+    completions share a single connection pool and no thread is spent per
+    HTTP call.
+    """
+
+    RETRYABLE = (APITimeoutError, APIConnectionError, RateLimitError, InternalServerError)
+
+    def __init__(self, client, max_concurrency=8, admission_wait=0.0, max_attempts=3,
+                 backoff_base=0.2, backoff_max=2.0, retry_budget=None):
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.admission_wait = admission_wait
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_budget = retry_budget or RetryBudget()
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+        # Metrics
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.counts = {
+            "calls": 0, "saturated": 0, "succeeded": 0, "failed": 0, "abandoned": 0, "retries": 0,
+            "retry_budget_exhausted": 0, "deadline_exceeded": 0,
+        }
+        self.latency = RollingStats()
+
+    def complete(self, timeouts, deadline_seconds, **kwargs):
+        """Run chat.completions.create(**kwargs) and return the response."""
+        self._admit()
+        started = time.perf_counter()
+        try:
+            future = asyncio.run_coroutine_threadsafe(
+                self._create(timeouts, started + deadline_seconds, kwargs), self._get_loop()
+            )
+            try:
+                response = future.result(timeout=deadline_seconds + 1.0)
+            except FutureTimeoutError:
+                # Backstop; attempts are already cut to the deadline
+                future.cancel()
+                self._count("deadline_exceeded")
+                raise LLMDeadlineError(f"LLM call exceeded its {deadline_seconds}s deadline")
+            self._count("succeeded")
+            return response
+        except Exception:
+            self._count("failed")
+            raise
+        finally:
+            self.latency.add((time.perf_counter() - started) * 1000.0)
+            self._release()
+
+    def stream(self, timeouts, deadline_seconds, **kwargs):
+        """
+        Run chat.completions.create(stream=True, **kwargs) and yield its chunks.
+
+        Admission happens when the first chunk is requested, so a saturated
+        client raises LLMSaturatedError before anything is yielded. Retries
+        only happen before the first chunk arrives. The slot is held until
+        the generator is exhausted or closed.
+        """
+        self._admit()
+        started = time.perf_counter()
+        chunks = queue.Queue()
+        future = None
+        outcome = "failed"
+        try:
+            future = asyncio.run_coroutine_threadsafe(
+                self._stream_into(chunks, timeouts, started + deadline_seconds, kwargs), self._get_loop()
+            )
+            while True:
+                remaining = started + deadline_seconds - time.perf_counter()
+                try:
+                    item = chunks.get(timeout=max(0.0, remaining))
+                except queue.Empty:
+                    self._count("deadline_exceeded")
+                    raise LLMDeadlineError(f"LLM stream exceeded its {deadline_seconds}s deadline")
+                if item is _END:
+                    outcome = "succeeded"
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        except GeneratorExit:
+            outcome = "abandoned"
+            raise
+        finally:
+            # Stops the request if the consumer went away or the deadline passed
+            if future is not None:
+                future.cancel()
+            self._count(outcome)
+            self.latency.add((time.perf_counter() - started) * 1000.0)
+            self._release()
+
+    async def _create(self, timeouts, deadline, kwargs):
+        return await self._with_retries(timeouts, deadline, lambda timeout: self.client.chat.completions.create(
+            timeout=timeout, **kwargs
+        ))
+
+    async def _stream_into(self, chunks, timeouts, deadline, kwargs):
+        streams = []
+
+        async def open_stream(timeout):
+            stream = await self.client.chat.completions.create(timeout=timeout, stream=True, **kwargs)
+            streams.append(stream)
+            iterator = stream.__aiter__()
+            # The first chunk is part of the attempt, so a stalled stream is retried
+            first = await iterator.__anext__()
+            return first, iterator
+
+        try:
+            first, iterator = await self._with_retries(timeouts, deadline, open_stream)
+            chunks.put(first)
+            async for chunk in iterator:
+                chunks.put(chunk)
+            chunks.put(_END)
+        except StopAsyncIteration:
+            chunks.put(_END)
+        except Exception as e:
+            chunks.put(e)
+        finally:
+            # Give the connection back even if the consumer left midway
+            for stream in streams:
+                close = getattr(stream, "close", None)
+                if close is not None:
+                    await close()
+
+    async def _with_retries(self, timeouts, deadline, attempt):
+        self.retry_budget.record_call()
+        for number in range(1, self.max_attempts + 1):
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                self._count("deadline_exceeded")
+                raise LLMDeadlineError("LLM call deadline passed before the attempt")
+            timeout = min(timeouts.timeout(), remaining)
+            started = time.perf_counter()
+            try:
+                result = await attempt(timeout)
+                timeouts.record(time.perf_counter() - started)
+                return result
+            except self.RETRYABLE as e:
+                if isinstance(e, APITimeoutError):
+                    timeouts.record_timeout(timeout)
+                else:
+                    timeouts.record(time.perf_counter() - started)
+                if number == self.max_attempts:
+                    raise
+                delay = self._backoff(number, e)
+                if time.perf_counter() + delay >= deadline:
+                    raise
+                if not self.retry_budget.try_spend():
+                    self._count("retry_budget_exhausted")
+                    raise
+                self._count("retries")
+                print(f"LLM call failed ({type(e).__name__}), retry {number} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    def _backoff(self, number, error):
+        # Full jitter: uniform in [0, min(max, base * 2^(n-1))], or Retry-After if the server sent one
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (number - 1)))
+
+    def _admit(self):
+        if self.admission_wait > 0:
+            admitted = self._slots.acquire(timeout=self.admission_wait)
+        else:
+            admitted = self._slots.acquire(blocking=False)
+        with self._lock:
+            self.counts["calls"] += 1
+            if not admitted:
+                self.counts["saturated"] += 1
+            else:
+                self.in_flight += 1
+        if not admitted:
+            raise LLMSaturatedError(f"All {self.max_concurrency} LLM call slots are busy")
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def _get_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-client-loop", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def get_metrics(self):
+        with self._lock:
+            counts = dict(self.counts)
+            in_flight = self.in_flight
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": in_flight,
+            **counts,
+            "saturation_rate": round(counts["saturated"] / counts["calls"], 4) if counts["calls"] else None,
+            "latency_ms": self.latency.snapshot(),
+        }
+
+
+# Marks the end of a stream in LLMClient's chunk queue
+_END = object()
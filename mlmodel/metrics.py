@@ -0,0 +1,47 @@
+import threading
+from collections import deque
+
+
+class RollingStats:
+    """Thread-safe rolling window of numeric samples with percentile summaries."""
+
+    def __init__(self, window=1000):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value):
+        """Record one sample."""
+        with self._lock:
+            self._samples.append(value)
+            self.count += 1
+            self.total += value
+
+    def percentile(self, p):
+        """Return the p-th percentile (0-100) of the current window, or None if empty."""
+        with self._lock:
+            samples = sorted(self._samples)
+        return _percentile(samples, p)
+
+    def snapshot(self):
+        """Return a JSON-friendly summary of the window."""
+        with self._lock:
+            samples = sorted(self._samples)
+            count = self.count
+            total = self.total
+        return {
+            "count": count,
+            "mean": round(total / count, 3) if count else None,
+            "p50": _percentile(samples, 50),
+            "p95": _percentile(samples, 95),
+            "p99": _percentile(samples, 99),
+            "max": round(samples[-1], 3) if samples else None,
+        }
+
+
+def _percentile(sorted_samples, p):
+    if not sorted_samples:
+        return None
+    index = min(len(sorted_samples) - 1, int(round(p / 100.0 * (len(sorted_samples) - 1))))
+    return round(sorted_samples[index], 3)
@@ -0,0 +1,120 @@
+import os
+import numpy as np
+
+
+class OnnxEmotionClassifier:
+    """
+    Drop-in replacement for the transformers text-classification pipeline
+    that runs an exported ONNX graph through onnxruntime on CPU.
+
+    predict_scores() returns an (n, n_labels) float32 matrix ordered like
+    self.labels, which EmotionAnalyzer uses directly. Calling the object
+    returns, per text, a list of {"label", "score"} dicts sorted by score,
+    exactly like pipeline(..., top_k=None).
+    """
+
+    def __init__(self, model_name, onnx_dir, quantize=False, max_length=512):
+        import onnxruntime as ort
+        from transformers import AutoConfig, AutoTokenizer
+
+        self.model_name = model_name
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+        config = AutoConfig.from_pretrained(model_name)
+        self.labels = [config.id2label[i] for i in range(len(config.id2label))]
+        # GoEmotions is multi-label: the pipeline applies a sigmoid per label
+        self.multi_label = config.problem_type == "multi_label_classification"
+
+        model_path = export_onnx_model(model_name, onnx_dir, quantize=quantize)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        threads = int(os.getenv('EMOTION_ONNX_THREADS', 0))
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def predict_scores(self, texts, batch_size=16):
+        if isinstance(texts, str):
+            texts = [texts]
+
+        chunks = []
+        for start in range(0, len(texts), batch_size):
+            chunk = list(texts[start:start + batch_size])
+            encoded = self.tokenizer(
+                chunk,
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np"
+            )
+            feeds = {name: value.astype(np.int64) for name, value in encoded.items() if name in self.input_names}
+            logits = self.session.run(None, feeds)[0]
+            chunks.append(_sigmoid(logits) if self.multi_label else _softmax(logits))
+        return np.concatenate(chunks).astype(np.float32)
+
+    def __call__(self, texts, batch_size=16):
+        outputs = []
+        for row in self.predict_scores(texts, batch_size=batch_size):
+            ranked = sorted(zip(self.labels, row.tolist()), key=lambda item: item[1], reverse=True)
+            outputs.append([{"label": label, "score": score} for label, score in ranked])
+        return outputs
+
+
+def export_onnx_model(model_name, onnx_dir, quantize=False):
+    """
+    Export model_name to ONNX under onnx_dir (once) and return the graph path.
+
+    With quantize=True the fp32 graph is additionally converted to dynamic
+    int8 (weights quantized ahead of time, activations at runtime).
+    """
+    os.makedirs(onnx_dir, exist_ok=True)
+    fp32_path = os.path.join(onnx_dir, "model.onnx")
+    int8_path = os.path.join(onnx_dir, "model.int8.onnx")
+
+    if not os.path.exists(fp32_path):
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        print(f"Exporting {model_name} to ONNX ({fp32_path})...")
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        model.eval()
+
+        sample = tokenizer(["export sample"], return_tensors="pt")
+        with torch.inference_mode():
+            torch.onnx.export(
+                model,
+                (sample["input_ids"], sample["attention_mask"]),
+                fp32_path,
+                input_names=["input_ids", "attention_mask"],
+                output_names=["logits"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "sequence"},
+                    "logits": {0: "batch"},
+                },
+                opset_version=17,
+                dynamo=False,
+            )
+
+    if not quantize:
+        return fp32_path
+
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        print(f"Quantizing ONNX model to int8 ({int8_path})...")
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    return int8_path
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _softmax(x):
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
@@ -0,0 +1,218 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import RollingStats
+
+
+class TokenCounter:
+    """
+    Counts prompt tokens locally.
+
+    Uses tiktoken's encoding for the model when tiktoken is installed (and
+    its encoding files are available); otherwise estimates about four
+    characters per token, which is close for English chat text. Message
+    overhead follows OpenAI's chat format: a few tokens per message plus
+    the reply priming.
+    """
+
+    TOKENS_PER_MESSAGE = 4
+    REPLY_PRIMING = 3
+
+    def __init__(self, model="gpt-3.5-turbo"):
+        self.model = model
+        self._encoding = None
+        self.method = "heuristic"
+        try:
+            import tiktoken
+            self._encoding = tiktoken.encoding_for_model(model)
+            self.method = "tiktoken"
+        except Exception as e:
+            print(f"tiktoken unavailable ({e}); estimating prompt tokens from length")
+
+    def count(self, text):
+        if self._encoding is not None:
+            return len(self._encoding.encode(text))
+        return math.ceil(len(text) / 4)
+
+    def count_messages(self, messages):
+        return sum(self.count(m["content"]) + self.TOKENS_PER_MESSAGE for m in messages) + self.REPLY_PRIMING
+
+    def clip(self, text, max_tokens):
+        """Shorten text to about max_tokens, keeping its start and end."""
+        if self.count(text) <= max_tokens:
+            return text
+        if self._encoding is not None:
+            tokens = self._encoding.encode(text)
+            head = self._encoding.decode(tokens[:max_tokens * 2 // 3])
+            tail = self._encoding.decode(tokens[-(max_tokens // 3):])
+        else:
+            chars = max_tokens * 4
+            head = text[:chars * 2 // 3]
+            tail = text[-(chars // 3):]
+        return f"{head} [...] {tail}"
+
+
+class PromptBuilder:
+    """
+    Assembles the chat completion messages within a token budget.
+
+    The system prompt and the latest user turn are always sent. Older
+    turns are added newest first while they fit in `budget_tokens`; any
+    single older turn longer than `max_turn_tokens` is clipped first, so one
+    long vent doesn't push out everything before it. If there is a running
+    summary of earlier turns it goes right after the system prompt, and its
+    tokens come out of the same budget. The turns that didn't fit are
+    returned so they can be folded into the summary.
+    """
+
+    def __init__(self, counter, budget_tokens=1000, max_turn_tokens=400):
+        self.counter = counter
+        self.budget_tokens = budget_tokens
+        self.max_turn_tokens = max_turn_tokens
+
+        # Metrics
+        self.prompt_tokens = RollingStats()
+        self.unbudgeted_tokens = RollingStats()
+        self._lock = threading.Lock()
+        self.prompts = 0
+        self.turns_dropped = 0
+        self.turns_clipped = 0
+
+    def build(self, system_prompt, history, summary=None):
+        """Return (messages, dropped_turns) for history (oldest first, latest turn last)."""
+        system = [{"role": "system", "content": system_prompt}]
+        latest = history[-1:]
+        older = history[:-1]
+        if summary:
+            system.append({"role": "system", "content": f"Summary of the earlier conversation: {summary}"})
+
+        used = self.counter.count_messages(system + latest)
+        kept = []
+        clipped = 0
+        cutoff = 0
+        for index in range(len(older) - 1, -1, -1):
+            turn = older[index]
+            if self.counter.count(turn["content"]) > self.max_turn_tokens:
+                turn = {"role": turn["role"], "content": self.counter.clip(turn["content"], self.max_turn_tokens)}
+                clipped += 1
+            cost = self.counter.count(turn["content"]) + TokenCounter.TOKENS_PER_MESSAGE
+            if used + cost > self.budget_tokens:
+                cutoff = index + 1
+                break
+            used += cost
+            kept.append(turn)
+        kept.reverse()
+        dropped = older[:cutoff]
+
+        messages = system + kept + latest
+        self.prompt_tokens.add(used)
+        # What the fixed window sent: system prompt plus every cached turn
+        self.unbudgeted_tokens.add(self.counter.count_messages(system[:1] + history))
+        with self._lock:
+            self.prompts += 1
+            self.turns_dropped += len(dropped)
+            self.turns_clipped += clipped
+        return messages, dropped
+
+    def get_metrics(self):
+        with self._lock:
+            prompts = self.prompts
+            turns_dropped = self.turns_dropped
+            turns_clipped = self.turns_clipped
+        return {
+            "token_counter": self.counter.method,
+            "budget_tokens": self.budget_tokens,
+            "max_turn_tokens": self.max_turn_tokens,
+            "prompt_tokens": self.prompt_tokens.snapshot(),
+            "unbudgeted_prompt_tokens": self.unbudgeted_tokens.snapshot(),
+            "prompts": prompts,
+            "turns_dropped": turns_dropped,
+            "turns_clipped": turns_clipped,
+        }
+
+
+class ConversationSummarizer:
+    """
+    Per-user running summary of turns that no longer fit in the prompt.
+
+    refresh() hands the dropped turns to a background thread, which calls
+    `summarize(previous_summary, turns)` and caches the result, so a reply
+    never waits for a summary; the next prompt picks it up. Turns already
+    folded into a user's summary are skipped, and at most one refresh per
+    user is in flight. Summaries are kept for the `max_users` most recently
+    active users.
+    """
+
+    def __init__(self, summarize, max_users=10000):
+        self.summarize = summarize
+        self.max_users = max_users
+        self._summaries = OrderedDict()  # user_id -> (summary, hashes of folded turns, oldest first)
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summarizer")
+
+        # Metrics
+        self.refreshes = 0
+        self.failures = 0
+        self.latency = RollingStats()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._summaries.get(user_id)
+            if entry is None:
+                return None
+            self._summaries.move_to_end(user_id)
+            return entry[0]
+
+    def refresh(self, user_id, dropped_turns):
+        """Fold dropped_turns into the user's summary in the background (no-op if nothing new)."""
+        with self._lock:
+            if user_id in self._in_flight:
+                return
+            summary, folded = self._summaries.get(user_id, (None, ()))
+            seen = set(folded)
+            new_turns = [t for t in dropped_turns if self._turn_hash(t) not in seen]
+            if not new_turns:
+                return
+            self._in_flight.add(user_id)
+        self._executor.submit(self._run, user_id, summary, folded, new_turns)
+
+    def _run(self, user_id, summary, folded, turns):
+        started = time.perf_counter()
+        try:
+            updated = self.summarize(summary, turns)
+            self.latency.add((time.perf_counter() - started) * 1000.0)
+            with self._lock:
+                self.refreshes += 1
+                # Remember only recent hashes; older turns have left the context window anyway
+                hashes = (folded + tuple(self._turn_hash(t) for t in turns))[-200:]
+                self._summaries[user_id] = (updated, hashes)
+                self._summaries.move_to_end(user_id)
+                while len(self._summaries) > self.max_users:
+                    self._summaries.popitem(last=False)
+        except Exception as e:
+            print(f"Summary refresh error for user {user_id}: {e}")
+            with self._lock:
+                self.failures += 1
+        finally:
+            with self._lock:
+                self._in_flight.discard(user_id)
+
+    @staticmethod
+    def _turn_hash(turn):
+        return hashlib.sha1(f"{turn['role']}\0{turn['content']}".encode("utf-8")).hexdigest()
+
+    def get_metrics(self):
+        with self._lock:
+            return {
+                "users": len(self._summaries),
+                "in_flight": len(self._in_flight),
+                "refreshes": self.refreshes,
+                "failures": self.failures,
+                "latency_ms": self.latency.snapshot(),
+            }
+
@@ -0,0 +1,179 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class EmotionResultCache:
+    """
+    Bounded LRU + TTL cache for emotion score vectors.
+
+    Keys are a hash of the model name plus the normalized text (whitespace
+    collapsed, case folded), so "Thanks" and "  thanks " share one entry but
+    results from different models never mix. Values are float32 score
+    vectors (see EmotionAnalyzer.labels), stored read-only so they can be
+    handed out without copying. The in-memory tier is capped by both entry
+    count and approximate size; an optional SQLite tier keeps results across
+    restarts.
+    """
+
+    def __init__(self, model_name, max_entries=10000, max_bytes=16 * 1024 * 1024,
+                 ttl_seconds=3600, db_path=None):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+
+        self._entries = OrderedDict()  # key -> (scores, expires_at, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        if self.db_path:
+            self._init_db()
+
+    @staticmethod
+    def normalize(text):
+        """Collapse whitespace and fold case."""
+        return " ".join(text.split()).casefold()
+
+    def make_key(self, text):
+        raw = f"{self.model_name}\0{self.normalize(text)}".encode("utf-8")
+        return hashlib.sha256(raw).hexdigest()
+
+    def get(self, text):
+        """Return the cached score vector for text, or None on a miss."""
+        key = self.make_key(text)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                scores, expires_at, _ = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return scores
+                self._remove(key)
+                self.expirations += 1
+
+        if self.db_path:
+            stored = self._db_get(key, now)
+            if stored is not None:
+                scores, expires_at = stored
+                with self._lock:
+                    self.disk_hits += 1
+                    self._store(key, scores, expires_at)
+                return scores
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, text, scores):
+        """Cache the score vector for text."""
+        key = self.make_key(text)
+        expires_at = time.time() + self.ttl_seconds
+        scores = np.array(scores, dtype=np.float32)
+        scores.setflags(write=False)
+
+        with self._lock:
+            self._store(key, scores, expires_at)
+
+        if self.db_path:
+            self._db_set(key, scores, expires_at)
+
+    def _store(self, key, scores, expires_at):
+        # Caller holds the lock
+        if key in self._entries:
+            self._remove(key)
+        size = self._estimate_size(key, scores)
+        self._entries[key] = (scores, expires_at, size)
+        self._bytes += size
+
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    @staticmethod
+    def _estimate_size(key, scores):
+        # Vector bytes plus key and per-entry object overhead (approximate)
+        return len(key) + scores.nbytes + 250
+
+    def _get_connection(self):
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def _init_db(self):
+        conn = self._get_connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS emotion_scores (
+                key TEXT PRIMARY KEY,
+                scores BLOB NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+        conn.execute('DELETE FROM emotion_scores WHERE expires_at <= ?', (time.time(),))
+        conn.commit()
+        conn.close()
+
+    def _db_get(self, key, now):
+        try:
+            conn = self._get_connection()
+            row = conn.execute(
+                'SELECT scores, expires_at FROM emotion_scores WHERE key = ? AND expires_at > ?',
+                (key, now)
+            ).fetchone()
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"Emotion cache read error: {e}")
+            return None
+        if row is None:
+            return None
+        # frombuffer over the blob is already read-only
+        return np.frombuffer(row[0], dtype=np.float32), row[1]
+
+    def _db_set(self, key, scores, expires_at):
+        try:
+            conn = self._get_connection()
+            conn.execute(
+                'INSERT OR REPLACE INTO emotion_scores (key, scores, expires_at) VALUES (?, ?, ?)',
+                (key, scores.tobytes(), expires_at)
+            )
+            conn.commit()
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"Emotion cache write error: {e}")
+
+    def get_metrics(self):
+        """Return hit/miss/eviction counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "disk_tier": bool(self.db_path),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else None,
+            }
@@ -0,0 +1,169 @@
+"""
+Topic keyword table and the index the chatbot's fallback replies are routed with.
+"""
+import json
+import os
+
+from intents import normalize_utterance
+
+# Topic Definitions: Keywords -> Responses, in priority order (when a
+# message mentions several topics, the first one listed wins)
+DEFAULT_TOPICS = {
+    "family": {
+        "keywords": ['dad', 'mom', 'brother', 'sister', 'family', 'parents', 'grandma', 'grandpa', 'cousin', 'aunt', 'uncle'],
+        "responses": [
+            "Family dynamics can be complex. How are you feeling about them right now?",
+            "Relationships with family run deep. Remember to set boundaries if you need to.",
+            "It sounds like a family matter. Do you have someone in the family you trust to talk to?",
+            "Family stuff is tough. Try to focus on what you can control in this situation."
+        ]
+    },
+    "work": {
+        "keywords": ['job', 'work', 'boss', 'colleague', 'career', 'interview', 'salary', 'promotion', 'meeting', 'deadline'],
+        "responses": [
+            "Work stress is real. Have you taken a short break today to reset?",
+            "Career challenges are tough. Try making a small checklist to feel more in control.",
+            "Is work affecting your personal life? Maybe try our 'Mindful Break' module?",
+            "It sounds like work is heavy on your mind. What's the biggest stressor right now?"
+        ]
+    },
+    "school": {
+        "keywords": ['school', 'college', 'exam', 'grade', 'study', 'studying', 'teacher', 'assignment', 'homework', 'class', 'gpa'],
+        "responses": [
+            "School pressure can be overwhelming. Remember: Your grades don't define your worth.",
+            "Studying is hard work. Have you tried the 50/10 rule? Study 50 mins, break 10 mins.",
+            "If you're feeling behind, just focus on the very next small task. You got this.",
+            "Academic stress is valid. Make sure you're getting enough sleep too."
+        ]
+    },
+    "love": {
+        "keywords": ['love', 'crush', 'boyfriend', 'girlfriend', 'partner', 'date', 'dating', 'breakup', 'ex', 'relationship', 'marriage', 'husband', 'wife'],
+        "responses": [
+            "Matters of the heart are heavy. Journaling your feelings might help clarity.",
+            "Relationships are tricky. Are you prioritizing your own happiness in this?",
+            "Love is complex. It's okay to feel vulnerable about it.",
+            "Heart stuff determines so much of our mood. What's the main feeling coming up?"
+        ]
+    },
+    "health": {
+        "keywords": ['sick', 'ill', 'pain', 'headache', 'stomach', 'tired', 'exhausted', 'sleep', 'sleeping', 'insomnia', 'doctor', 'body', 'weight', 'fat', 'ugly'],
+        "responses": [
+            "Your physical health affects your mind. Have you been sleeping okay?",
+            "Being physically drained makes everything harder. Can you rest today?",
+            "Be gentle with your body. It's doing the best it can.",
+            "If you're feeling unwell, please prioritize rest. Health comes first."
+        ]
+    },
+    "finance": {
+        "keywords": ['money', 'broke', 'debt', 'rent', 'bill', 'expensive', 'cost', 'afford', 'loan', 'finance'],
+        "responses": [
+            "Financial stress is a heavy burden. Just take it one step at a time.",
+            "Money worries are very common. Try to focus on just this week's budget.",
+            "It's normal to worry about finances. Are there any small expenses you can pause?",
+            "I hear you. Financial security is important for peace of mind."
+        ]
+    },
+    "friends": {
+        "keywords": ['friend', 'bestie', 'lonely', 'alone', 'social', 'party', 'invite', 'invited', 'exclude', 'excluded', 'drama'],
+        "responses": [
+            "Friendships can have their ups and downs. Do you feel supported by them?",
+            "Feeling lonely is tough. Usually, reaching out to just one person helps.",
+            "Social connections are important. quality matters more than quantity.",
+            "It sounds like a social issue. Are you being true to yourself in this group?"
+        ]
+    },
+    "future": {
+        "keywords": ['future', 'scared', 'worry', 'worried', 'worrying', 'what if', 'don\'t know', 'unsure', 'plan', 'planning', 'goal', 'dream'],
+        "responses": [
+            "The future can be scary because it's unknown. Let's focus on today.",
+            "Worrying about 'what if' steals joy from 'what is'. Try to ground yourself.",
+            "You don't need to have it all figured out right now. One step is enough.",
+            "Uncertainty is hard to sit with. What is one thing you ARE sure about?"
+        ]
+    },
+    "boredom": {
+        "keywords": ['bored', 'nothing to do', 'apathetic', 'meh', 'lazy'],
+        "responses": [
+            "Boredom can actually be good—it's a reset! Maybe doodle or listen to music?",
+            "Feeling 'meh' is valid. Maybe try a 5-minute Mindful Break?",
+            "Sometimes doing nothing is exactly what we need. Enjoy the pause.",
+            "If you're bored, maybe learn something new or call an old friend?"
+        ]
+    }
+}
+
+
+class TopicIndex:
+    """
+    Word- and phrase-level lookup of the topic a message is about.
+
+    Keywords are normalized like messages (normalize_utterance) and indexed
+    once: single words in a dict, multi-word phrases under their first
+    word. A lookup tokenizes the message once and checks each word, so its
+    cost depends on the message length, not on the number of keywords.
+    Keywords only match whole words ("ex" doesn't match "next", "ill"
+    doesn't match "will"); a plural message word also matches its singular
+    keyword ("exams" -> "exam", "classes" -> "class").
+    """
+
+    def __init__(self, topics):
+        self.topics = topics
+        self._words = {}    # word -> topic priority
+        self._phrases = {}  # first word -> [(words, priority)], longest first
+        for priority, data in enumerate(topics.values()):
+            for keyword in data["keywords"]:
+                words = tuple(normalize_utterance(keyword).split())
+                if not words:
+                    continue
+                if len(words) == 1:
+                    self._words.setdefault(words[0], priority)
+                else:
+                    self._phrases.setdefault(words[0], []).append((words, priority))
+        for candidates in self._phrases.values():
+            candidates.sort(key=lambda candidate: -len(candidate[0]))
+        self._names = list(topics)
+
+    def _singulars(self, word):
+        yield word
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            yield word[:-1]
+            if word.endswith("es"):
+                yield word[:-2]
+
+    def lookup(self, message):
+        """Return the highest-priority topic mentioned in message, or None."""
+        words = normalize_utterance(message).split()
+        best = None
+        for i, word in enumerate(words):
+            for form in self._singulars(word):
+                priority = self._words.get(form)
+                if priority is not None and (best is None or priority < best):
+                    best = priority
+                for phrase, priority in self._phrases.get(form, ()):
+                    if (best is None or priority < best) and tuple(words[i + 1:i + len(phrase)]) == phrase[1:]:
+                        best = priority
+            if best == 0:
+                break
+        return None if best is None else self._names[best]
+
+    def responses(self, topic):
+        return self.topics[topic]["responses"]
+
+
+def load_topics(path=None):
+    """
+    Topic table from a JSON file (CHATBOT_TOPICS_FILE), or DEFAULT_TOPICS.
+
+    The file has the same shape as DEFAULT_TOPICS:
+    {"topic": {"keywords": [...], "responses": [...]}, ...}, in priority order.
+    """
+    path = path or os.getenv('CHATBOT_TOPICS_FILE')
+    if not path:
+        return DEFAULT_TOPICS
+    with open(path, encoding='utf-8') as f:
+        topics = json.load(f)
+    for name, data in topics.items():
+        if not data.get("keywords") or not data.get("responses"):
+            raise ValueError(f"Topic '{name}' in {path} needs non-empty 'keywords' and 'responses'")
+    print(f"Loaded {len(topics)} topics from {path}")
+    return topics